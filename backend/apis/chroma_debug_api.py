@@ -1,46 +1,171 @@
-from fastapi import APIRouter, Query
-from fastapi.responses import JSONResponse, FileResponse
-from services.chroma_service import collection as chroma_collection
+from fastapi import APIRouter, Query, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from services.element_store import element_store
+import base64
 import json
-from pathlib import Path
+import struct
+import numpy as np
 
 router = APIRouter()
 
-EXPORT_PATH = Path("chromadb_export.json")
+# Streaming export of the element store. Filters are pushed down into Chroma `where`
+# clauses and records are read in chunks with limit/offset, so memory stays flat.
+# The NDJSON stream interleaves `{"_cursor": ...}` checkpoints after every chunk;
+# pass the last one back as `cursor` to resume. Embeddings come from a separate
+# binary endpoint: b"EMB1" + uint32 dim, then per record uint16 id length, utf-8 id,
+# dim float32 (little endian). The first chunk is read before the response starts,
+# so an unreadable store is still a 500 JSON error; a failure mid-stream ends the
+# NDJSON export with an `{"error": ..., "_cursor": ...}` line to resume from.
+
+EMBEDDING_MAGIC = b"EMB1"
+
+
+def _where(record_type: str = None, page_name: str = None):
+    clauses = []
+    if record_type:
+        clauses.append({"type": record_type})
+    if page_name:
+        clauses.append({"page_name": page_name})
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def _encode_cursor(offset: int, where) -> str:
+    # Offsets are positions in the filtered result, so the cursor carries its filter.
+    return base64.urlsafe_b64encode(json.dumps({"offset": offset, "where": where}).encode()).decode()
+
+
+def _decode_cursor(cursor: str, where) -> int:
+    if not cursor:
+        return 0
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        offset = int(state["offset"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if state.get("where") != where:
+        raise HTTPException(status_code=400, detail="Cursor was issued for different filters")
+    return offset
+
+
+def _locator_is_null(meta: dict) -> bool:
+    # Not expressible as a where clause (missing keys never match), so filtered per chunk.
+    return (meta or {}).get("locator") in (None, "")
+
+
+async def _chunks(where, include, offset, limit, chunk_size):
+    """Yield (next_offset, chunk) pages until `limit` records were read or the store is exhausted."""
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = chunk_size if remaining is None else min(chunk_size, remaining)
+        chunk = await run_in_threadpool(element_store.get_where, where, include, size, offset)
+        read = len(chunk["ids"])
+        if not read:
+            return
+        offset += read
+        if remaining is not None:
+            remaining -= read
+        yield offset, chunk
+        if read < size:
+            return
+
+
+async def _open_chunks(where, include, offset, limit, chunk_size):
+    """_chunks with the first page already read, so store errors surface before streaming."""
+    chunks = _chunks(where, include, offset, limit, chunk_size)
+    first = await anext(chunks, None)
+
+    async def replay():
+        if first is None:
+            return
+        yield first
+        async for item in chunks:
+            yield item
+    return replay()
+
 
 @router.get("/debug/export-chromadb")
 async def export_chroma_data(
     record_type: str = Query(None, description="Filter by record type: 'ocr', 'locator', etc."),
     locator_null: bool = Query(False, description="Only include entries where locator is null"),
     page_name: str = Query(None, description="Filter by page name"),
-    as_file: bool = Query(False, description="If true, return as downloadable JSON file")
+    as_file: bool = Query(False, description="If true, return as downloadable NDJSON file"),
+    cursor: str = Query(None, description="Resume from a _cursor checkpoint of a previous export"),
+    limit: int = Query(None, ge=1, description="Maximum records scanned by this request"),
+    chunk_size: int = Query(500, ge=1, le=5000, description="Records read from the store per round trip"),
 ):
+    where = _where(record_type, page_name)
+    offset = _decode_cursor(cursor, where)
     try:
-        data = chroma_collection.get(include=["documents", "metadatas", "embeddings"])
-        results = []
-
-        for idx, meta in enumerate(data["metadatas"]):
-            doc = data["documents"][idx]
-            item = {"text": doc}
-            item.update(meta)
-
-            if record_type and item.get("type") != record_type:
-                continue
-
-            if locator_null and item.get("locator") not in [None, ""]:
-                continue
-
-            if page_name and item.get("page_name") != page_name:
-                continue
+        chunks = await _open_chunks(where, ["documents", "metadatas"], offset, limit, chunk_size)
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": str(e)})
 
-            results.append(item)
+    async def stream():
+        count = 0
+        last_offset = offset
+        try:
+            async for next_offset, chunk in chunks:
+                lines = []
+                for record_id, doc, meta in zip(chunk["ids"], chunk["documents"], chunk["metadatas"]):
+                    if locator_null and not _locator_is_null(meta):
+                        continue
+                    item = {"id": record_id, "text": doc}
+                    item.update(meta or {})
+                    lines.append(json.dumps(item, ensure_ascii=False))
+                count += len(lines)
+                last_offset = next_offset
+                lines.append(json.dumps({"_cursor": _encode_cursor(next_offset, where)}))
+                yield "\n".join(lines) + "\n"
+        except Exception as e:
+            yield json.dumps({"error": str(e), "_cursor": _encode_cursor(last_offset, where), "count": count}) + "\n"
+            return
+        exhausted = limit is None or last_offset - offset < limit
+        yield json.dumps({"_cursor": None if exhausted else _encode_cursor(last_offset, where), "count": count}) + "\n"
 
-        if as_file:
-            with open(EXPORT_PATH, "w", encoding="utf-8") as f:
-                json.dump(results, f, indent=2, ensure_ascii=False)
-            return FileResponse(EXPORT_PATH, filename="chromadb_export.json", media_type="application/json")
+    headers = {"Content-Disposition": 'attachment; filename="chromadb_export.ndjson"'} if as_file else {}
+    return StreamingResponse(stream(), media_type="application/x-ndjson", headers=headers)
 
-        return JSONResponse(content={"count": len(results), "data": results})
 
+@router.get("/debug/export-chromadb/embeddings")
+async def export_chroma_embeddings(
+    record_type: str = Query(None, description="Filter by record type: 'ocr', 'locator', etc."),
+    locator_null: bool = Query(False, description="Only include entries where locator is null"),
+    page_name: str = Query(None, description="Filter by page name"),
+    cursor: str = Query(None, description="Resume from a _cursor checkpoint of the NDJSON export"),
+    limit: int = Query(None, ge=1, description="Maximum records scanned by this request"),
+    chunk_size: int = Query(500, ge=1, le=5000, description="Records read from the store per round trip"),
+):
+    where = _where(record_type, page_name)
+    offset = _decode_cursor(cursor, where)
+    include = ["embeddings", "metadatas"] if locator_null else ["embeddings"]
+    try:
+        chunks = await _open_chunks(where, include, offset, limit, chunk_size)
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
+
+    async def stream():
+        header_sent = False
+        async for _, chunk in chunks:
+            metas = chunk.get("metadatas") or [None] * len(chunk["ids"])
+            rows = [
+                (record_id, embedding)
+                for record_id, embedding, meta in zip(chunk["ids"], chunk["embeddings"], metas)
+                if embedding is not None and (not locator_null or _locator_is_null(meta))
+            ]
+            if not rows:
+                continue
+            vectors = np.asarray([embedding for _, embedding in rows], dtype="<f4")
+            parts = []
+            if not header_sent:
+                parts.append(EMBEDDING_MAGIC + struct.pack("<I", vectors.shape[1]))
+                header_sent = True
+            for (record_id, _), vector in zip(rows, vectors):
+                encoded_id = record_id.encode("utf-8")
+                parts.append(struct.pack("<H", len(encoded_id)) + encoded_id + vector.tobytes())
+            yield b"".join(parts)
+
+    return StreamingResponse(stream(), media_type="application/octet-stream",
+                             headers={"Content-Disposition": 'attachment; filename="chromadb_embeddings.bin"'})
@@ -1,16 +1,17 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from chromadb import PersistentClient
-from logic.manual_capture_mode import extract_dom_metadata, match_and_update, get_last_match_result, set_last_match_result
+from logic.manual_capture_mode import extract_dom_metadata, match_and_update, get_last_match_result, set_last_match_result, get_last_capture_info
 from utils.match_utils import normalize_page_name
-from utils.file_utils import build_standard_metadata
+from utils.file_utils import build_standard_metadata_many
 from playwright.async_api import async_playwright, Page, Browser
+from services.element_store import element_store
 import json
 
 router = APIRouter()
 
-client = PersistentClient(path="./data/chroma_db")
-collection = client.get_or_create_collection(name="element_metadata")
+collection = element_store.elements
 
 BROWSER: Browser = None
 PAGE: Page = None
@@ -21,16 +22,16 @@ class LaunchRequest(BaseModel):
     url: str
 
 class CaptureRequest(BaseModel):
-    pass
+    incremental: bool = False  # re-extract only subtrees changed since the last capture of this page
 
 class PageNameSetRequest(BaseModel):
     page_name: str
 
-async def send_enrichment_requests(page_name: str):
+async def send_enrichment_requests(page_name: str, incremental: bool = True):
     from httpx import AsyncClient
     async with AsyncClient() as client:
         await client.post("http://localhost:8001/set-current-page-name", json={"page_name": page_name})
-        resp = await client.post("http://localhost:8001/capture-dom-from-client", json={})
+        resp = await client.post("http://localhost:8001/capture-dom-from-client", json={"incremental": incremental})
         json_data = await resp.aread()
         print("[DEBUG] Response Raw JSON:", json_data)
         try:
@@ -49,9 +50,9 @@ async def launch_browser(req: LaunchRequest):
         PAGE = await BROWSER.new_page()
         await PAGE.goto(req.url)
 
-        async def send_enrichment_wrapper(source, page_name):
-            print("[DEBUG] Triggering enrichment for:", page_name)
-            result = await send_enrichment_requests(page_name)
+        async def send_enrichment_wrapper(source, page_name, incremental=True):
+            print("[DEBUG] Triggering enrichment for:", page_name, "| incremental:", incremental)
+            result = await send_enrichment_requests(page_name, incremental)
             print("[DEBUG] Enrichment result:", result)
             return json.dumps(result)
 
@@ -66,6 +67,7 @@ async def launch_browser(req: LaunchRequest):
                 <div id="ocrModal" style="position:fixed;top:40%;left:50%;transform:translate(-50%,-50%);background:white;padding:20px;border:2px solid black;z-index:9999;display:none;">
                     <label>Enter Page Name:</label><br/>
                     <select id="pageDropdown" style="margin:5px;padding:5px;width:250px;"></select><br/>
+                    <label><input type="checkbox" id="fullCapture"/> Full re-capture</label><br/>
                     <button onclick="triggerEnrichment()">Enrich</button>
                     <button onclick="document.getElementById('ocrModal').style.display='none'">Close</button>
                     <div id="enrichmentMessageBox" style="margin-top:10px;font-weight:bold;color:green;"></div>
@@ -104,7 +106,8 @@ async def launch_browser(req: LaunchRequest):
                 messageBox.offsetHeight;
 
                 try {
-                    const resultStr = await window.sendEnrichmentRequests(pageName);
+                    const fullCapture = document.getElementById('fullCapture').checked;
+                    const resultStr = await window.sendEnrichmentRequests(pageName, !fullCapture);
                     const result = JSON.parse(resultStr);
                     console.log("✅ Matched:", result);
 
@@ -148,7 +151,7 @@ async def set_page_name(req: PageNameSetRequest):
     return {"message": f"✅ Page name set to: {CURRENT_PAGE_NAME}"}
 
 @router.post("/capture-dom-from-client")
-async def capture_from_keyboard(_: CaptureRequest):
+async def capture_from_keyboard(req: CaptureRequest):
     global PAGE, CURRENT_PAGE_NAME
     try:
         page_name = CURRENT_PAGE_NAME
@@ -156,15 +159,19 @@ async def capture_from_keyboard(_: CaptureRequest):
         if PAGE.is_closed():
             raise HTTPException(status_code=500, detail="❌ Cannot extract. Page is already closed.")
 
-        dom_data = await extract_dom_metadata(PAGE, page_name)
+        dom_data = await extract_dom_metadata(PAGE, page_name, incremental=req.incremental)
         print("[DEBUG] DOM elements extracted:", len(dom_data))
-        ocr_data = collection.get(where={"page_name": page_name})["metadatas"]
-        updated_matches = match_and_update(ocr_data, dom_data, collection)
-
-        standardized_matches = [
-            build_standard_metadata(m, page_name, image_path="", source_url=PAGE.url)
-            for m in updated_matches
-        ]
+        # Chroma reads, embedding and classification block: keep them off the event loop, so
+        # concurrent captures share embedding micro-batches instead of stalling each other.
+        ocr_data = await run_in_threadpool(element_store.page_elements, page_name)
+        updated_matches = await run_in_threadpool(match_and_update, ocr_data, dom_data)
+        write_errors = await element_store.flush_async()
+        if write_errors:
+            print(f"[⚠️] {len(write_errors)} matched records failed to write")
+
+        standardized_matches = await run_in_threadpool(
+            build_standard_metadata_many, updated_matches, page_name, image_path="", source_url=PAGE.url
+        )
 
         set_last_match_result(standardized_matches)
 
@@ -172,7 +179,8 @@ async def capture_from_keyboard(_: CaptureRequest):
             "status": "success",
             "message": f"[Keyboard Trigger] Enriched {len(standardized_matches)} elements for page: {page_name}",
             "matched_data": standardized_matches,
-            "count": len(standardized_matches)
+            "count": len(standardized_matches),
+            "capture": get_last_capture_info()
         }
 
     except Exception as e:
@@ -180,12 +188,23 @@ async def capture_from_keyboard(_: CaptureRequest):
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
+def _catalog_etag(request: Request, name: str):
+    """ETag from the store version; returns (etag, 304 response or None)."""
+    etag = f'W/"{name}-{element_store.store_version()}"'
+    if request.headers.get("if-none-match") == etag:
+        return etag, Response(status_code=304, headers={"ETag": etag})
+    return etag, None
+
 @router.get("/available-pages")
-async def list_page_names():
+async def list_page_names(request: Request, details: bool = False):
     try:
-        records = collection.get()
-        page_names = list({meta.get("page_name", "unknown") for meta in records.get("metadatas", [])})
-        return {"pages": page_names}
+        etag, not_modified = _catalog_etag(request, "pages-details" if details else "pages")
+        if not_modified:
+            return not_modified
+        content = {"pages": element_store.page_names()}
+        if details:
+            content["catalog"] = element_store.page_summaries()  # element / matched counts per page
+        return JSONResponse(content=content, headers={"ETag": etag})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -196,15 +215,17 @@ async def shutdown_browser():
         await PLAYWRIGHT.stop()
 
 @router.get("/latest-match-result")
-async def get_latest_match_result():
+async def get_latest_match_result(request: Request):
     try:
-        records = collection.get()
-        matched = [r for r in records.get("metadatas", []) if r.get("dom_matched") is True]
-        return {
+        etag, not_modified = _catalog_etag(request, "matched")
+        if not_modified:
+            return not_modified
+        matched = element_store.matched_elements()
+        return JSONResponse(content={
             "status": "success",
             "matched_elements": matched,
             "count": len(matched)
-        }
+        }, headers={"ETag": etag})
     except Exception as e:
         import traceback
         traceback.print_exc()
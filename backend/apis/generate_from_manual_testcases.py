@@ -2,7 +2,8 @@ from fastapi import APIRouter
 from pydantic import BaseModel, Field
 from datetime import datetime
 import re
-from services.test_generation_utils import client
+from services.llm_cache import complete
+from services.testcase_cache import testcase_cache, context_key
 
 router = APIRouter()
 
@@ -27,28 +28,40 @@ class ManualTestcaseRequest(BaseModel):
         )
     )
     site_url: str = Field(default="https://www.saucedemo.com/")
+    use_cache: bool = Field(default=True, description="Set to false to generate fresh code (bypasses the LLM response and semantic caches)")
+    use_semantic_cache: bool = Field(default=True, description="Set to false to skip only the reuse of near-duplicate test cases")
 
 @router.post("/rag/generate-from-manual-testcase")
 def generate_from_manual_testcase(req: ManualTestcaseRequest):
     manual_steps = "\n".join(req.manual_testcase) if isinstance(req.manual_testcase, list) else req.manual_testcase.strip()
     prompt = req.prompt.format(manual_steps=manual_steps, site_url=req.site_url)
-    result = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[{"role": "user", "content": prompt}],
-        max_tokens=4096
-    )
-    test_code = result.choices[0].message.content.strip()
-    code = re.sub(r"```(?:python)?|```|^\s*Here is.*?:", "", test_code, flags=re.MULTILINE).strip()
+
+    # Near-duplicate steps (renumbered, reworded, other quoted values) reuse earlier code
+    context = context_key(req.prompt, req.site_url, "gpt-4o")
+    match = testcase_cache.lookup(req.manual_testcase, context, req.use_cache and req.use_semantic_cache)
+    if match is not None:
+        code = match["code"]
+    else:
+        test_code = complete(
+            "generate_from_manual_testcase",
+            use_cache=req.use_cache,
+            model="gpt-4o",
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=4096
+        ).strip()
+        code = re.sub(r"```(?:python)?|```|^\s*Here is.*?:", "", test_code, flags=re.MULTILINE).strip()
+        # Optionally add Playwright import if not present
+        if "from playwright.sync_api" not in code:
+            code = "from playwright.sync_api import sync_playwright, expect\n\n" + code
+        testcase_cache.store(req.manual_testcase, context, code)
 
     # Write to file in root folder
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     filename = f"test_manualcase_{timestamp}.py"
     filepath = filename  # root folder
-    # Optionally add Playwright import if not present
-    if "from playwright.sync_api" not in code:
-        code = "from playwright.sync_api import sync_playwright, expect\n\n" + code
 
     with open(filepath, "w", encoding="utf-8") as f:
         f.write(code)
     
-    return {"auto_testcase": code, "filename": filename}
+    semantic_cache = {"similarity": match["similarity"], "adapted": match["adapted"]} if match else None
+    return {"auto_testcase": code, "filename": filename, "semantic_cache": semantic_cache}
@@ -1,11 +1,15 @@
 from fastapi import APIRouter
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from datetime import datetime
 from pathlib import Path
-import os, re, json
-from services.test_generation_utils import (
-    client, get_class_name, filter_all_pages, collection
-)
+from typing import Literal
+import os, re, json, asyncio
+from services.test_generation_utils import get_class_name, filter_all_pages
+from services.llm_cache import complete_async
+from config.settings import STORY_GENERATION_CONCURRENCY
+from services.element_store import element_store
 from utils.match_utils import generalize_label
 
 router = APIRouter()
@@ -14,6 +18,9 @@ class UserStoryRequest(BaseModel):
     user_story: str | list[str] = Field(..., example=["Login and add backpack", "Checkout and complete order"])
     prompt: str = Field(..., example="Custom prompt with {story_block}, {page_method_section}, {site_url}, {dynamic_steps}")
     site_url: str = Field(default="")
+    use_cache: bool = Field(default=True, description="Set to false to bypass the LLM response cache")
+    stream: bool = Field(default=False, description="Stream each story's result as soon as it is generated")
+    stream_format: Literal["ndjson", "sse"] = Field(default="ndjson")
 
 # Helper functions
 def sanitize_identifier(label: str) -> str:
@@ -33,7 +40,7 @@ def infer_base_url_from_page_names(page_names: list[str]) -> str:
     most_common = Counter(domains).most_common(1)[0][0] if domains else "example"
     return f"https://www.{most_common}.com"
 
-def generate_test_code_from_methods(test_index, user_story, method_map, page_names, site_url, prompt_template, default_username="", default_password="") -> str:
+async def generate_test_code_from_methods(test_index, user_story, method_map, page_names, site_url, prompt_template, default_username="", default_password="", use_cache=True) -> str:
     escaped_story = user_story.replace('"""', '\"\"\"')
     story_block = f'"""{escaped_story}"""'
 
@@ -65,19 +72,18 @@ def generate_test_code_from_methods(test_index, user_story, method_map, page_nam
     if "standard_user" in default_username.lower():
         prompt += "\n\nNote: Use credentials 'standard_user' and 'secret_sauce' for login."
 
-    result = client.chat.completions.create(
+    test_code = (await complete_async(
+        "generate_from_story",
+        use_cache=use_cache,
         model="gpt-4o",
         # model="openai/o4-mini",
         messages=[{"role": "user", "content": prompt}],
         max_tokens=4096
-    )
-
-    test_code = result.choices[0].message.content.strip()
+    )).strip()
     return re.sub(r"```(?:python)?|^\s*Here is.*?:", "", test_code, flags=re.MULTILINE).strip()
 
-@router.post("/rag/generate-from-story")
-def generate_from_user_story(req: UserStoryRequest):
-    stories = req.user_story if isinstance(req.user_story, list) else [req.user_story]
+def _prepare_run(req: UserStoryRequest) -> dict:
+    """Page objects and run folders for a generation run (store reads + file writes, off the event loop)."""
     site_url = req.site_url or infer_base_url_from_page_names(filter_all_pages())
 
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -90,8 +96,7 @@ def generate_from_user_story(req: UserStoryRequest):
     default_username, default_password = "", ""
 
     for page in filter_all_pages():
-        page_data = collection.get(where={"page_name": page})
-        entries = [r for r in page_data.get("metadatas", []) if r.get("label_text") and re.search(r"[a-zA-Z]", r["label_text"])]
+        entries = [r for r in element_store.page_elements(page) if r.get("label_text") and re.search(r"[a-zA-Z]", r["label_text"])]
         if not entries: continue
         page_names.append(page)
         all_metadata.extend(entries)
@@ -122,21 +127,91 @@ def generate_from_user_story(req: UserStoryRequest):
         (pages_dir / f"{page}_page.py").write_text("\n".join(methods), encoding="utf-8")
         method_map[page] = [line.split("(")[0].replace("def ", "").strip() for line in flat if line.startswith("    def ")]
 
-    import_lines = ["from playwright.sync_api import sync_playwright"] + [f"from pages.{page}_page import {get_class_name(page)}" for page in page_names]
-    test_functions, results = [], []
+    return {
+        "site_url": site_url, "timestamp": timestamp, "tests_dir": tests_dir, "logs_dir": logs_dir, "meta_dir": meta_dir,
+        "page_names": page_names, "method_map": method_map, "all_metadata": all_metadata,
+        "default_username": default_username, "default_password": default_password,
+    }
+
+
+def _write_run(run: dict, test_functions: list[str]) -> str:
+    import_lines = ["from playwright.sync_api import sync_playwright"] + [f"from pages.{page}_page import {get_class_name(page)}" for page in run["page_names"]]
+    test_path = run["tests_dir"] / "test_from_story.py"
+    test_path.write_text("\n\n".join(import_lines + test_functions), encoding="utf-8")
+    (run["logs_dir"] / "debug.log").write_text("\n".join(run["page_names"]), encoding="utf-8")
+    with open(run["meta_dir"] / "metadata.json", "w") as f:
+        json.dump({"timestamp": run["timestamp"], "executed": False, "metadata": run["all_metadata"]}, f, indent=2)
+    return str(test_path)
 
-    for i, story in enumerate(stories):
-        story_type = "Negative" if any(x in story.lower() for x in ["fail", "invalid"]) else "Edge" if "limit" in story.lower() else "Positive"
-        code = generate_test_code_from_methods(i + 1, story, method_map, page_names, site_url, req.prompt, default_username, default_password)
-        test_functions.append(code)
-        results.append({
-            "manual_testcase": f"### Manual Test Case {i+1} ({story_type})\n\n1. Navigate\n2. {story}\nExpected: Success",
-            "auto_testcase": code,
-            "story_type": story_type
-        })
 
-    (tests_dir / "test_from_story.py").write_text("\n\n".join(import_lines + test_functions), encoding="utf-8")
-    (logs_dir / "debug.log").write_text("\n".join(page_names), encoding="utf-8")
-    json.dump({"timestamp": timestamp, "executed": False, "metadata": all_metadata}, open(meta_dir / "metadata.json", "w"), indent=2)
+async def _generate_story(index: int, story: str, run: dict, req: UserStoryRequest, semaphore: asyncio.Semaphore) -> dict:
+    story_type = "Negative" if any(x in story.lower() for x in ["fail", "invalid"]) else "Edge" if "limit" in story.lower() else "Positive"
+    async with semaphore:
+        code = await generate_test_code_from_methods(
+            index + 1, story, run["method_map"], run["page_names"], run["site_url"], req.prompt,
+            run["default_username"], run["default_password"], req.use_cache
+        )
+    return {
+        "manual_testcase": f"### Manual Test Case {index+1} ({story_type})\n\n1. Navigate\n2. {story}\nExpected: Success",
+        "auto_testcase": code,
+        "story_type": story_type
+    }
 
-    return {"results": results}
+
+def _stream_line(event: dict, stream_format: str) -> str:
+    if stream_format == "sse":
+        return f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+    return json.dumps(event) + "\n"
+
+
+@router.post("/rag/generate-from-story")
+async def generate_from_user_story(req: UserStoryRequest):
+    """
+    Stories are generated concurrently (STORY_GENERATION_CONCURRENCY per request, OPENAI_MAX_CONCURRENCY
+    overall); test_from_story.py and `results` keep the order of `user_story`. With stream=true the
+    response is NDJSON (or SSE) events: one "result" or "error" per story as it finishes, then "done".
+    """
+    stories = req.user_story if isinstance(req.user_story, list) else [req.user_story]
+    run = await run_in_threadpool(_prepare_run, req)
+    semaphore = asyncio.Semaphore(STORY_GENERATION_CONCURRENCY)
+
+    if not req.stream:
+        tasks = [asyncio.create_task(_generate_story(i, story, run, req, semaphore)) for i, story in enumerate(stories)]
+        try:
+            results = await asyncio.gather(*tasks)
+        finally:
+            # First failure (or a cancelled request) fails the whole call: stop the remaining generations.
+            for task in tasks:
+                task.cancel()
+        await run_in_threadpool(_write_run, run, [r["auto_testcase"] for r in results])
+        return {"results": results}
+
+    async def stream():
+        async def indexed(i, story):
+            try:
+                return i, await _generate_story(i, story, run, req, semaphore), None
+            except Exception as e:
+                return i, None, e
+
+        tasks = [asyncio.create_task(indexed(i, story)) for i, story in enumerate(stories)]
+        results = [None] * len(stories)
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                i, result, error = await next_done
+                if error is not None:
+                    yield _stream_line({"event": "error", "index": i, "story": stories[i], "detail": str(error)}, req.stream_format)
+                    continue
+                results[i] = result
+                yield _stream_line({"event": "result", "index": i, "result": result}, req.stream_format)
+
+            # Assemble in story order once everything has finished; failed stories are left out.
+            completed = [r for r in results if r is not None]
+            test_file = await run_in_threadpool(_write_run, run, [r["auto_testcase"] for r in completed])
+            yield _stream_line({"event": "done", "results": results, "test_file": test_file}, req.stream_format)
+        finally:
+            # Client went away (or the stream failed): don't leave generations running.
+            for task in tasks:
+                task.cancel()
+
+    media_type = "text/event-stream" if req.stream_format == "sse" else "application/x-ndjson"
+    return StreamingResponse(stream(), media_type=media_type)
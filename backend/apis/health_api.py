@@ -0,0 +1,40 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from services.model_registry import model_status, warmup_targets
+from services.embedding_service import embedding_service
+from services.yolo_detector import detection_cache_stats
+from services.ocr_type_classifier import classification_memo_stats
+from services.chroma_writer import chroma_writer
+from services.llm_cache import llm_cache
+from services.testcase_cache import testcase_cache
+
+router = APIRouter()
+
+@router.get("/health")
+async def health():
+    return {"status": "ok"}
+
+@router.get("/health/ready")
+async def readiness():
+    """
+    Ready once every model selected by MODEL_WARMUP has loaded; 503 with per-model state and timings otherwise.
+    Models outside the warmup set load on first use and don't gate readiness.
+    """
+    models = model_status()
+    ready = all(models[name]["status"] == "ready" for name in warmup_targets() if name in models)
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "not_ready", "models": models},
+    )
+
+@router.get("/health/caches")
+async def cache_stats():
+    """Hit/miss metrics for the inference, embedding and LLM response caches, plus the write-behind queue."""
+    return {
+        "embeddings": embedding_service.cache_stats(),
+        "yolo_detections": detection_cache_stats(),
+        "ocr_type_memo": classification_memo_stats(),
+        "chroma_writer": chroma_writer.stats(),
+        "llm_responses": llm_cache.stats(),
+        "testcase_semantic": testcase_cache.stats(),
+    }
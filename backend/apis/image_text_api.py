@@ -4,15 +4,14 @@ from fastapi import APIRouter, UploadFile, File, HTTPException, Form
 from fastapi.responses import JSONResponse
 from typing import List
 from PIL import Image
-import os, zipfile, tempfile, json, logging
+import os, zipfile, tempfile, json, logging, asyncio
 from dotenv import load_dotenv
-from logic.image_text_extractor import process_image_gpt
+from logic.image_text_extractor import process_image_gpt, process_images
 from services.graph_service import build_dependency_graph
 from utils.match_utils import normalize_page_name
-from config.settings import DATA_PATH
-import chromadb
+from config.settings import DATA_PATH, UPLOAD_IMAGE_CONCURRENCY
 from datetime import datetime
-from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
+from services.element_store import element_store
 
 load_dotenv()
 
@@ -27,19 +26,63 @@ logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 logger.addHandler(file_handler)
 
-# ChromaDB setup
-embedding_function = SentenceTransformerEmbeddingFunction(model_name="all-MiniLM-L6-v2")
-chroma_client = chromadb.PersistentClient(path="./data/chroma_db")
-chroma_collection = chroma_client.get_or_create_collection(
-    name="element_metadata",
-    embedding_function=embedding_function
-)
+# ChromaDB setup (shared element store)
+chroma_collection = element_store.elements
+
+
+def _extract_zip(zip_path: str, target_dir: str) -> None:
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        zip_ref.extractall(target_dir)
+
+
+def _load_and_persist(image_path: str, permanent_image_path: str) -> Image.Image:
+    img = Image.open(image_path)
+    img.load()
+    img.save(permanent_image_path)
+    return img
+
+
+async def _process_uploaded_image(image_name: str, image_path: str, semaphore: asyncio.Semaphore, debug_log_path: str, use_cache: bool) -> list:
+    async with semaphore:
+        logger.debug(f"📷 Processing image: {image_name}")
+        permanent_image_path = os.path.join(DATA_PATH, "images", image_name)
+        img = await asyncio.to_thread(_load_and_persist, image_path, permanent_image_path)
+        try:
+            # process_image_gpt queues its records on the element store
+            return await process_image_gpt(
+                img, image_name,
+                image_path=permanent_image_path,
+                debug_log_path=debug_log_path,
+                use_cache=use_cache
+            )
+        finally:
+            img.close()
+
+def _open_image(image_path: str) -> Image.Image:
+    img = Image.open(image_path)
+    img.load()
+    return img
+
+
+async def _process_uploaded_images_tesseract(pending_images: list) -> list:
+    """Tesseract path: every screenshot is OCR'd in parallel on the OCR process pool."""
+    loaded = [(await asyncio.to_thread(_open_image, image_path), image_name) for image_name, image_path in pending_images]
+    try:
+        return await process_images(loaded)
+    finally:
+        for img, _ in loaded:
+            img.close()
 
 @router.post("/upload-image")
 async def upload_image(
     images: List[UploadFile] = File(...),
-    ordered_images: str = Form(None)
+    ordered_images: str = Form(None),
+    use_cache: bool = Form(True),
+    ocr_engine: str = Form("gpt")
 ):
+    """`ocr_engine` is "gpt" (vision model, default) or "tesseract" (local OCR on a process pool)."""
+    if ocr_engine not in ("gpt", "tesseract"):
+        raise HTTPException(status_code=400, detail=f"Unknown ocr_engine: {ocr_engine}")
     os.makedirs("data/regions", exist_ok=True)
     os.makedirs("data/images", exist_ok=True)
     results = []
@@ -68,8 +111,7 @@ async def upload_image(
                 with tempfile.NamedTemporaryFile(delete=False, suffix=".zip") as tmp_zip:
                     tmp_zip.write(await file.read())
                     tmp_zip_path = tmp_zip.name
-                with zipfile.ZipFile(tmp_zip_path, 'r') as zip_ref:
-                    zip_ref.extractall(temp_dir)
+                await asyncio.to_thread(_extract_zip, tmp_zip_path, temp_dir)
             else:
                 if filename.endswith(('.png', '.jpg', '.jpeg', '.bmp', '.gif', '.webp')):
                     file_path = os.path.join(temp_dir, filename)
@@ -80,39 +122,44 @@ async def upload_image(
         extracted_images = [f for f in os.listdir(temp_dir) if f.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp', '.gif', '.webp'))]
         image_names = ordered_image_list if ordered_image_list else sorted(extracted_images)
 
-        # Step 4: Process images in order
+        # Step 4: Process images concurrently; results keep the final order
+        pending_images = []
         for image_name in image_names:
             image_path = os.path.join(temp_dir, image_name)
             if not os.path.exists(image_path):
                 logger.warning(f"⚠️ Skipping missing image: {image_name}")
                 continue
-
-            with Image.open(image_path) as img:
-                logger.debug(f"📷 Processing image: {image_name}")
-
-                permanent_image_path = os.path.join(DATA_PATH, "images", image_name)
-                img.save(permanent_image_path)
-
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                DEBUG_LOG_PATH = f"./data/metadata_logs_{timestamp}.json"
-
-                metadata_list = await process_image_gpt(
-                    img, image_name,
-                    image_path=permanent_image_path,
-                    debug_log_path=DEBUG_LOG_PATH
-                )
-
-                for metadata in metadata_list:
-                    chroma_collection.add(
-                        ids=[metadata["id"]],
-                        documents=[metadata["text"]],
-                        metadatas=[metadata]
-                    )
-                    results.append(metadata)
-
+            pending_images.append((image_name, image_path))
+
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        DEBUG_LOG_PATH = f"./data/metadata_logs_{timestamp}.json"
+        if ocr_engine == "tesseract":
+            metadata_lists = await _process_uploaded_images_tesseract(pending_images)
+        else:
+            semaphore = asyncio.Semaphore(UPLOAD_IMAGE_CONCURRENCY)
+            tasks = [
+                asyncio.create_task(_process_uploaded_image(image_name, image_path, semaphore, DEBUG_LOG_PATH, use_cache))
+                for image_name, image_path in pending_images
+            ]
+            try:
+                metadata_lists = await asyncio.gather(*tasks)
+            finally:
+                # First failure (or a cancelled request) fails the upload: stop the remaining GPT calls
+                # and wait for them to unwind before responding.
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+        for (image_name, image_path), metadata_list in zip(pending_images, metadata_lists):
+            results.extend(metadata_list)
             image_file_map[image_name] = (image_path, normalize_page_name(image_name))
             actual_received_images.append(image_name)
 
+        # Persist everything queued for this upload before responding
+        write_errors = await element_store.flush_async()
+        for error in write_errors:
+            logger.warning(f"⚠️ Chroma write failed for {error.id} in {error.collection}: {error.error}")
+
         # Step 5: Store dependency graph
         if ordered_image_list:
             build_dependency_graph(ordered_image_list, output_path="data/dependency_graph.json")
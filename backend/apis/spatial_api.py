@@ -0,0 +1,68 @@
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from services.element_store import element_store
+from services.spatial_index import spatial_index
+
+router = APIRouter()
+
+
+def _ensure_indexed(page_name: str) -> None:
+    """One-time backfill of a page from Chroma; afterwards writers keep the index current."""
+    if spatial_index.is_complete(page_name):
+        return
+    records = element_store.get_where({"page_name": page_name}, include=["metadatas"])
+    count = spatial_index.rebuild_page(page_name, records["ids"], records["metadatas"])
+    print(f"[SPATIAL] Backfilled {count} elements for page: {page_name}")
+
+
+@router.get("/elements/near")
+async def elements_near(
+    page_name: str,
+    x: Optional[float] = None,
+    y: Optional[float] = None,
+    k: int = Query(5, ge=1, le=500),
+    max_distance: Optional[float] = Query(None, ge=0),
+    x1: Optional[float] = None,
+    y1: Optional[float] = None,
+    x2: Optional[float] = None,
+    y2: Optional[float] = None,
+    include_metadata: bool = True,
+):
+    """
+    Position lookups on one page.
+    - k-nearest: x, y (+ k, max_distance) -> elements ordered by distance from the point to their box
+    - box intersection: x1, y1, x2, y2 -> elements overlapping the box, top-to-bottom
+    """
+    box = (x1, y1, x2, y2)
+    if all(v is not None for v in box):
+        if x2 < x1 or y2 < y1:
+            raise HTTPException(status_code=400, detail="Box must satisfy x1 <= x2 and y1 <= y2")
+        mode = "box"
+    elif any(v is not None for v in box):
+        raise HTTPException(status_code=400, detail="Box queries need all of x1, y1, x2, y2")
+    elif x is not None and y is not None:
+        mode = "nearest"
+    else:
+        raise HTTPException(status_code=400, detail="Provide x and y (k-nearest) or x1, y1, x2, y2 (box)")
+
+    try:
+        await run_in_threadpool(_ensure_indexed, page_name)
+        if mode == "box":
+            elements = await run_in_threadpool(spatial_index.intersecting, page_name, box)
+        else:
+            elements = await run_in_threadpool(spatial_index.nearest, page_name, x, y, k, max_distance)
+
+        if include_metadata and elements:
+            records = await run_in_threadpool(element_store.get_by_ids, [e["id"] for e in elements], ["metadatas"])
+            by_id = dict(zip(records["ids"], records["metadatas"]))
+            for element in elements:
+                element["metadata"] = by_id.get(element["id"])
+
+        return {"status": "success", "mode": mode, "page_name": page_name, "count": len(elements), "elements": elements}
+    except HTTPException:
+        raise
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,11 +1,101 @@
 import os
+from dotenv import load_dotenv
+
+load_dotenv()
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 ROOT_PATH = os.path.abspath(os.path.join(BASE_DIR, ".."))
 DATA_PATH = os.path.join(ROOT_PATH, "data")
 REGION_PATH = os.path.join(DATA_PATH, "regions")
 CHROMA_PATH = os.path.join(DATA_PATH, "chroma_db")
+CACHE_PATH = os.path.join(DATA_PATH, "cache")
 
 os.makedirs(DATA_PATH + "/images", exist_ok=True)
 os.makedirs(REGION_PATH, exist_ok=True)
-os.makedirs(CHROMA_PATH, exist_ok=True)
\ No newline at end of file
+os.makedirs(CHROMA_PATH, exist_ok=True)
+os.makedirs(CACHE_PATH, exist_ok=True)
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).strip().lower() in ("1", "true", "yes", "on")
+
+
+# YOLO detection cache (one inference per screenshot, keyed by image content hash)
+YOLO_CACHE_SIZE = int(os.getenv("YOLO_CACHE_SIZE", "64"))
+YOLO_DISK_CACHE = _env_bool("YOLO_DISK_CACHE", True)
+YOLO_DISK_CACHE_MAX_ENTRIES = int(os.getenv("YOLO_DISK_CACHE_MAX_ENTRIES", "5000"))
+
+# MobileNet OCR-type classifier
+OCR_TYPE_BATCH_SIZE = int(os.getenv("OCR_TYPE_BATCH_SIZE", "64"))
+OCR_TYPE_MEMO = _env_bool("OCR_TYPE_MEMO", True)
+OCR_TYPE_MEMO_PATH = os.path.join(CACHE_PATH, "ocr_type_memo.sqlite")
+OCR_TYPE_MEMO_MAX_ENTRIES = int(os.getenv("OCR_TYPE_MEMO_MAX_ENTRIES", "50000"))
+
+# Inference backend for YOLO + MobileNet: "torch" (eager) or "onnx" (onnxruntime, CPU)
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch").strip().lower()
+ONNX_QUANTIZE = _env_bool("ONNX_QUANTIZE", False)
+ONNX_THREADS = int(os.getenv("ONNX_THREADS", "0"))
+
+# Tesseract OCR engine (process pool, one screenshot per worker)
+_DEFAULT_TESSERACT_CMD = r"C:\Program Files\Tesseract-OCR\tesseract.exe" if os.name == "nt" else "tesseract"
+TESSERACT_CMD = os.getenv("TESSERACT_CMD", _DEFAULT_TESSERACT_CMD)
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", "0")) or (os.cpu_count() or 1)
+OCR_TILE_HEIGHT = int(os.getenv("OCR_TILE_HEIGHT", "3000"))  # screenshots taller than this are tiled
+OCR_TILE_OVERLAP = int(os.getenv("OCR_TILE_OVERLAP", "200"))
+
+# Content-addressed region store (crops named by pixel hash, written on a background thread)
+REGION_FORMAT = os.getenv("REGION_FORMAT", "png").strip().lower()  # png | webp | jpeg
+REGION_COMPRESS_LEVEL = int(os.getenv("REGION_COMPRESS_LEVEL", "1"))  # png zlib level, 0-9
+REGION_QUALITY = int(os.getenv("REGION_QUALITY", "90"))  # webp / jpeg
+REGION_PERSIST = _env_bool("REGION_PERSIST", True)  # false: keep references only, crop lazily from the screenshot
+REGION_KNOWN_CACHE_SIZE = int(os.getenv("REGION_KNOWN_CACHE_SIZE", "20000"))  # digests remembered as on disk; older ones re-checked with a stat
+
+# Model registry warmup: "all", "none", or a comma-separated list of model names
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "all").strip().lower()
+SENTENCE_MODEL_NAME = os.getenv("SENTENCE_MODEL_NAME", "all-MiniLM-L6-v2")
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+
+# Text -> embedding cache (in-process LRU in front of a SQLite vector store)
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "20000"))
+EMBED_DISK_CACHE = _env_bool("EMBED_DISK_CACHE", True)
+EMBED_DISK_CACHE_MAX_ENTRIES = int(os.getenv("EMBED_DISK_CACHE_MAX_ENTRIES", "500000"))
+
+# Embedding micro-batcher: concurrent encode calls are coalesced for up to N ms / N texts
+EMBED_MICROBATCH = _env_bool("EMBED_MICROBATCH", True)
+EMBED_MICROBATCH_DELAY_MS = float(os.getenv("EMBED_MICROBATCH_DELAY_MS", "5"))
+EMBED_MICROBATCH_MAX_ITEMS = int(os.getenv("EMBED_MICROBATCH_MAX_ITEMS", "256"))
+
+# Extra intent templates: JSON file {"intent_name": ["phrase", ...]} merged over the built-ins
+INTENT_TEMPLATES_PATH = os.getenv("INTENT_TEMPLATES_PATH", os.path.join(BASE_DIR, "intent_templates.json"))
+INTENT_MIN_SCORE = float(os.getenv("INTENT_MIN_SCORE", "0.6"))
+
+# Per-page spatial index (uniform grid) behind /elements/near
+SPATIAL_INDEX_PATH = os.getenv("SPATIAL_INDEX_PATH", os.path.join(DATA_PATH, "spatial_index"))
+SPATIAL_GRID_CELL = float(os.getenv("SPATIAL_GRID_CELL", "100"))  # px
+
+# Write-behind Chroma writer: records are buffered per collection and flushed by size or age
+CHROMA_WRITE_BATCH_SIZE = int(os.getenv("CHROMA_WRITE_BATCH_SIZE", "256"))
+CHROMA_WRITE_MAX_DELAY_MS = float(os.getenv("CHROMA_WRITE_MAX_DELAY_MS", "500"))
+
+# Page catalog sidecar (page names, element / matched counts, store version)
+PAGE_CATALOG_PATH = os.getenv("PAGE_CATALOG_PATH", os.path.join(DATA_PATH, "page_catalog.sqlite"))
+
+# OpenAI chat completions: base URL override (local stub / compatible server) and the
+# process-wide cap on in-flight requests from the async client
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "4"))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "120"))
+UPLOAD_IMAGE_CONCURRENCY = int(os.getenv("UPLOAD_IMAGE_CONCURRENCY", "4"))  # screenshots in flight per /upload-image request
+STORY_GENERATION_CONCURRENCY = int(os.getenv("STORY_GENERATION_CONCURRENCY", "4"))  # stories in flight per /rag/generate-from-story request
+
+# Chat completion response cache (SQLite; key = model + request params + prompt + image content hash)
+LLM_CACHE = _env_bool("LLM_CACHE", True)
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))  # 0 disables expiry
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+
+# Semantic near-duplicate cache for /rag/generate-from-manual-testcase (per-step embeddings + exact anchors)
+SEMANTIC_CACHE = _env_bool("SEMANTIC_CACHE", True)
+SEMANTIC_CACHE_PATH = os.getenv("SEMANTIC_CACHE_PATH", os.path.join(CACHE_PATH, "testcase_semantic.sqlite"))
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))  # min cosine over aligned steps
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "2000"))  # buckets (prompt context x step count)
+SEMANTIC_CACHE_BUCKET_SIZE = int(os.getenv("SEMANTIC_CACHE_BUCKET_SIZE", "32"))  # test cases kept per bucket
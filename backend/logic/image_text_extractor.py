@@ -1,19 +1,19 @@
-import pytesseract
+import asyncio
 from PIL import Image
 import uuid
-from utils.file_utils import save_region
-from services.chroma_service import upsert_text_record
+from utils.file_utils import save_regions
+from services.chroma_service import upsert_text_records
 from config.settings import DATA_PATH
 from typing import List, Optional
 import os
 from utils.match_utils import normalize_page_name
-
-pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+from services.ocr_engine import ocr_image_async
+from services.element_store import element_store
 
 def sanitize_metadata(record: dict) -> dict:
     return {k: (str(v) if v is not None and not isinstance(v, (dict, list)) else "" if v is None else str(v)) for k, v in record.items()}
 
-async def process_image(image: Image.Image, filename: str, page_name: Optional[str] = None, base_folder: Optional[str] = None) -> List[dict]:
+async def process_image(image: Image.Image, filename: str, page_name: Optional[str] = None, base_folder: Optional[str] = None, flush: bool = True) -> List[dict]:
     """
     Patched function to enforce same page_name as locators!
     Now explicitly accepts `page_name`, fallback to filename if not provided.
@@ -37,18 +37,19 @@ async def process_image(image: Image.Image, filename: str, page_name: Optional[s
     regions_dir = os.path.join(DATA_PATH, "regions")
     os.makedirs(regions_dir, exist_ok=True)
 
-    data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT)
+    data = await ocr_image_async(image_save_path)
     results = []
 
-    for i in range(len(data['text'])):
-        text = data['text'][i].strip()
-        if not text:
-            continue
-
-        x, y, w, h = data['left'][i], data['top'][i], data['width'][i], data['height'][i]
-
-        region_img_path = save_region(image=image, x=x, y=y, w=w, h=h, output_dir=regions_dir, page_name=page_name)
+    words = [
+        (data['text'][i].strip(), (data['left'][i], data['top'][i], data['width'][i], data['height'][i]))
+        for i in range(len(data['text']))
+        if data['text'][i].strip()
+    ]
+    # Word crops keep their Tesseract bbox (no YOLO snapping), so region and record agree.
+    regions = save_regions(image, [bbox for _, bbox in words], regions_dir, image_path=image_save_path, return_refs=True, snap=False)
+    pending, crops = [], []
 
+    for (text, (x, y, w, h)), (region_ref, crop) in zip(words, regions):
         unique_id = str(uuid.uuid4())
 
         record = {
@@ -59,7 +60,8 @@ async def process_image(image: Image.Image, filename: str, page_name: Optional[s
             "source_type": "image",
             "text": text,
             "bbox": f"{x},{y},{w},{h}",
-            "region_image_path": region_img_path,
+            "region_image_path": region_ref.location(),
+            "region_ref": region_ref.to_string(),
             "xpath": "",
             "get_by_text": "",
             "get_by_role": "",
@@ -79,23 +81,45 @@ async def process_image(image: Image.Image, filename: str, page_name: Optional[s
             "match_timestamp": ""
         }
 
-        sanitized_record = sanitize_metadata(record)
+        pending.append(sanitize_metadata(record))
+        crops.append(crop)
 
-        try:
-            upsert_text_record(sanitized_record)
-            results.append(sanitized_record)
-            print(f"[DEBUG] Inserted OCR record for text='{text}', page_name='{page_name}', id='{unique_id}'")
-        except Exception as e:
-            print(f"⚠️ Skipping {filename} entry {unique_id}: {e}")
+    try:
+        upsert_text_records(pending, region_images=crops)
+        if flush:
+            errors = await element_store.flush_async()
+            if errors:
+                print(f"⚠️ {len(errors)} OCR records failed to write for page_name='{page_name}'")
+        results.extend(pending)
+        print(f"[DEBUG] Inserted {len(pending)} OCR records for page_name='{page_name}'")
+    except Exception as e:
+        print(f"⚠️ Skipping {filename} OCR records: {e}")
 
     return results
 
 
+async def process_images(images: List[tuple[Image.Image, str]]) -> List[List[dict]]:
+    """
+    Tesseract path for multi-image uploads: screenshots are OCR'd in parallel on the
+    OCR process pool. Results keep the input order; the first failure cancels the rest.
+    """
+    tasks = [asyncio.create_task(process_image(image, filename, flush=False)) for image, filename in images]
+    try:
+        results = await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    errors = await element_store.flush_async()
+    if errors:
+        print(f"⚠️ {len(errors)} OCR records failed to write")
+    return results
+
+
 ############################ Open AI Logic for Image API ############################
 
 
 from PIL import Image
-from openai import OpenAI
 import os
 import base64
 import uuid
@@ -105,11 +129,11 @@ from datetime import datetime
 
 from config.settings import DATA_PATH
 from utils.file_utils import save_region, build_standard_metadata
-from utils.match_utils import normalize_page_name,assign_intent_semantic
-from services.chroma_service import upsert_text_record  
+from utils.match_utils import normalize_page_name, assign_intents_semantic
+from services.chroma_service import upsert_text_records
+from services.llm_cache import complete_async
 
 load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 PROMPT = """You are an expert computer vision model using OpenAI's capabilities.
 
@@ -145,38 +169,15 @@ Your task is to analyze a given screenshot of a user interface (UI) and extract
    secret_sauce - label - password_info
 """
 
-async def process_image_gpt(
-    image: Image.Image,
-    filename: str,
-    image_path: str = "",
-    debug_log_path: str = None
-) -> list:
-    
-    page_name = normalize_page_name(filename)
-
-    # Convert image to base64 for OpenAI Vision API
-    with open(image_path, "rb") as f:
-        image_base64 = base64.b64encode(f.read()).decode("utf-8")
+def _read_base64(path: str) -> str:
+    with open(path, "rb") as f:
+        return base64.b64encode(f.read()).decode("utf-8")
 
-    # Call OpenAI Vision API with your prompt
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[
-            {
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": PROMPT},
-                    {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{image_base64}"}}
-                ]
-            }
-        ],
-        max_tokens=1500
-    )
-
-    raw_lines = response.choices[0].message.content.strip().splitlines()
-    results = []
 
-    for line in raw_lines:
+def _parse_gpt_lines(content: str) -> list:
+    """`<label> - <type> - <intent>` lines -> [label, type, intent]; a missing intent is left empty."""
+    parsed = []
+    for line in content.strip().splitlines():
         line = line.strip()
         if not line or " - " not in line:
             continue
@@ -185,22 +186,35 @@ async def process_image_gpt(
         parts = line.rsplit(" - ", 2)
         if len(parts) == 3:
             label_text, ocr_type, intent = [p.strip() for p in parts]
-            if not intent:
-                intent = assign_intent_semantic(label_text)
         elif len(parts) == 2:
             label_text, ocr_type = [p.strip() for p in parts]
-            intent = assign_intent_semantic(label_text)
+            intent = ""
         else:
             continue
+        parsed.append([label_text, ocr_type, intent])
+    return parsed
+
 
+def _build_gpt_records(image: Image.Image, page_name: str, image_path: str, content: str, debug_log_path: str = None) -> list:
+    """CPU/disk half of process_image_gpt (intents, crops, classification); runs on a worker thread."""
+    parsed = _parse_gpt_lines(content)
+
+    # Lines without an intent from GPT get one batched semantic assignment
+    needs_intent = [entry for entry in parsed if not entry[2]]
+    for entry, (intent, _) in zip(needs_intent, assign_intents_semantic([entry[0] for entry in needs_intent])):
+        entry[2] = intent or ""
+
+    results = []
+    crops = []
+    for label_text, ocr_type, intent in parsed:
         unique_id = str(uuid.uuid4())
         x, y, w, h = 10, 10, 100, 40  # Dummy values; plug in YOLO here if needed
 
-        region_path = save_region(
+        region_ref, region_image = save_region(
             image, x, y, w, h,
             os.path.join(DATA_PATH, "regions"),
-            page_name,
-            image_path=image_path
+            image_path=image_path,
+            return_ref=True
         )
 
         element = {
@@ -213,26 +227,70 @@ async def process_image_gpt(
             "height": h,
             "bbox": f"{x},{y},{w},{h}",
             "confidence_score": 1.0,
+            "region_ref": region_ref.to_string(),
         }
 
         metadata = build_standard_metadata(
             element,
             page_name,
-            image_path=region_path
+            image_path=region_ref.location(),
+            region_image=region_image,
+            assign_intent=False  # the batched call above already tried; below-threshold labels stay empty
         )
         metadata["id"] = unique_id
         metadata["ocr_id"] = unique_id
         metadata["get_by_text"] = label_text
 
-        try:
-            upsert_text_record(metadata)
-        except Exception as e:
-            print(f"[ERROR] Failed to upsert to ChromaDB for label='{label_text}': {e}")
+        results.append(metadata)
+        crops.append(region_image)
 
-        if debug_log_path:
-            with open(debug_log_path, "a", encoding="utf-8") as log_file:
-                log_file.write(json.dumps(metadata, ensure_ascii=False) + "\n")
+    if debug_log_path and results:
+        # One write per screenshot so concurrent uploads never interleave lines
+        with open(debug_log_path, "a", encoding="utf-8") as log_file:
+            log_file.write("".join(json.dumps(m, ensure_ascii=False) + "\n" for m in results))
 
-        results.append(metadata)
+    # One batched classification + upsert for the whole screenshot
+    try:
+        upsert_text_records(results, region_images=crops)
+    except Exception as e:
+        print(f"[ERROR] Failed to upsert {len(results)} records to ChromaDB for page='{page_name}': {e}")
 
     return results
+
+
+async def process_image_gpt(
+    image: Image.Image,
+    filename: str,
+    image_path: str = "",
+    debug_log_path: str = None,
+    use_cache: bool = True
+) -> list:
+    """
+    Vision extraction for one screenshot. The OpenAI call is awaited on the shared async
+    client (bounded by OPENAI_MAX_CONCURRENCY) and post-processing runs off the event loop,
+    so several screenshots can be in flight at once. A screenshot already sent with the
+    same prompt is answered from the LLM response cache unless use_cache is False.
+    """
+    page_name = normalize_page_name(filename)
+
+    # Convert image to base64 for OpenAI Vision API
+    image_base64 = await asyncio.to_thread(_read_base64, image_path)
+
+    # Call OpenAI Vision API with your prompt
+    content = await complete_async(
+        "upload_image",
+        use_cache=use_cache,
+        model="gpt-4o",
+        messages=[
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": PROMPT},
+                    {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{image_base64}"}}
+                ]
+            }
+        ],
+        max_tokens=1500
+    )
+
+    return await asyncio.to_thread(_build_gpt_records, image, page_name, image_path, content, debug_log_path)
@@ -1,23 +1,18 @@
-from chromadb import PersistentClient
-from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
-from sentence_transformers import SentenceTransformer
+from services.embedding_service import embedding_service
 from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
+from collections import defaultdict
 from typing import List, Dict, Any
 from datetime import datetime
 from playwright.async_api import Page
 from utils.file_utils import build_standard_metadata
+from services.element_store import element_store
 
-# 🔧 Embedding setup
-embedding_fn = SentenceTransformerEmbeddingFunction(model_name="all-MiniLM-L6-v2")
-text_model = SentenceTransformer("all-MiniLM-L6-v2")
+# 🔧 Embedding setup (shared embedding service)
+embedding_fn = embedding_service
 
-# 🔧 Persistent ChromaDB
-client = PersistentClient(path="./data/chroma_db")
-collection = client.get_or_create_collection(
-    name="element_metadata",
-    embedding_function=embedding_fn
-)
+# 🔧 Persistent ChromaDB (shared element store)
+collection = element_store.elements
 
 # 🧠 Memory store
 CURRENT_PAGE_NAME = None
@@ -38,6 +33,13 @@ def set_last_match_result(data):
 def get_last_match_result():
     return LAST_MATCHED_RESULTS
 
+# 🧠 Per-page cache of the last DOM extraction (for incremental captures)
+DOM_CAPTURE_CACHE = {}
+LAST_CAPTURE_INFO = {}
+
+def get_last_capture_info():
+    return LAST_CAPTURE_INFO
+
 # ✅ Normalize bbox input
 def bbox_distance(b1, b2) -> float:
     if isinstance(b1, str):
@@ -51,92 +53,348 @@ def bbox_distance(b1, b2) -> float:
 
 # ✅ Text similarity
 def text_similarity(t1: str, t2: str) -> float:
-    vecs = text_model.encode([t1, t2])
+    vecs = embedding_service.embed([t1, t2])
     return float(cosine_similarity([vecs[0]], [vecs[1]])[0][0])
 
-# ✅ Extract DOM metadata from page
-async def extract_dom_metadata(page: Page, page_name: str) -> List[Dict[str, Any]]:
+# ✅ In-browser DOM walk: visible elements with own text, bbox, key attributes, CSS path and XPath.
+# opts = {incremental, generation}: when the tracker generation matches the caller's cached
+# capture, only subtrees dirtied since then are walked; otherwise the whole body is.
+_DOM_EXTRACT_SCRIPT = """
+(opts) => {
+    const ATTRS = ["id", "name", "type", "role", "aria-label", "placeholder", "title", "alt", "href", "value", "data-testid", "class"];
+    const LABELLED = new Set(["INPUT", "TEXTAREA", "SELECT", "BUTTON", "IMG"]);
+
+    const ownText = (el) => {
+        let text = "";
+        for (const node of el.childNodes) {
+            if (node.nodeType === Node.TEXT_NODE) text += node.nodeValue;
+        }
+        return text.replace(/\\s+/g, " ").trim();
+    };
+
+    const sameTagIndex = (el) => {
+        let index = 1;
+        for (let sib = el.previousElementSibling; sib; sib = sib.previousElementSibling) {
+            if (sib.tagName === el.tagName) index++;
+        }
+        return index;
+    };
+
+    const cssPath = (el) => {
+        const parts = [];
+        for (let node = el; node && node.nodeType === Node.ELEMENT_NODE; node = node.parentElement) {
+            if (node.id) {
+                parts.unshift("#" + CSS.escape(node.id));
+                break;
+            }
+            const tag = node.tagName.toLowerCase();
+            parts.unshift(node.parentElement ? `${tag}:nth-of-type(${sameTagIndex(node)})` : tag);
+        }
+        return parts.join(" > ");
+    };
+
+    const xPath = (el) => {
+        const parts = [];
+        for (let node = el; node && node.nodeType === Node.ELEMENT_NODE; node = node.parentElement) {
+            if (node.id && !node.id.includes('"')) {
+                parts.unshift(`//*[@id="${node.id}"]`);
+                return parts.join("/");
+            }
+            parts.unshift(`${node.tagName.toLowerCase()}[${sameTagIndex(node)}]`);
+        }
+        return "/" + parts.join("/");
+    };
+
+    const describe = (el) => {
+        const rect = el.getBoundingClientRect();
+        if (rect.width <= 0 || rect.height <= 0) return null;
+        if (getComputedStyle(el).visibility === "hidden") return null;
+
+        let text = ownText(el);
+        if (!text && LABELLED.has(el.tagName)) {
+            text = (el.getAttribute("aria-label") || el.getAttribute("placeholder") || el.getAttribute("alt")
+                || (el.type === "submit" || el.type === "button" ? el.value : "") || "").trim();
+        }
+        if (!text) return null;
+
+        const attributes = {};
+        for (const name of ATTRS) {
+            const value = el.getAttribute(name);
+            if (value !== null && value !== "") attributes[name] = value;
+        }
+
+        return {
+            tag_name: el.tagName,
+            text: text,
+            x: rect.x,
+            y: rect.y,
+            width: rect.width,
+            height: rect.height,
+            attributes: attributes,
+            css_path: cssPath(el),
+            xpath: xPath(el),
+        };
+    };
+
+    // MutationObserver dirty set, installed once per document:
+    //   subtrees - elements whose whole subtree must be re-walked (added nodes, attribute
+    //              changes, later siblings whose nth-of-type paths shifted)
+    //   selves   - elements whose own text may have changed
+    //   removed  - capture ids of detached elements
+    const installTracker = () => {
+        const t = {nextId: 1, generation: 0, subtrees: new Set(), selves: new Set(), removed: new Set()};
+        const collectRemoved = (node) => {
+            if (node.nodeType !== Node.ELEMENT_NODE) return;
+            if (node.__captureId) t.removed.add(node.__captureId);
+            for (const el of node.querySelectorAll("*")) {
+                if (el.__captureId) t.removed.add(el.__captureId);
+            }
+        };
+        t.record = (mutations) => {
+            for (const m of mutations) {
+                if (m.type === "characterData") {
+                    if (m.target.parentElement) t.selves.add(m.target.parentElement);
+                } else if (m.type === "attributes") {
+                    t.subtrees.add(m.target);
+                } else {
+                    t.selves.add(m.target);
+                    m.removedNodes.forEach(collectRemoved);
+                    m.addedNodes.forEach((node) => { if (node.nodeType === Node.ELEMENT_NODE) t.subtrees.add(node); });
+                    for (let sib = m.nextSibling; sib; sib = sib.nextSibling) {
+                        if (sib.nodeType === Node.ELEMENT_NODE) t.subtrees.add(sib);
+                    }
+                }
+            }
+        };
+        t.observer = new MutationObserver(t.record);
+        t.observer.observe(document.body, {subtree: true, childList: true, attributes: true, characterData: true});
+        return t;
+    };
+    const tracker = window.__domCaptureTracker || (window.__domCaptureTracker = installTracker());
+    tracker.record(tracker.observer.takeRecords());
+
+    const results = [];
+    const scanned = [];
+    const visit = (el) => {
+        if (el.__captureId) scanned.push(el.__captureId);
+        const record = describe(el);
+        if (!record) return;
+        if (!el.__captureId) el.__captureId = tracker.nextId++;
+        record.capture_id = el.__captureId;
+        results.push(record);
+    };
+
+    const incremental = !!(opts && opts.incremental && opts.generation === tracker.generation
+        && !tracker.subtrees.has(document.body));
+    if (!incremental) {
+        for (const el of document.body.querySelectorAll("*")) visit(el);
+    } else {
+        const roots = new Set([...tracker.subtrees].filter((el) => el.isConnected));
+        const covered = (el) => {
+            for (let p = el.parentElement; p && p !== document.body; p = p.parentElement) {
+                if (roots.has(p)) return true;
+            }
+            return false;
+        };
+        for (const root of roots) {
+            if (covered(root)) continue;
+            visit(root);
+            for (const el of root.querySelectorAll("*")) visit(el);
+        }
+        for (const el of tracker.selves) {
+            if (el.isConnected && el !== document.body && !roots.has(el) && !covered(el)) visit(el);
+        }
+    }
+
+    const removed = incremental ? [...tracker.removed] : [];
+    tracker.subtrees.clear();
+    tracker.selves.clear();
+    tracker.removed.clear();
+    tracker.generation += 1;
+
+    return {
+        mode: incremental ? "incremental" : "full",
+        generation: tracker.generation,
+        url: location.href,
+        scroll_x: window.scrollX,
+        scroll_y: window.scrollY,
+        elements: results,
+        scanned: scanned,
+        removed: removed,
+    };
+}
+"""
+
+# ✅ Extract DOM metadata from page (single round trip)
+async def extract_dom_metadata(page: Page, page_name: str, incremental: bool = False) -> List[Dict[str, Any]]:
+    """
+    Visible DOM elements for `page_name`. With incremental=True only subtrees changed since the
+    previous capture of this page are re-extracted and merged into the cached result; it falls
+    back to a full walk after navigation or when another capture consumed the dirty set.
+    Layout shifts outside mutated subtrees are not detected (scroll offsets are).
+    """
+    global LAST_CAPTURE_INFO
     if page.is_closed():
         print("[❌] Attempted to access a closed page.")
         return []
 
-    elements = await page.locator("body *").all()
-    data = []
+    cached = DOM_CAPTURE_CACHE.get(page_name) if incremental else None
+    opts = {
+        "incremental": bool(cached and cached["url"] == page.url),
+        "generation": cached["generation"] if cached else -1,
+    }
+    try:
+        capture = await page.evaluate(_DOM_EXTRACT_SCRIPT, opts)
+    except Exception as e:
+        print(f"[❌] DOM extraction failed: {e}")
+        return []
+
+    for element in capture["elements"]:
+        element["page_name"] = page_name
 
-    for element in elements:
+    if capture["mode"] == "incremental":
+        elements = cached["elements"]
+        dx = capture["scroll_x"] - cached["scroll_x"]
+        dy = capture["scroll_y"] - cached["scroll_y"]
+        if dx or dy:
+            for element in elements.values():
+                element["x"] -= dx
+                element["y"] -= dy
+        for capture_id in capture["removed"] + capture["scanned"]:
+            elements.pop(capture_id, None)
+        for element in capture["elements"]:
+            elements[element["capture_id"]] = element
+    else:
+        elements = {element["capture_id"]: element for element in capture["elements"]}
+
+    DOM_CAPTURE_CACHE[page_name] = {
+        "url": capture["url"],
+        "generation": capture["generation"],
+        "scroll_x": capture["scroll_x"],
+        "scroll_y": capture["scroll_y"],
+        "elements": elements,
+    }
+    LAST_CAPTURE_INFO = {
+        "mode": capture["mode"],
+        "extracted": len(capture["elements"]),
+        "removed": len(capture["removed"]),
+        "total": len(elements),
+    }
+    print(f"[DOM] {capture['mode']} capture: {len(capture['elements'])} extracted, {len(elements)} cached for {page_name}")
+    return [dict(element) for element in elements.values()]
+
+# ✅ OCR bbox -> top-left point (same parsing as bbox_distance)
+def _bbox_origin(bbox):
+    if isinstance(bbox, str):
         try:
-            if await element.is_visible():
-                tag_name = await element.evaluate("el => el.tagName")
-                text = await element.text_content()
-                bounding_box = await element.bounding_box()
-
-                if not tag_name or not text or not bounding_box:
-                    continue
-
-                data.append({
-                    "page_name": page_name,
-                    "tag_name": tag_name,
-                    "text": text.strip(),
-                    "x": bounding_box["x"],
-                    "y": bounding_box["y"],
-                    "width": bounding_box["width"],
-                    "height": bounding_box["height"]
-                })
-        except Exception as inner_error:
-            print(f"[⚠️] Skipping element due to error: {inner_error}")
-            continue
+            x, y, _, _ = map(int, bbox.split(','))
+            return float(x), float(y)
+        except Exception as e:
+            print(f"[❌] Invalid bbox string: {bbox} — Error: {e}")
+            return None
+    try:
+        return float(bbox["x"]), float(bbox["y"])
+    except Exception:
+        return None
 
-    return data
+# ✅ Candidate (ocr, dom) pairs whose top-left points are within `radius`, via a uniform grid over DOM points
+def _spatial_candidates(ocr_xy: np.ndarray, dom_xy: np.ndarray, radius: float):
+    cell = max(float(radius), 1.0)
+    grid = defaultdict(list)
+    for j, (cx, cy) in enumerate(np.floor(dom_xy / cell).astype(np.int64)):
+        grid[(cx, cy)].append(j)
+
+    ocr_idx, dom_idx = [], []
+    for i, (cx, cy) in enumerate(np.floor(ocr_xy / cell).astype(np.int64)):
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                bucket = grid.get((cx + dx, cy + dy))
+                if bucket:
+                    ocr_idx.extend([i] * len(bucket))
+                    dom_idx.extend(bucket)
+
+    ocr_idx = np.asarray(ocr_idx, dtype=np.int64)
+    dom_idx = np.asarray(dom_idx, dtype=np.int64)
+    if ocr_idx.size:
+        dist = np.linalg.norm(ocr_xy[ocr_idx] - dom_xy[dom_idx], axis=1)
+        keep = dist <= radius
+        ocr_idx, dom_idx = ocr_idx[keep], dom_idx[keep]
+    return ocr_idx, dom_idx
 
 # ✅ Match and update OCR data with DOM data
-def match_and_update(ocr_data, dom_data, collection, text_thresh=0.5, bbox_thresh=300):
+def match_and_update(ocr_data, dom_data, text_thresh=0.5, bbox_thresh=300):
+    """
+    For each OCR entry pick the DOM node with the highest text similarity (>= text_thresh)
+    whose top-left corner lies within bbox_thresh px. Every text is embedded once; only
+    spatially close pairs are scored, and all matches are queued on the element store.
+    """
     global LAST_MATCHED_RESULTS
     matched_records = []
 
     print(f"[DEBUG] Matching {len(ocr_data)} OCRs with {len(dom_data)} DOMs")
 
+    ocrs, ocr_points = [], []
     for ocr in ocr_data:
         if not ocr.get("text") or not ocr.get("bbox"):
             print(f"[SKIP] OCR missing text or bbox: {ocr}")
             continue
+        point = _bbox_origin(ocr["bbox"])
+        if point is not None:
+            ocrs.append(ocr)
+            ocr_points.append(point)
+
+    doms, dom_points = [], []
+    for dom in dom_data:
+        if not dom.get("text"):
+            continue
+        try:
+            dom_points.append((float(dom["x"]), float(dom["y"])))
+        except (KeyError, TypeError, ValueError):
+            continue
+        doms.append(dom)
+
+    if ocrs and doms:
+        ocr_idx, dom_idx = _spatial_candidates(np.asarray(ocr_points), np.asarray(dom_points), bbox_thresh)
+        print(f"[DEBUG] {len(ocr_idx)} candidate pairs within {bbox_thresh}px (of {len(ocrs) * len(doms)})")
+
+        if ocr_idx.size:
+            # Embed only texts that take part in a candidate pair, each unique string once.
+            texts = [o["text"].lower() for o in ocrs] + [d["text"].lower() for d in doms]
+            used = np.concatenate([np.unique(ocr_idx), len(ocrs) + np.unique(dom_idx)])
+            unique_texts, inverse = np.unique([texts[k] for k in used], return_inverse=True)
+            vectors = embedding_service.embed(list(unique_texts), normalize=True)
+            row_of = np.full(len(texts), -1, dtype=np.int64)
+            row_of[used] = inverse
+
+            ocr_vecs = vectors[row_of[ocr_idx]]
+            dom_vecs = vectors[row_of[len(ocrs) + dom_idx]]
+            sims = np.einsum("ij,ij->i", ocr_vecs, dom_vecs)
+
+            keep = sims >= text_thresh
+            ocr_idx, dom_idx, sims = ocr_idx[keep], dom_idx[keep], sims[keep]
+
+            # Best DOM per OCR: highest similarity, earliest DOM on ties.
+            order = np.lexsort((dom_idx, -sims, ocr_idx))
+            ocr_idx, dom_idx = ocr_idx[order], dom_idx[order]
+            _, first = np.unique(ocr_idx, return_index=True)
+
+            timestamp = datetime.utcnow().isoformat()
+            for i, j in zip(ocr_idx[first], dom_idx[first]):
+                best_match = doms[j]
+                updated = ocrs[i].copy()
+                updated.update({
+                    "tag_name": best_match.get("tag_name", ""),
+                    "x": best_match.get("x", ""),
+                    "y": best_match.get("y", ""),
+                    "width": best_match.get("width", ""),
+                    "height": best_match.get("height", ""),
+                    "dom_matched": True,
+                    "match_timestamp": timestamp
+                })
+                matched_records.append(updated)
 
-        best_match = None
-        best_score = 0.0
-
-        if isinstance(ocr["bbox"], str):
-            print(f"[DEBUG] Parsing bbox string: {ocr['bbox']}")
-
-        for dom in dom_data:
-            if not dom.get("text"):
-                continue
-
-            sim = text_similarity(ocr["text"].lower(), dom["text"].lower())
-            dist = bbox_distance(ocr["bbox"], {"x": dom["x"], "y": dom["y"]})
-
-            print(f"[CHECK] '{ocr['text']}' vs '{dom['text']}' | sim={sim:.2f} dist={dist:.1f}")
-
-            if sim >= text_thresh and dist <= bbox_thresh and sim > best_score:
-                best_match = dom
-                best_score = sim
-
-        if best_match:
-            updated = ocr.copy()
-            updated.update({
-                "tag_name": best_match.get("tag_name", ""),
-                "x": best_match.get("x", ""),
-                "y": best_match.get("y", ""),
-                "width": best_match.get("width", ""),
-                "height": best_match.get("height", ""),
-                "dom_matched": True,
-                "match_timestamp": datetime.utcnow().isoformat()
-            })
-
-            collection.upsert(
-                ids=[updated["id"]],
-                documents=[updated["text"]],
-                metadatas=[updated],
-            )
-            matched_records.append(updated)
+    if matched_records:
+        element_store.upsert_elements(matched_records, documents=[r["text"] for r in matched_records])
 
     LAST_MATCHED_RESULTS = matched_records
     print(f"[DEBUG] Final matched_records = {len(matched_records)}")
@@ -5,6 +5,9 @@ from urllib.parse import urlparse
 from datetime import datetime
 import uuid
 from utils.match_utils import normalize_page_name
+from services.embedding_service import embedding_service
+from services.chroma_writer import chroma_writer
+from services.element_store import element_store
 
 def sanitize_metadata(record: dict) -> dict:
     sanitized = {}
@@ -19,6 +22,7 @@ def sanitize_metadata(record: dict) -> dict:
 
 async def process_url_and_update_chroma(url: str, chroma_collection=None, embedding_function=None, page_name: str = None) -> list[dict]:
     element_metadata = []
+    pending = []
     page_name = page_name or normalize_page_name(url)
     snapshot_id = f"{page_name}_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}"
 
@@ -94,28 +98,34 @@ async def process_url_and_update_chroma(url: str, chroma_collection=None, embedd
             print(f"   🏷️  [DEBUG] Extracted locator for tag: {tag_name}, label: '{label_text}', page_name: {page_name}")
 
             if chroma_collection:
-                embedding = None
-                if embedding_function:
-                    try:
-                        text_to_embed = label_text.strip() or tag.get("aria-label") or tag.get("placeholder") or tag.get("alt") or tag.get("name") or tag.get_text(strip=True) or document_content
-                        embedding = embedding_function([text_to_embed])[0]
-                    except Exception as emb_err:
-                        print(f"⚠️ [EMBEDDING] Failed: {emb_err}")
-
-                try:
-                    sanitized_record = sanitize_metadata(record)
-                    embedding_vector = embedding.tolist() if embedding is not None else None
-                    chroma_collection.upsert(
-                        ids=[element_id],
-                        documents=[text_to_embed],
-                        metadatas=[sanitized_record],
-                        embeddings=[embedding_vector] if embedding_vector else None
-                    )
-                    print(f"✅ [CHROMA] Upserted locator {element_id} into ChromaDB.")
-                except Exception as insert_err:
-                    print(f"❌ [CHROMA] Failed to upsert {element_id}: {insert_err}")
+                text_to_embed = label_text.strip() or tag.get("aria-label") or tag.get("placeholder") or tag.get("alt") or tag.get("name") or tag.get_text(strip=True) or document_content
+                pending.append((element_id, text_to_embed, sanitize_metadata(record)))
 
         await browser.close()
 
+    if chroma_collection and pending:
+        ids = [item[0] for item in pending]
+        documents = [item[1] for item in pending]
+        metadatas = [item[2] for item in pending]
+        embeddings = None
+        if embedding_function is not None and embedding_function is not embedding_service:
+            try:
+                embeddings = list(embedding_function(documents))
+            except Exception as emb_err:
+                print(f"⚠️ [EMBEDDING] Failed: {emb_err}")
+        # One batched write; the shared embedding service fills in missing vectors.
+        if chroma_collection is element_store.elements:
+            ticket = element_store.upsert_elements([dict(m, id=i) for i, m in zip(ids, metadatas)], documents=documents, embeddings=embeddings)
+        else:
+            ticket = chroma_writer.upsert(chroma_collection, ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings)
+        errors = await chroma_writer.flush_async([ticket])
+        # The element store's commit hook spatially indexes its own records; other collections
+        # aren't resolvable through the element store, so they are never indexed.
+        failed = {error.id for error in errors}
+        for element_id in ids:
+            if element_id in failed:
+                print(f"❌ [CHROMA] Failed to upsert {element_id}")
+        print(f"✅ [CHROMA] Upserted {len(ids) - len(failed)} locators into ChromaDB.")
+
     print(f"✅ [DEBUG] Total locators extracted from {url}: {len(element_metadata)}")
     return element_metadata
@@ -9,6 +9,11 @@ from apis.enrichment_api import router as enrichment_router
 from apis.rag_testcase_runner import router as rag_router
 from apis.generate_from_story import router as generate_from_story_router
 from apis.generate_from_manual_testcases import router as generate_from_manual_testcase_router
+from apis.health_api import router as health_router
+from apis.spatial_api import router as spatial_router
+from services.ocr_engine import shutdown_pool as shutdown_ocr_pool
+from services.chroma_writer import chroma_writer
+from services.model_registry import warmup_models, warmup_targets
 import sys
 import asyncio
 import os
@@ -64,13 +69,35 @@ async def global_exception_handler(request: Request, exc: Exception):
         headers=headers,
     )
 
+# ✅ Scope Chroma write failures to the request that queued them (see services/chroma_writer.py)
+@app.middleware("http")
+async def track_chroma_writes(request: Request, call_next):
+    with chroma_writer.track():
+        return await call_next(request)
+
+# ✅ Warm up models in the background so the server accepts requests immediately
+@app.on_event("startup")
+async def start_model_warmup():
+    names = warmup_targets()
+    if not names:
+        return
+    app.state.model_warmup = asyncio.create_task(warmup_models(names))
+
+# ✅ Stop OCR worker processes and drain queued Chroma writes on shutdown
+@app.on_event("shutdown")
+async def shutdown_ocr_engine():
+    shutdown_ocr_pool()
+    chroma_writer.flush()
+
 # ✅ Include API routers
+app.include_router(health_router)
 app.include_router(image_router)
 app.include_router(generate_from_story_router)
 app.include_router(enrichment_router)
 app.include_router(rag_router)
 app.include_router(debug_chroma_export_router)
 app.include_router(generate_from_manual_testcase_router)
+app.include_router(spatial_router)
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="127.0.0.1", port=8001, reload=False)
@@ -0,0 +1,135 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import torch
+from PIL import Image
+from torchvision import models, transforms
+
+# Accuracy-parity + latency check: eager PyTorch vs ONNX Runtime (fp32 / int8)
+# for the YOLO UI detector and the MobileNet OCR-type classifier.
+# Run from anywhere: python ml_models_training/scripts/benchmark_onnx.py
+
+# Paths
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+backend_dir = os.path.abspath(os.path.join(base_dir, ".."))
+sys.path.insert(0, backend_dir)
+
+from services.inference_backend import OnnxClassifier, export_mobilenet_onnx, export_yolo_onnx  # noqa: E402
+
+yolo_weights = os.path.join(base_dir, "models", "ui_elements_yolov8", "weights", "best.pt")
+yolo_config = os.path.join(base_dir, "config", "yolov8_config.yaml")
+yolo_val_dir = os.path.join(base_dir, "data", "yolo_ui_detection", "images", "val")
+mobilenet_weights = os.path.join(base_dir, "models", "mobilenet_v2_ocr.pth")
+ocr_type_dir = os.path.join(base_dir, "data", "ocr_type")
+
+transform = transforms.Compose([
+    transforms.Resize((224, 224)),
+    transforms.ToTensor(),
+])
+
+
+def median_ms(fn, repeats: int) -> float:
+    fn()  # warmup
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
+
+
+def size_mb(path: str) -> float:
+    return os.path.getsize(path) / (1024 * 1024)
+
+
+def benchmark_mobilenet(repeats: int) -> float:
+    model = models.mobilenet_v2(pretrained=False)
+    model.classifier[1] = torch.nn.Linear(model.last_channel, 3)
+    model.load_state_dict(torch.load(mobilenet_weights, map_location="cpu"))
+    model.eval()
+
+    image_paths = sorted(
+        os.path.join(root, name)
+        for root, _, files in os.walk(ocr_type_dir)
+        for name in files
+        if name.lower().endswith((".png", ".jpg", ".jpeg"))
+    )
+    batch = torch.stack([transform(Image.open(p).convert("RGB")) for p in image_paths])
+    # Pad the tiny sample set to a realistic per-page batch size for latency numbers.
+    latency_batch = batch.repeat((64 + len(batch) - 1) // len(batch), 1, 1, 1)[:64]
+
+    with torch.inference_mode():
+        reference = model(batch).numpy()
+
+    def run_torch(x):
+        with torch.inference_mode():
+            return model(x).numpy()
+
+    variants = {"torch": (run_torch, mobilenet_weights)}
+    for quantize in (False, True):
+        onnx_path = export_mobilenet_onnx(model, mobilenet_weights, quantize=quantize)
+        classifier = OnnxClassifier(onnx_path)
+        variants["onnx-int8" if quantize else "onnx-fp32"] = (lambda x, c=classifier: c(x.numpy()), onnx_path)
+
+    print(f"\n[MobileNet] {len(image_paths)} crops from {ocr_type_dir}")
+    print(f"{'backend':<10} {'agree':>7} {'max|dlogit|':>12} {'1x ms':>8} {'64x ms':>8} {'size MB':>8}")
+    worst = 1.0
+    for name, (run, path) in variants.items():
+        logits = run(batch)
+        agreement = float((logits.argmax(1) == reference.argmax(1)).mean())
+        worst = min(worst, agreement)
+        single = median_ms(lambda: run(batch[:1]), repeats)
+        batched = median_ms(lambda: run(latency_batch), repeats)
+        print(f"{name:<10} {agreement:>7.2%} {np.abs(logits - reference).max():>12.4f} {single:>8.2f} {batched:>8.2f} {size_mb(path):>8.2f}")
+    return worst
+
+
+def benchmark_yolo(repeats: int) -> float:
+    from ultralytics import YOLO
+
+    val_images = sorted(os.path.join(yolo_val_dir, f) for f in os.listdir(yolo_val_dir) if f.lower().endswith(".png"))
+    variants = {
+        "torch": yolo_weights,
+        "onnx-fp32": export_yolo_onnx(yolo_weights, quantize=False),
+        "onnx-int8": export_yolo_onnx(yolo_weights, quantize=True),
+    }
+
+    print(f"\n[YOLO] validation set {yolo_config}")
+    print(f"{'backend':<10} {'mAP50':>7} {'mAP50-95':>9} {'img ms':>8} {'size MB':>8}")
+    reference_map = None
+    worst = 1.0
+    for name, path in variants.items():
+        model = YOLO(path, task="detect")
+        metrics = model.val(data=yolo_config, imgsz=640, device="cpu", plots=False, verbose=False)
+        map50, map5095 = float(metrics.box.map50), float(metrics.box.map)
+        if reference_map is None:
+            reference_map = map50
+        elif reference_map > 0:
+            worst = min(worst, map50 / reference_map)
+        image = Image.open(val_images[0]).convert("RGB")
+        latency = median_ms(lambda: model.predict(source=image, conf=0.10, save=False, verbose=False), repeats)
+        print(f"{name:<10} {map50:>7.3f} {map5095:>9.3f} {latency:>8.2f} {size_mb(path):>8.2f}")
+    return worst
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare PyTorch and ONNX Runtime inference on CPU.")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--min-parity", type=float, default=0.98, help="Minimum top-1 agreement / relative mAP50")
+    parser.add_argument("--skip-yolo", action="store_true")
+    parser.add_argument("--skip-mobilenet", action="store_true")
+    args = parser.parse_args()
+
+    torch.set_num_threads(os.cpu_count() or 1)
+    parity = 1.0
+    if not args.skip_mobilenet:
+        parity = min(parity, benchmark_mobilenet(args.repeats))
+    if not args.skip_yolo:
+        parity = min(parity, benchmark_yolo(args.repeats))
+
+    if parity < args.min_parity:
+        print(f"\n[❌] Parity {parity:.2%} below threshold {args.min_parity:.2%}")
+        sys.exit(1)
+    print(f"\n[✅] Parity {parity:.2%} (threshold {args.min_parity:.2%})")
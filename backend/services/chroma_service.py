@@ -1,15 +1,14 @@
-import chromadb
-from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
-from config.settings import CHROMA_PATH
+from services.element_store import element_store, sanitize_value, sanitize_element
+from services.embedding_service import embedding_service
 from fastapi.concurrency import run_in_threadpool
-from services.ocr_type_classifier import classify_ocr_type
+from services.ocr_type_classifier import classify_ocr_types
 import logging
-import json
 
-# Setup ChromaDB client and collection
-embedding_function = SentenceTransformerEmbeddingFunction(model_name="all-MiniLM-L6-v2")
-client = chromadb.PersistentClient(path=CHROMA_PATH)
-collection = client.get_or_create_collection(name="login_page", embedding_function=embedding_function)
+# OCR text and locators are stored in the unified element store (element_metadata);
+# these names are kept for existing importers.
+embedding_function = embedding_service
+client = element_store.client
+collection = element_store.elements
 
 # Logger
 error_logger = logging.getLogger("chroma_upsert_errors")
@@ -18,60 +17,66 @@ handler = logging.FileHandler("chroma_upsert_errors.log")
 handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
 error_logger.addHandler(handler)
 
-def _sanitize_metadata_value(value):
-    if value is None:
-        return ""
-    if isinstance(value, (dict, list)):
-        return json.dumps(value)
-    return value
-
-def upsert_text_record(record: dict):
-    print(f"[DEBUG] Upserting OCR record: {record}")
-    bbox_values = record.get('bbox') or [0, 0, 0, 0]
-    bbox_str = ",".join(map(str, bbox_values))
-
-    metadata = {
-        "element_id": _sanitize_metadata_value(record.get("id")),
-        "page_name": _sanitize_metadata_value(record.get("page")),
-        "intent": _sanitize_metadata_value(record.get("text")),
-        "tag": "",
-        "label_text": _sanitize_metadata_value(record.get("text")),
-        "css_selector": "",
-        "get_by_text": _sanitize_metadata_value(record.get("text")),
-        "get_by_role": "",
-        "xpath": "",
-        "x": bbox_values[0],
-        "y": bbox_values[1],
-        "width": bbox_values[2],
-        "height": bbox_values[3],
-        "bbox": bbox_str,
-        "position_relation": "",
-        "html_snippet": "",
-        "confidence_score": 0.0,
-        "visibility_score": 0.0,
-        "locator_stability_score": 0.0,
-        "snapshot_id": "",
-        "timestamp": "",
-        "source_url": "",
-        "used_in_tests": "",
-        "last_tested": "",
-        "healing_success_rate": 0.0,
-        "region_image_path": _sanitize_metadata_value(record.get("region_image_path")),
-        "locator": _sanitize_metadata_value(record.get("locator")),
-        "ocr_type": classify_ocr_type(record.get("region_image_path", "")),
+_sanitize_metadata_value = sanitize_value
+
+def _record_box(record: dict) -> list:
+    bbox = record.get("bbox")
+    if isinstance(bbox, str):
+        try:
+            return [int(float(v)) for v in bbox.split(",")][:4]
+        except ValueError:
+            bbox = None
+    if isinstance(bbox, (list, tuple)) and len(bbox) == 4:
+        return list(bbox)
+    return [record.get("x") or 0, record.get("y") or 0, record.get("width") or 0, record.get("height") or 0]
+
+def _build_text_metadata(record: dict, ocr_type: str) -> dict:
+    """OCR record -> element_metadata schema (same fields as build_standard_metadata, type="ocr")."""
+    x, y, w, h = _record_box(record)
+    text = record.get("text") or record.get("label_text") or ""
+    metadata = dict(record)
+    metadata.pop("page", None)
+    metadata.update({
+        "element_id": record.get("element_id") or record.get("id"),
+        "page_name": record.get("page_name") or record.get("page") or "",
+        "text": text,
+        "label_text": record.get("label_text") or text,
+        "get_by_text": record.get("get_by_text") or text,
+        "x": x,
+        "y": y,
+        "width": w,
+        "height": h,
+        "bbox": f"{x},{y},{w},{h}",
+        "ocr_type": ocr_type,
         "type": "ocr"
-    }
+    })
+    return sanitize_element(metadata)
+
+def upsert_text_records(records: list[dict], region_images: list = None):
+    """
+    Queue many OCR records on the element store (one embedding and one index insert
+    per element). Records without an ocr_type are classified in one batched MobileNet
+    pass; pass `region_images` (PIL crops aligned with `records`) to skip re-reading
+    the PNGs from disk. Call element_store.flush() to persist.
+    """
+    if not records:
+        return
+    for record in records:
+        print(f"[DEBUG] Upserting OCR record: {record}")
+
+    if region_images is None:
+        region_images = [record.get("region_ref") or record.get("region_image_path", "") for record in records]
+    unclassified = [i for i, record in enumerate(records) if not record.get("ocr_type")]
+    ocr_types = [record.get("ocr_type") for record in records]
+    if unclassified:
+        for i, ocr_type in zip(unclassified, classify_ocr_types([region_images[i] for i in unclassified])):
+            ocr_types[i] = ocr_type
+    metadatas = [_build_text_metadata(record, ocr_type) for record, ocr_type in zip(records, ocr_types)]
+
+    element_store.upsert_elements(metadatas, documents=[m["text"] for m in metadatas])
 
-    try:
-        embedding_value = embedding_function([record["text"]])[0]
-        collection.upsert(
-            documents=[record["text"]],
-            metadatas=[metadata],
-            embeddings=[embedding_value],
-            ids=[record["id"]]
-        )
-    except Exception as e:
-        error_logger.warning(f"upsert_text_record failed: {str(e)} | Record: {record}")
+def upsert_text_record(record: dict):
+    upsert_text_records([record])
 
 def upsert_element_record(record: dict):
     document_content = record.get("html_snippet") or record.get("label_text") or record.get("intent")
@@ -104,23 +109,14 @@ def upsert_element_record(record: dict):
         "type": "locator"
     }
 
-    try:
-        embedding_value = record.get("combined_embedding") or record.get("text_embedding")
-        if not embedding_value:
-            embedding_value = embedding_function([document_content])[0]
-
-        collection.upsert(
-            documents=[document_content],
-            metadatas=[metadata],
-            embeddings=[embedding_value],
-            ids=[record["element_id"]]
-        )
-    except Exception as e:
-        error_logger.warning(f"upsert_element_record failed: {str(e)} | Record: {record}")
+    # Missing embeddings are computed by the writer, batched with other queued records.
+    metadata["id"] = metadata["element_id"]
+    embedding_value = record.get("combined_embedding") or record.get("text_embedding") or None
+    element_store.upsert_elements([metadata], documents=[document_content], embeddings=[embedding_value])
 
 def fetch_ocr_entries():
     try:
-        results = collection.get(where={"type": "ocr"})
+        results = element_store.get_where({"type": "ocr"})
         ocr_entries = []
         for id_, doc, meta in zip(results["ids"], results["documents"], results["metadatas"]):
             ocr_entries.append({
@@ -141,18 +137,8 @@ def fetch_ocr_entries():
 def _update_locator_by_text_sync(entry_id: str, locator: str):
     """Synchronously update the locator field for a given record."""
     try:
-        item = collection.get(ids=[entry_id])
-        doc = item["documents"][0]
-        meta = item["metadatas"][0]
-        meta["locator"] = locator
-        meta["source_type"] = "url"
-        meta_sanitized = {k: _sanitize_metadata_value(v) for k, v in meta.items()}
-
-        collection.upsert(
-            documents=[doc],
-            metadatas=[meta_sanitized],
-            ids=[entry_id]
-        )
+        if not element_store.update_metadata(entry_id, locator=locator, source_type="url"):
+            error_logger.warning(f"_update_locator_by_text_sync: no element with ID: {entry_id}")
     except Exception as e:
         error_logger.warning(f"_update_locator_by_text_sync failed: {str(e)} | ID: {entry_id}")
 
@@ -0,0 +1,258 @@
+import asyncio
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import NamedTuple
+from config.settings import CHROMA_WRITE_BATCH_SIZE, CHROMA_WRITE_MAX_DELAY_MS
+from services.embedding_service import embedding_service
+
+# Write-behind pipeline for Chroma: writers enqueue records per collection and a
+# single worker flushes them as one embed + one upsert/add per batch, either when
+# a buffer reaches CHROMA_WRITE_BATCH_SIZE or after CHROMA_WRITE_MAX_DELAY_MS.
+# Request handlers call flush() (or flush_async()) before responding.
+#
+# Every enqueue returns a WriteTicket that resolves once its records are written and
+# carries only their failures. Tickets enqueued inside `track()` (one per HTTP request,
+# see main.py) are collected in a context variable, so flush() reports the failures of
+# the current request and never those queued by other requests.
+
+error_logger = logging.getLogger("chroma_upsert_errors")
+
+
+class WriteError(NamedTuple):
+    collection: str
+    id: str
+    error: str
+
+
+class WriteTicket:
+    """Completion handle for one enqueue: resolved when each of its ids has been written or has failed."""
+
+    def __init__(self, ids):
+        self._pending = set(ids)
+        self.errors = []
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        if not self._pending:
+            self._done.set()
+
+    def _resolve(self, record_id: str, error: WriteError = None) -> None:
+        with self._lock:
+            if record_id not in self._pending:
+                return
+            self._pending.discard(record_id)
+            if error is not None:
+                self.errors.append(error)
+            if not self._pending:
+                self._done.set()
+
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: float = None) -> list[WriteError]:
+        self._done.wait(timeout)
+        return list(self.errors)
+
+
+_tracked_tickets: ContextVar = ContextVar("chroma_write_tickets", default=None)
+
+
+class _Buffer:
+    def __init__(self, collection, op: str):
+        self.collection = collection
+        self.op = op
+        self.records = {}  # id -> (document, metadata, embedding, tickets); later writes to an id win
+        self.since = None
+
+
+class ChromaWriter:
+    def __init__(self, batch_size: int = CHROMA_WRITE_BATCH_SIZE, max_delay_ms: float = CHROMA_WRITE_MAX_DELAY_MS,
+                 embedding_function=embedding_service):
+        self.batch_size = max(1, batch_size)
+        self.max_delay = max_delay_ms / 1000.0
+        self.embedding_function = embedding_function
+        self.batches = 0
+        self.records = 0
+        self.failed = 0
+        self._buffers = {}
+        self._commit_hooks = {}
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._thread = None
+
+    def _ensure_worker(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._worker, name="chroma-writer", daemon=True)
+            self._thread.start()
+
+    def _enqueue(self, op: str, collection, ids, documents, metadatas, embeddings) -> WriteTicket:
+        ticket = WriteTicket(ids or [])
+        tracked = _tracked_tickets.get()
+        if tracked is not None:
+            tracked.append(ticket)
+        if not ids:
+            return ticket
+        documents = documents or [None] * len(ids)
+        metadatas = metadatas or [None] * len(ids)
+        embeddings = embeddings if embeddings is not None else [None] * len(ids)
+        with self._cond:
+            self._ensure_worker()
+            key = (collection.name, op)
+            buffer = self._buffers.get(key)
+            if buffer is None:
+                buffer = self._buffers[key] = _Buffer(collection, op)
+            if buffer.since is None:
+                buffer.since = time.monotonic()
+            for record_id, document, metadata, embedding in zip(ids, documents, metadatas, embeddings):
+                # A superseded record resolves with the write that replaces it.
+                previous = buffer.records.pop(record_id, None)
+                tickets = (previous[3] if previous else []) + [ticket]
+                buffer.records[record_id] = (document, metadata, embedding, tickets)
+            if len(buffer.records) >= self.batch_size:
+                self._cond.notify()
+        return ticket
+
+    def on_commit(self, collection_name: str, hook) -> None:
+        """Call `hook(ids, metadatas)` with the records of every upsert batch once Chroma has accepted them."""
+        self._commit_hooks.setdefault(collection_name, []).append(hook)
+
+    def _run_commit_hooks(self, name: str, ids: list, metadatas: list) -> None:
+        for hook in self._commit_hooks.get(name, ()):
+            try:
+                hook(ids, metadatas)
+            except Exception as e:
+                error_logger.warning(f"[{name}] commit hook failed for {len(ids)} records: {str(e)}")
+
+    def upsert(self, collection, ids: list[str], documents: list[str] = None, metadatas: list[dict] = None,
+               embeddings: list = None) -> WriteTicket:
+        """Queue an upsert; records without an embedding are embedded together at flush time."""
+        return self._enqueue("upsert", collection, ids, documents, metadatas, embeddings)
+
+    def add(self, collection, ids: list[str], documents: list[str] = None, metadatas: list[dict] = None,
+            embeddings: list = None) -> WriteTicket:
+        """Queue an add (existing ids are left untouched, as with collection.add)."""
+        return self._enqueue("add", collection, ids, documents, metadatas, embeddings)
+
+    def _take(self, force: bool) -> list:
+        """Detach buffers that are due (all of them when `force`); caller holds self._cond."""
+        now = time.monotonic()
+        due = []
+        for key, buffer in list(self._buffers.items()):
+            if not buffer.records:
+                continue
+            if force or len(buffer.records) >= self.batch_size or now - buffer.since >= self.max_delay:
+                due.append(buffer)
+                del self._buffers[key]
+        return due
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                self._cond.wait(timeout=self.max_delay)
+            # Take and write under the write lock so flush() never returns while a batch is in flight.
+            with self._write_lock:
+                with self._cond:
+                    due = self._take(force=False)
+                if due:
+                    self._write(due)
+
+    def _embed(self, documents: list) -> list:
+        return list(self.embedding_function([document or "" for document in documents]))
+
+    def _write(self, buffers: list) -> None:
+        for buffer in buffers:
+            ids = list(buffer.records)
+            documents = [buffer.records[i][0] for i in ids]
+            metadatas = [buffer.records[i][1] for i in ids]
+            embeddings = [buffer.records[i][2] for i in ids]
+            write = buffer.collection.add if buffer.op == "add" else buffer.collection.upsert
+            name = buffer.collection.name
+
+            for start in range(0, len(ids), self.batch_size):
+                chunk = slice(start, start + self.batch_size)
+                try:
+                    errors = self._write_chunk(name, write, ids[chunk], documents[chunk], metadatas[chunk], embeddings[chunk])
+                except Exception as e:
+                    errors = [WriteError(name, record_id, str(e)) for record_id in ids[chunk]]
+                failed = {error.id: error for error in errors}
+                if buffer.op == "upsert":
+                    committed = [k for k in range(len(ids))[chunk] if ids[k] not in failed]
+                    if committed:
+                        self._run_commit_hooks(name, [ids[k] for k in committed], [metadatas[k] for k in committed])
+                for record_id in ids[chunk]:
+                    for ticket in buffer.records[record_id][3]:
+                        ticket._resolve(record_id, failed.get(record_id))
+
+    def _write_chunk(self, name: str, write, ids, documents, metadatas, embeddings) -> list:
+        try:
+            missing = [k for k, embedding in enumerate(embeddings) if embedding is None]
+            if missing:
+                for k, vector in zip(missing, self._embed([documents[k] for k in missing])):
+                    embeddings[k] = vector
+            write(ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings)
+            self.batches += 1
+            self.records += len(ids)
+            return []
+        except Exception as e:
+            error_logger.warning(f"[{name}] batch of {len(ids)} failed, retrying per record: {str(e)}")
+
+        errors = []
+        for record_id, document, metadata, embedding in zip(ids, documents, metadatas, embeddings):
+            try:
+                if embedding is None:
+                    embedding = self._embed([document])[0]
+                write(ids=[record_id], documents=[document], metadatas=[metadata], embeddings=[embedding])
+                self.records += 1
+            except Exception as e:
+                self.failed += 1
+                error_logger.warning(f"[{name}] write failed: {str(e)} | ID: {record_id} | Metadata: {metadata}")
+                errors.append(WriteError(name, record_id, str(e)))
+        return errors
+
+    def flush(self, tickets=None) -> list[WriteError]:
+        """
+        Write everything queued so far and return the failures of `tickets`. By default
+        those are the tickets tracked in the current context since its previous flush;
+        pass `tickets=()` to write without consuming them.
+        """
+        with self._write_lock:
+            with self._cond:
+                due = self._take(force=True)
+            self._write(due)
+        if tickets is None:
+            tracked = _tracked_tickets.get()
+            tickets = list(tracked) if tracked else []
+            if tracked:
+                del tracked[:len(tickets)]
+        # A record superseded within the batch reports its failure on both tickets.
+        return list(dict.fromkeys(error for ticket in tickets for error in ticket.wait()))
+
+    async def flush_async(self, tickets=None) -> list[WriteError]:
+        return await asyncio.to_thread(self.flush, tickets)
+
+    @contextmanager
+    def track(self):
+        """Collect the tickets enqueued in this context (and tasks/threads spawned from it) for flush()."""
+        token = _tracked_tickets.set([])
+        try:
+            yield
+        finally:
+            _tracked_tickets.reset(token)
+
+    def pending(self) -> int:
+        with self._cond:
+            return sum(len(buffer.records) for buffer in self._buffers.values())
+
+    def stats(self) -> dict:
+        return {
+            "pending": self.pending(),
+            "batches": self.batches,
+            "records": self.records,
+            "failed": self.failed,
+            "avg_batch_records": round(self.records / self.batches, 2) if self.batches else 0.0,
+        }
+
+
+chroma_writer = ChromaWriter()
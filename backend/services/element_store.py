@@ -0,0 +1,129 @@
+import json
+import threading
+import chromadb
+from config.settings import CHROMA_PATH
+from services.embedding_service import embedding_service
+from services.chroma_writer import chroma_writer, WriteTicket
+from services.spatial_index import spatial_index
+from services.page_catalog import PageCatalog
+
+# Single owner of the Chroma client. Every element (OCR text, DOM-matched element,
+# locator) lives in the `element_metadata` collection with one flat metadata schema,
+# is embedded by the shared embedding service and written once through the batched
+# writer. Writes also update the spatial index and the page catalog, so page listings
+# and position lookups never scan the collection. Both are updated from the writer's
+# commit hook, so they never list an element whose write failed, and the catalog
+# version (the ETag of page listings) only moves once the new data is readable.
+
+ELEMENT_COLLECTION = "element_metadata"
+
+
+def sanitize_value(value):
+    """Chroma metadata values must be str/int/float/bool."""
+    if value is None:
+        return ""
+    if isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, (dict, list, tuple)):
+        return json.dumps(value)
+    return str(value)
+
+
+def sanitize_element(metadata: dict) -> dict:
+    return {key: sanitize_value(value) for key, value in metadata.items()}
+
+
+class ElementStore:
+    def __init__(self, path: str = CHROMA_PATH, embedding_function=embedding_service, writer=chroma_writer):
+        self.client = chromadb.PersistentClient(path=path)
+        self.elements = self.client.get_or_create_collection(name=ELEMENT_COLLECTION, embedding_function=embedding_function)
+        self.writer = writer
+        self.catalog = PageCatalog()
+        self._catalog_lock = threading.Lock()
+        self.writer.on_commit(ELEMENT_COLLECTION, self._on_commit)
+
+    def _on_commit(self, ids: list[str], metadatas: list[dict]) -> None:
+        spatial_index.upsert(ids, metadatas)
+        self.catalog.record(ids, metadatas)
+
+    # ---------- writes (queued; call flush()/flush_async() at request boundaries) ----------
+
+    def upsert_elements(self, metadatas: list[dict], documents: list[str] = None, embeddings: list = None) -> WriteTicket:
+        """Queue elements keyed by metadata["id"]; the document defaults to the element text."""
+        metadatas = [sanitize_element(m) for m in metadatas]
+        ids = [str(m["id"]) for m in metadatas]
+        if documents is None:
+            documents = [str(m.get("text") or m.get("label_text") or "") for m in metadatas]
+        return self.writer.upsert(self.elements, ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings)
+
+    def update_metadata(self, element_id: str, **fields) -> bool:
+        """Read-modify-write of selected metadata fields; the stored document and embedding are kept."""
+        self._drain()
+        item = self.elements.get(ids=[element_id], include=["metadatas"])
+        if not item["ids"]:
+            return False
+        metadata = dict(item["metadatas"][0] or {})
+        metadata.update(sanitize_element(fields))
+        self.elements.update(ids=[element_id], metadatas=[metadata])
+        spatial_index.upsert([element_id], [metadata])
+        self.catalog.record([element_id], [metadata])
+        return True
+
+    def _drain(self) -> None:
+        """Make queued writes readable without consuming the caller's tracked write failures."""
+        self.writer.flush(tickets=())
+
+    def flush(self, tickets=None):
+        return self.writer.flush(tickets)
+
+    async def flush_async(self, tickets=None):
+        return await self.writer.flush_async(tickets)
+
+    # ---------- reads ----------
+
+    def get_by_ids(self, ids: list[str], include: list[str] = None) -> dict:
+        return self.elements.get(ids=list(ids), include=include or ["metadatas", "documents"])
+
+    def get_where(self, where: dict = None, include: list[str] = None, limit: int = None, offset: int = None) -> dict:
+        return self.elements.get(where=where or None, include=include or ["metadatas", "documents"], limit=limit, offset=offset)
+
+    def page_elements(self, page_name: str) -> list[dict]:
+        return self.get_where({"page_name": page_name}, include=["metadatas"])["metadatas"]
+
+    def all_metadatas(self) -> list[dict]:
+        return self.elements.get(include=["metadatas"])["metadatas"]
+
+    def count(self) -> int:
+        return self.elements.count()
+
+    # ---------- page catalog ----------
+
+    def _ensure_catalog(self) -> PageCatalog:
+        """One-time backfill of the catalog from the collection (first run after upgrade)."""
+        if not self.catalog.is_backfilled():
+            with self._catalog_lock:
+                if not self.catalog.is_backfilled():
+                    self._drain()
+                    records = self.elements.get(include=["metadatas"])
+                    self.catalog.rebuild(records["ids"], records["metadatas"])
+                    print(f"[CATALOG] Backfilled {len(records['ids'])} elements")
+        return self.catalog
+
+    def store_version(self) -> int:
+        return self._ensure_catalog().version()
+
+    def page_names(self) -> list[str]:
+        return self._ensure_catalog().page_names()
+
+    def page_summaries(self) -> list[dict]:
+        return self._ensure_catalog().pages()
+
+    def matched_elements(self) -> list[dict]:
+        self._drain()  # queued matches reach the catalog once committed
+        ids = self._ensure_catalog().matched_ids()
+        if not ids:
+            return []
+        return self.get_by_ids(ids, include=["metadatas"])["metadatas"]
+
+
+element_store = ElementStore()
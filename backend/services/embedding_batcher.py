@@ -0,0 +1,117 @@
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+import numpy as np
+from config.settings import EMBED_MICROBATCH_DELAY_MS, EMBED_MICROBATCH_MAX_ITEMS
+
+# Micro-batcher for embedding requests: encode calls from any coroutine or thread are
+# queued, a single worker collects them for a few milliseconds (or up to N texts),
+# runs one batched encode and resolves each caller's future with its own rows.
+
+
+class EmbeddingBatcher:
+    def __init__(self, encode_fn, max_delay_ms: float = EMBED_MICROBATCH_DELAY_MS, max_items: int = EMBED_MICROBATCH_MAX_ITEMS):
+        self.encode_fn = encode_fn
+        self.max_delay = max_delay_ms / 1000.0
+        self.max_items = max(1, max_items)
+        self.batches = 0
+        self.requests = 0
+        self.items = 0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+    def _ensure_worker(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._thread_lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._worker, name="embedding-batcher", daemon=True)
+                    self._thread.start()
+
+    def submit(self, texts: list[str]) -> Future:
+        future = Future()
+        if not texts:
+            future.set_result(None)
+            return future
+        self._ensure_worker()
+        self._queue.put((list(texts), future))
+        return future
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        """Blocking encode for threads; shares a batch with whatever else is queued."""
+        if threading.current_thread() is self._thread:
+            return self.encode_fn(list(texts))  # re-entrant call from inside a batch
+        return self.submit(texts).result()
+
+    async def encode_async(self, texts: list[str]) -> np.ndarray:
+        """Awaitable encode for coroutines; never blocks the event loop."""
+        return await asyncio.wrap_future(self.submit(texts))
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        count = len(batch[0][0])
+        deadline = time.monotonic() + self.max_delay
+        while count < self.max_items:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            count += len(item[0])
+        return batch
+
+    @staticmethod
+    def _resolve(future: Future, result=None, error: Exception = None) -> None:
+        try:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+        except InvalidStateError:
+            pass  # resolved elsewhere (e.g. cancelled between claim and resolve)
+
+    def _worker(self):
+        while True:
+            batch = []
+            try:
+                # Callers whose awaiting task was cancelled are dropped before encoding;
+                # claimed futures can no longer be cancelled underneath the worker.
+                batch = [(item_texts, future) for item_texts, future in self._collect()
+                         if future.set_running_or_notify_cancel()]
+                if not batch:
+                    continue
+                texts = [text for item_texts, _ in batch for text in item_texts]
+                try:
+                    vectors = self.encode_fn(texts)
+                except Exception as e:
+                    for _, future in batch:
+                        self._resolve(future, error=e)
+                    continue
+
+                self.batches += 1
+                self.requests += len(batch)
+                self.items += len(texts)
+                offset = 0
+                for item_texts, future in batch:
+                    self._resolve(future, vectors[offset:offset + len(item_texts)])
+                    offset += len(item_texts)
+            except Exception as e:
+                # The worker must outlive any single batch, or every later caller hangs.
+                print(f"[EMBED BATCHER] Batch failed: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        self._resolve(future, error=e)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "items": self.items,
+            "avg_batch_items": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "queued": self._queue.qsize(),
+        }
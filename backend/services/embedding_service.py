@@ -0,0 +1,151 @@
+import os
+import threading
+import numpy as np
+from chromadb import Documents, EmbeddingFunction, Embeddings
+from config.settings import (
+    SENTENCE_MODEL_NAME, EMBED_BATCH_SIZE, CACHE_PATH,
+    EMBED_CACHE_SIZE, EMBED_DISK_CACHE, EMBED_DISK_CACHE_MAX_ENTRIES, EMBED_MICROBATCH,
+)
+from services.model_registry import register_sentence_transformer, sentence_transformer
+from services.embedding_batcher import EmbeddingBatcher
+from utils.cache_utils import LRUCache, DiskCache, content_hash
+
+# One embedding service per process: every module and every Chroma collection
+# shares the same SentenceTransformer instance through it. Repeated UI vocabulary
+# ("Login", "Username", "Add to cart") is served from an LRU + SQLite cache keyed
+# by (model name, normalized text), so only unseen strings reach the model, and
+# concurrent misses from different requests are coalesced by the micro-batcher.
+
+
+def normalize_embedding_text(text) -> str:
+    """Cache-key normalization: trim and collapse whitespace (case and punctuation are kept)."""
+    return " ".join(str(text).split())
+
+
+class EmbeddingService(EmbeddingFunction):
+    """Batched, cached text embeddings; also usable directly as a Chroma EmbeddingFunction."""
+
+    def __init__(self, model_name: str = SENTENCE_MODEL_NAME, batch_size: int = EMBED_BATCH_SIZE,
+                 cache_size: int = EMBED_CACHE_SIZE, disk_cache: bool = EMBED_DISK_CACHE, microbatch: bool = EMBED_MICROBATCH):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        register_sentence_transformer(model_name)
+        self._memory = LRUCache(maxsize=cache_size)
+        self._disk = DiskCache(
+            os.path.join(CACHE_PATH, "embeddings.sqlite"),
+            max_entries=EMBED_DISK_CACHE_MAX_ENTRIES,
+            serializer="raw",
+        ) if disk_cache else None
+        self._batcher = EmbeddingBatcher(self._encode) if microbatch else None
+        self._stats_lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.encoded = 0
+
+    @property
+    def model(self):
+        return sentence_transformer(self.model_name)
+
+    def _encode(self, texts: list[str]) -> np.ndarray:
+        vectors = self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+        return np.asarray(vectors, dtype=np.float32)
+
+    def _disk_key(self, text: str) -> str:
+        return content_hash(self.model_name, text)
+
+    def _lookup(self, keys: list[str]) -> tuple[list, dict]:
+        """Resolve keys from memory, then disk (one query). Returns (vectors with None holes, {missing text: [indices]})."""
+        vectors = [None] * len(keys)
+        missing = {}
+        memory_hits = disk_hits = 0
+        for idx, key in enumerate(keys):
+            vector = self._memory.get(key)
+            if vector is None:
+                missing.setdefault(key, []).append(idx)
+            else:
+                vectors[idx] = vector
+                memory_hits += 1
+
+        if missing and self._disk is not None:
+            disk_keys = {self._disk_key(key): key for key in missing}
+            for disk_key, raw in self._disk.get_many(list(disk_keys)).items():
+                key = disk_keys[disk_key]
+                vector = np.frombuffer(raw, dtype=np.float32)
+                self._memory.put(key, vector)
+                for idx in missing.pop(key):
+                    vectors[idx] = vector
+                    disk_hits += 1
+
+        with self._stats_lock:
+            self.memory_hits += memory_hits
+            self.disk_hits += disk_hits
+            self.misses += sum(len(indices) for indices in missing.values())
+            self.encoded += len(missing)
+        return vectors, missing
+
+    def _store(self, vectors: list, missing: dict, encoded: np.ndarray) -> None:
+        new_texts = list(missing)
+        for text, vector in zip(new_texts, encoded):
+            self._memory.put(text, vector)
+            for idx in missing[text]:
+                vectors[idx] = vector
+        if self._disk is not None:
+            try:
+                self._disk.set_many({self._disk_key(t): v.tobytes() for t, v in zip(new_texts, encoded)})
+            except Exception as e:
+                print(f"[EMBED CACHE] Failed to persist {len(new_texts)} vectors: {e}")
+
+    def _finish(self, vectors: list, normalize: bool) -> np.ndarray:
+        result = np.stack(vectors).astype(np.float32, copy=False)
+        if normalize:
+            result = result / np.clip(np.linalg.norm(result, axis=1, keepdims=True), 1e-12, None)
+        return result
+
+    def _empty(self) -> np.ndarray:
+        return np.zeros((0, self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+
+    def embed(self, texts: list[str], normalize: bool = False) -> np.ndarray:
+        """Encode `texts` -> float32 array of shape (len(texts), dim); cache misses go to the model in one batch."""
+        keys = [normalize_embedding_text(t) for t in texts]
+        if not keys:
+            return self._empty()
+        vectors, missing = self._lookup(keys)
+        if missing:
+            new_texts = list(missing)
+            encoded = self._batcher.encode(new_texts) if self._batcher is not None else self._encode(new_texts)
+            self._store(vectors, missing, encoded)
+        return self._finish(vectors, normalize)
+
+    def embed_one(self, text: str, normalize: bool = False) -> np.ndarray:
+        return self.embed([text], normalize=normalize)[0]
+
+    def __call__(self, input: Documents) -> Embeddings:
+        return list(self.embed(list(input)))
+
+    def cache_stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "model": self.model_name,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "encoded": self.encoded,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            "memory": self._memory.stats(),
+            "disk": self._disk.stats() if self._disk is not None else None,
+            "microbatch": self._batcher.stats() if self._batcher is not None else None,
+        }
+
+
+embedding_service = EmbeddingService()
+
+
+def embed(texts: list[str], normalize: bool = False) -> np.ndarray:
+    return embedding_service.embed(texts, normalize=normalize)
+
@@ -0,0 +1,131 @@
+import os
+import numpy as np
+from config.settings import INFERENCE_BACKEND, ONNX_QUANTIZE, ONNX_THREADS
+
+# Pluggable CPU inference: eager PyTorch ("torch") or ONNX Runtime ("onnx").
+# ONNX files are exported next to the original weights on first use and
+# re-exported whenever the source weights are newer.
+
+
+def _onnx_path(weights_path: str, quantize: bool) -> str:
+    base = os.path.splitext(weights_path)[0]
+    return f"{base}.int8.onnx" if quantize else f"{base}.onnx"
+
+
+def _is_stale(onnx_path: str, weights_path: str) -> bool:
+    return not os.path.exists(onnx_path) or os.path.getmtime(onnx_path) < os.path.getmtime(weights_path)
+
+
+_model_tags = {}
+
+
+def model_cache_tag(weights_path: str) -> str:
+    """
+    Cache-key prefix for results of the model at `weights_path`: path, weights mtime and backend,
+    so retraining or switching backend invalidates old entries. Computed on first use, not at
+    import, and a placeholder stands in (uncached) while the weights file is missing.
+    """
+    tag = _model_tags.get(weights_path)
+    if tag is None:
+        if not os.path.exists(weights_path):
+            return f"{weights_path}:missing:{INFERENCE_BACKEND}:{ONNX_QUANTIZE}"
+        tag = _model_tags[weights_path] = f"{weights_path}:{os.path.getmtime(weights_path)}:{INFERENCE_BACKEND}:{ONNX_QUANTIZE}"
+    return tag
+
+
+def quantize_onnx(fp32_path: str, int8_path: str) -> str:
+    """Int8 dynamic quantization (weights int8, activations quantized at runtime)."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    print(f"[ONNX] Quantized {fp32_path} -> {int8_path}")
+    return int8_path
+
+
+def export_yolo_onnx(weights_path: str, quantize: bool = ONNX_QUANTIZE, imgsz: int = 640) -> str:
+    target = _onnx_path(weights_path, quantize)
+    fp32_path = _onnx_path(weights_path, False)
+    if _is_stale(fp32_path, weights_path):
+        from ultralytics import YOLO
+        exported = YOLO(weights_path).export(format="onnx", imgsz=imgsz, dynamic=False)
+        if os.path.abspath(exported) != os.path.abspath(fp32_path):
+            os.replace(exported, fp32_path)
+        print(f"[ONNX] Exported YOLO -> {fp32_path}")
+    if quantize and _is_stale(target, fp32_path):
+        quantize_onnx(fp32_path, target)
+    return target
+
+
+def mobilenet_onnx_stale(weights_path: str) -> bool:
+    """True when exporting needs the torch model (no fp32 export yet, or the weights are newer)."""
+    return _is_stale(_onnx_path(weights_path, False), weights_path)
+
+
+def export_mobilenet_onnx(build_model, weights_path: str, quantize: bool = ONNX_QUANTIZE) -> str:
+    """`build_model()` returns the torch model; it is only called when the export is missing or stale."""
+    target = _onnx_path(weights_path, quantize)
+    fp32_path = _onnx_path(weights_path, False)
+    if mobilenet_onnx_stale(weights_path):
+        import torch
+        model = build_model()
+        model.eval()
+        torch.onnx.export(
+            model,
+            torch.zeros(1, 3, 224, 224),
+            fp32_path,
+            input_names=["input"],
+            output_names=["logits"],
+            dynamic_axes={"input": {0: "batch"}, "logits": {0: "batch"}},
+            opset_version=17,
+        )
+        print(f"[ONNX] Exported MobileNet -> {fp32_path}")
+    if quantize and _is_stale(target, fp32_path):
+        quantize_onnx(fp32_path, target)
+    return target
+
+
+def create_session(onnx_path: str):
+    import onnxruntime as ort
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if ONNX_THREADS:
+        options.intra_op_num_threads = ONNX_THREADS
+    return ort.InferenceSession(onnx_path, sess_options=options, providers=["CPUExecutionProvider"])
+
+
+class OnnxClassifier:
+    """Callable returning logits for a float32 NCHW batch, backed by onnxruntime."""
+
+    def __init__(self, onnx_path: str):
+        self.onnx_path = onnx_path
+        self.session = create_session(onnx_path)
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, batch: np.ndarray) -> np.ndarray:
+        return self.session.run(None, {self.input_name: np.ascontiguousarray(batch, dtype=np.float32)})[0]
+
+
+def load_yolo_model(weights_path: str, backend: str = INFERENCE_BACKEND, quantize: bool = ONNX_QUANTIZE):
+    """Ultralytics YOLO on either the .pt weights or their ONNX export (same results API)."""
+    from ultralytics import YOLO
+    if backend == "onnx":
+        return YOLO(export_yolo_onnx(weights_path, quantize=quantize), task="detect")
+    return YOLO(weights_path)
+
+
+def load_mobilenet_predictor(build_model, weights_path: str, backend: str = INFERENCE_BACKEND, quantize: bool = ONNX_QUANTIZE):
+    """
+    Returns predict(float32 NCHW numpy batch) -> numpy logits, running either the torch
+    model from `build_model()` eagerly or its ONNX export. The onnx backend only builds
+    (and imports) torch when the export has to be (re)created.
+    """
+    if backend == "onnx":
+        return OnnxClassifier(export_mobilenet_onnx(build_model, weights_path, quantize=quantize))
+
+    import torch
+    model = build_model()
+    model.eval()
+
+    def predict(batch):
+        with torch.inference_mode():
+            return model(torch.from_numpy(batch)).numpy()
+    return predict
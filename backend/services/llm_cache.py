@@ -0,0 +1,110 @@
+import asyncio
+import json
+import os
+import threading
+from collections import defaultdict
+from config.settings import CACHE_PATH, LLM_CACHE, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_TTL_SECONDS
+from services.llm_client import client, chat_completion
+from utils.cache_utils import DiskCache, content_hash
+
+# Response cache for chat completions. The key covers the model, every request
+# parameter and the prompt text; inline images (data URLs) contribute a content hash
+# of their bytes instead of the base64 itself. Entries live in SQLite with a TTL and
+# an entry cap (least recently used first), so re-uploading a screenshot or re-running
+# a generation request returns the stored completion without calling the API.
+# Callers pass an endpoint name for per-endpoint metrics and `use_cache=False` to bypass.
+
+
+def _key_view(value):
+    """Request kwargs with inline image payloads replaced by their content hash."""
+    if isinstance(value, dict):
+        if value.get("type") == "image_url":
+            url = (value.get("image_url") or {}).get("url", "")
+            if url.startswith("data:"):
+                return {"type": "image_url", "image_sha": content_hash(url.split(",", 1)[-1])}
+        return {k: _key_view(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_key_view(v) for v in value]
+    return value
+
+
+def request_key(**create_kwargs) -> str:
+    return content_hash("chat.completions", json.dumps(_key_view(create_kwargs), sort_keys=True, ensure_ascii=False))
+
+
+class LLMCache:
+    def __init__(self, path: str = os.path.join(CACHE_PATH, "llm_responses.sqlite"), enabled: bool = LLM_CACHE,
+                 max_entries: int = LLM_CACHE_MAX_ENTRIES, ttl_seconds: float = LLM_CACHE_TTL_SECONDS):
+        self.enabled = enabled
+        self._disk = DiskCache(path, max_entries=max_entries, ttl_seconds=ttl_seconds or None) if enabled else None
+        self._lock = threading.Lock()
+        self._counters = defaultdict(lambda: {"hits": 0, "misses": 0, "bypassed": 0})
+
+    def _count(self, endpoint: str, field: str) -> None:
+        with self._lock:
+            self._counters[endpoint][field] += 1
+
+    def lookup(self, endpoint: str, key: str, use_cache: bool = True):
+        """Cached completion text for `key`, or None (counted as a miss or a bypass)."""
+        if not (use_cache and self.enabled):
+            self._count(endpoint, "bypassed")
+            return None
+        entry = self._disk.get(key)
+        if entry is None:
+            self._count(endpoint, "misses")
+            return None
+        self._count(endpoint, "hits")
+        return entry["content"]
+
+    def store(self, key: str, content: str, model: str = None) -> None:
+        # Empty completions are not worth replaying.
+        if self.enabled and content:
+            self._disk.set(key, {"content": content, "model": model})
+
+    def clear(self) -> None:
+        if self._disk is not None:
+            self._disk.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            endpoints = {name: dict(counts) for name, counts in self._counters.items()}
+        hits = sum(c["hits"] for c in endpoints.values())
+        lookups = hits + sum(c["misses"] for c in endpoints.values())
+        return {
+            "enabled": self.enabled,
+            "hits": hits,
+            "misses": lookups - hits,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "endpoints": endpoints,
+            "disk": self._disk.stats() if self._disk is not None else None,
+        }
+
+
+llm_cache = LLMCache()
+
+
+def complete(endpoint: str, use_cache: bool = True, **create_kwargs) -> str:
+    """Completion text for `client.chat.completions.create(**create_kwargs)`, served from the cache when possible."""
+    key = request_key(**create_kwargs)
+    content = llm_cache.lookup(endpoint, key, use_cache)
+    if content is not None:
+        return content
+    response = client.chat.completions.create(**create_kwargs)
+    content = response.choices[0].message.content or ""
+    if use_cache:
+        llm_cache.store(key, content, create_kwargs.get("model"))
+    return content
+
+
+async def complete_async(endpoint: str, use_cache: bool = True, **create_kwargs) -> str:
+    """Async `complete`; misses go through the shared, concurrency-capped async client."""
+    # Hashing a screenshot's base64 is not free, so the key is built off the event loop.
+    key = await asyncio.to_thread(lambda: request_key(**create_kwargs))
+    content = await asyncio.to_thread(llm_cache.lookup, endpoint, key, use_cache)
+    if content is not None:
+        return content
+    response = await chat_completion(**create_kwargs)
+    content = response.choices[0].message.content or ""
+    if use_cache:
+        await asyncio.to_thread(llm_cache.store, key, content, create_kwargs.get("model"))
+    return content
@@ -0,0 +1,29 @@
+import asyncio
+import os
+from dotenv import load_dotenv
+from openai import AsyncOpenAI, OpenAI
+from config.settings import OPENAI_BASE_URL, OPENAI_MAX_CONCURRENCY, OPENAI_TIMEOUT
+
+load_dotenv()
+
+# Shared OpenAI clients. OPENAI_BASE_URL points both at any chat-completions compatible
+# server, e.g. utils/stub_openai_server.py for offline runs. Async callers go through
+# chat_completion(), which caps in-flight requests across all endpoints with one semaphore
+# so a large upload cannot exhaust the rate limit for everything else.
+
+_client_options = {
+    "api_key": os.getenv("OPENAI_API_KEY"),
+    "base_url": OPENAI_BASE_URL,
+    "timeout": OPENAI_TIMEOUT,
+}
+
+client = OpenAI(**_client_options)
+async_client = AsyncOpenAI(**_client_options)
+
+_semaphore = asyncio.Semaphore(OPENAI_MAX_CONCURRENCY)
+
+
+async def chat_completion(**kwargs):
+    """`async_client.chat.completions.create(**kwargs)`, bounded by OPENAI_MAX_CONCURRENCY."""
+    async with _semaphore:
+        return await async_client.chat.completions.create(**kwargs)
@@ -0,0 +1,106 @@
+import asyncio
+import threading
+import time
+from config.settings import SENTENCE_MODEL_NAME, MODEL_WARMUP
+
+# Lazy model registry: heavy models (YOLO, MobileNet, SentenceTransformers) are
+# registered with a loader and built on first use or by the background warmup,
+# so importing the app stays cheap. Load state and timings back /health/ready.
+
+_loaders = {}
+_models = {}
+_state = {}
+_locks = {}
+_registry_lock = threading.Lock()
+
+
+def register_model(name: str, loader) -> None:
+    """Register `loader()` under `name`; re-registering an existing name is a no-op."""
+    with _registry_lock:
+        if name in _loaders:
+            return
+        _loaders[name] = loader
+        _locks[name] = threading.Lock()
+        _state[name] = {"status": "not_loaded", "load_seconds": None, "error": None}
+
+
+def get_model(name: str):
+    """Return the model, loading it on first use (thread-safe, loads once)."""
+    model = _models.get(name)
+    if model is not None:
+        return model
+    if name not in _loaders:
+        raise KeyError(f"Model not registered: {name}")
+
+    with _locks[name]:
+        model = _models.get(name)
+        if model is not None:
+            return model
+        _state[name].update(status="loading", error=None)
+        start = time.perf_counter()
+        try:
+            model = _loaders[name]()
+        except Exception as e:
+            _state[name].update(status="failed", error=str(e), load_seconds=round(time.perf_counter() - start, 3))
+            print(f"[MODEL REGISTRY] ❌ Failed to load '{name}': {e}")
+            raise
+        _models[name] = model
+        _state[name].update(status="ready", load_seconds=round(time.perf_counter() - start, 3))
+        print(f"[MODEL REGISTRY] ✅ Loaded '{name}' in {_state[name]['load_seconds']}s")
+        return model
+
+
+def is_loaded(name: str) -> bool:
+    return name in _models
+
+
+def model_status() -> dict:
+    with _registry_lock:
+        return {name: dict(state) for name, state in _state.items()}
+
+
+def registered_models() -> list[str]:
+    with _registry_lock:
+        return list(_loaders)
+
+
+def warmup_targets(spec: str = MODEL_WARMUP) -> list[str]:
+    """Model names selected by MODEL_WARMUP: "all", "none" or a comma-separated list."""
+    if spec == "none":
+        return []
+    if spec == "all":
+        return registered_models()
+    return [n.strip() for n in spec.split(",") if n.strip()]
+
+
+async def warmup_models(names: list[str] = None) -> dict:
+    """Load models one by one off the event loop; failures are recorded, not raised."""
+    for name in names if names is not None else registered_models():
+        try:
+            await asyncio.to_thread(get_model, name)
+        except Exception:
+            pass
+    return model_status()
+
+
+def _sentence_model_key(model_name: str) -> str:
+    return f"sentence-transformer:{model_name}"
+
+
+def _load_sentence_transformer(model_name: str):
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name)
+
+
+def register_sentence_transformer(model_name: str = SENTENCE_MODEL_NAME) -> str:
+    key = _sentence_model_key(model_name)
+    register_model(key, lambda: _load_sentence_transformer(model_name))
+    return key
+
+
+def sentence_transformer(model_name: str = SENTENCE_MODEL_NAME):
+    """Shared SentenceTransformer instance for `model_name`, loaded on first use."""
+    return get_model(register_sentence_transformer(model_name))
+
+
+register_sentence_transformer()
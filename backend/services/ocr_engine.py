@@ -0,0 +1,106 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image
+import pytesseract
+from config.settings import TESSERACT_CMD, OCR_WORKERS, OCR_TILE_HEIGHT, OCR_TILE_OVERLAP
+
+# Tesseract over a process pool: each worker OCRs one screenshot at a time, so a
+# multi-image upload uses every core instead of blocking the event loop on one.
+
+_FIELDS = ("text", "left", "top", "width", "height", "conf")
+_pool = None
+_pool_lock = threading.Lock()
+
+# In-process calls (ocr_image without the pool) honour TESSERACT_CMD too.
+pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
+
+
+def _init_worker(tesseract_cmd: str):
+    # One tesseract thread per process; parallelism comes from the pool.
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+    pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+
+
+def _tile_spans(height: int, tile_height: int, overlap: int) -> list[tuple[int, int]]:
+    if height <= tile_height:
+        return [(0, height)]
+    step = max(1, tile_height - overlap)
+    spans = []
+    top = 0
+    while True:
+        bottom = min(top + tile_height, height)
+        spans.append((top, bottom))
+        if bottom >= height:
+            return spans
+        top += step
+
+
+def ocr_image(image, tile_height: int = OCR_TILE_HEIGHT, overlap: int = OCR_TILE_OVERLAP) -> dict:
+    """
+    pytesseract.image_to_data for one screenshot (PIL image or path), returned as the
+    usual column dict. Very tall screenshots are split into overlapping horizontal
+    tiles; each word is kept from the one tile that owns its vertical center.
+    """
+    if not isinstance(image, Image.Image):
+        with Image.open(image) as opened:
+            image = opened.convert("RGB")
+
+    merged = {field: [] for field in _FIELDS}
+    spans = _tile_spans(image.height, tile_height, overlap)
+    for i, (top, bottom) in enumerate(spans):
+        tile = image if len(spans) == 1 else image.crop((0, top, image.width, bottom))
+        data = pytesseract.image_to_data(tile, output_type=pytesseract.Output.DICT)
+
+        # Ownership band: the overlap is split half/half between neighbouring tiles.
+        own_top = top + (overlap // 2 if i > 0 else 0)
+        own_bottom = bottom - (overlap // 2 if i < len(spans) - 1 else 0)
+        for j in range(len(data["text"])):
+            abs_top = data["top"][j] + top
+            center_y = abs_top + data["height"][j] / 2
+            if len(spans) > 1 and not (own_top <= center_y < own_bottom):
+                continue
+            merged["text"].append(data["text"][j])
+            merged["left"].append(data["left"][j])
+            merged["top"].append(abs_top)
+            merged["width"].append(data["width"][j])
+            merged["height"].append(data["height"][j])
+            merged["conf"].append(data["conf"][j])
+    return merged
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawned, not forked: by the time the pool starts the process runs writer/batcher
+            # threads (and possibly torch), and forking a multithreaded process can deadlock.
+            _pool = ProcessPoolExecutor(
+                max_workers=OCR_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(TESSERACT_CMD,),
+            )
+            print(f"[OCR ENGINE] Started process pool with {OCR_WORKERS} workers")
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+async def ocr_image_async(image) -> dict:
+    """Run ocr_image in the process pool. Prefer passing a path: it avoids pickling pixels."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_pool(), ocr_image, image)
+
+
+async def ocr_images_async(images: list) -> list[dict]:
+    """OCR many screenshots concurrently; results keep the input order."""
+    return await asyncio.gather(*(ocr_image_async(image) for image in images))
@@ -1,34 +1,106 @@
 from PIL import Image
-import torch
+import numpy as np
 import os
-from torchvision import transforms, models
+from config.settings import OCR_TYPE_BATCH_SIZE, OCR_TYPE_MEMO, OCR_TYPE_MEMO_PATH, OCR_TYPE_MEMO_MAX_ENTRIES
+from utils.cache_utils import DiskCache, content_hash
+from services.inference_backend import load_mobilenet_predictor, model_cache_tag
+from services.model_registry import register_model, get_model
+from services.region_store import load_region
 
 # Define output label map
 _label_map = {0: "button", 1: "textbox", 2: "label"}
 
-# Preprocess for MobileNet
-_transform = transforms.Compose([
-    transforms.Resize((224, 224)),
-    transforms.ToTensor(),
-])
-
-# Load fine-tuned MobileNet from disk (replace path if needed)
+# Fine-tuned MobileNet on disk (replace path if needed); loaded lazily through the model registry
 model_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "ml_models_training", "models", "mobilenet_v2_ocr.pth"))
 
+def _build_torch_model():
+    import torch
+    from torchvision import models
+
+    model = models.mobilenet_v2(pretrained=False)
+    model.classifier[1] = torch.nn.Linear(model.last_channel, 3)
+    model.load_state_dict(torch.load(model_path, map_location="cpu"))  # Load weights
+    model.eval()
+    return model
+
+def _load_classifier():
+    # eager torch or onnxruntime, per INFERENCE_BACKEND; torch is only loaded when it runs or exports
+    return load_mobilenet_predictor(_build_torch_model, model_path)
+
+def _preprocess(image: Image.Image) -> np.ndarray:
+    """Preprocess for MobileNet: 224x224 bilinear resize, [0, 1] float CHW (same as Resize + ToTensor)."""
+    resized = image.resize((224, 224), Image.BILINEAR)
+    return np.asarray(resized, dtype=np.float32).transpose(2, 0, 1) / 255.0
+
+register_model("mobilenet_ocr_type", _load_classifier)
+
+# Persistent memo: crop pixels -> label, so identical regions are classified once.
+# Keys include the weights' mtime and backend so a retrained or re-exported model starts from a clean memo.
+_memo = DiskCache(OCR_TYPE_MEMO_PATH, max_entries=OCR_TYPE_MEMO_MAX_ENTRIES) if OCR_TYPE_MEMO else None
+
+def _pixel_key(image: Image.Image) -> str:
+    return content_hash(model_cache_tag(model_path), f"{image.width}x{image.height}", image.tobytes())
+
+def _to_rgb(item) -> Image.Image:
+    """Accept a PIL crop, a HxW(xC) uint8 array, a region path or a region reference."""
+    if isinstance(item, Image.Image):
+        return item.convert("RGB")
+    if isinstance(item, np.ndarray):
+        return Image.fromarray(item).convert("RGB")
+    return load_region(item).convert("RGB")
+
+def classify_ocr_types(images: list, batch_size: int = OCR_TYPE_BATCH_SIZE) -> list[str]:
+    """
+    Classify many region crops with chunked forward passes.
+    Items may be PIL images, numpy arrays or paths; failures come back as "unknown".
+    Crops already seen (same pixels) are answered from the memo without running MobileNet.
+    """
+    labels = ["unknown"] * len(images)
+    pending = {}  # pixel key -> (rgb crop, [indices])
+    for idx, item in enumerate(images):
+        try:
+            image = _to_rgb(item)
+            key = _pixel_key(image)
+            if key in pending:
+                pending[key][1].append(idx)
+            else:
+                pending[key] = (image, [idx])
+        except Exception as e:
+            print(f"[OCR TYPE ERROR] Failed to load region {item if isinstance(item, str) else idx}: {e}")
+
+    # One memo query for the whole batch
+    if _memo is not None and pending:
+        for key, cached in _memo.get_many(list(pending)).items():
+            for idx in pending.pop(key)[1]:
+                labels[idx] = cached
+
+    learned = {}
+    if not pending:
+        return labels
+
+    predict = get_model("mobilenet_ocr_type")
+    keys = list(pending)
+    for start in range(0, len(keys), batch_size):
+        chunk = keys[start:start + batch_size]
+        try:
+            logits = predict(np.stack([_preprocess(pending[key][0]) for key in chunk]))
+            for key, predicted_class in zip(chunk, np.argmax(logits, axis=1).tolist()):
+                label = _label_map.get(predicted_class, "unknown")
+                learned[key] = label
+                for idx in pending[key][1]:
+                    labels[idx] = label
+        except Exception as e:
+            print(f"[OCR TYPE ERROR] Batch of {len(chunk)} failed: {e}")
+
+    if _memo is not None and learned:
+        try:
+            _memo.set_many(learned)
+        except Exception as e:
+            print(f"[OCR TYPE MEMO] Failed to persist {len(learned)} labels: {e}")
+    return labels
 
-_model = models.mobilenet_v2(pretrained=False)
-_model.classifier[1] = torch.nn.Linear(_model.last_channel, 3)
-_model.load_state_dict(torch.load(model_path, map_location="cpu"))  # Load weights
-_model.eval()
+def classification_memo_stats() -> dict:
+    return _memo.stats() if _memo is not None else {"enabled": False}
 
 def classify_ocr_type(image_path: str) -> str:
-    try:
-        image = Image.open(image_path).convert("RGB")
-        input_tensor = _transform(image).unsqueeze(0)
-        with torch.no_grad():
-            output = _model(input_tensor)
-            predicted_class = output.argmax(dim=1).item()
-            return _label_map.get(predicted_class, "unknown")
-    except Exception as e:
-        print(f"[OCR TYPE ERROR] Failed to classify '{image_path}': {e}")
-        return "unknown"
+    return classify_ocr_types([image_path])[0]
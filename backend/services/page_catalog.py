@@ -0,0 +1,126 @@
+import os
+import sqlite3
+import threading
+import time
+from config.settings import PAGE_CATALOG_PATH
+
+# Page catalog sidecar: one row per element (page, dom_matched) plus per-page
+# aggregates and a monotonically increasing store version, maintained on every
+# element write so page listings never scan the Chroma collection.
+
+
+def _chunks(items: list, size: int = 500):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class PageCatalog:
+    def __init__(self, path: str = PAGE_CATALOG_PATH):
+        self.path = path
+        self._lock = threading.RLock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS elements (id TEXT PRIMARY KEY, page_name TEXT, dom_matched INTEGER)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS elements_page ON elements(page_name)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS elements_matched ON elements(dom_matched)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "page_name TEXT PRIMARY KEY, element_count INTEGER, matched_count INTEGER, version INTEGER, updated REAL)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)")
+        self._conn.commit()
+
+    def _get_meta(self, key: str, default: int = 0) -> int:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _bump_version(self) -> int:
+        version = self._get_meta("version") + 1
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('version', ?)", (version,))
+        return version
+
+    def _refresh_pages(self, page_names: set, version: int) -> None:
+        now = time.time()
+        for chunk in _chunks(sorted(page_names)):
+            placeholders = ",".join("?" * len(chunk))
+            self._conn.execute(f"DELETE FROM pages WHERE page_name IN ({placeholders})", chunk)
+            self._conn.execute(
+                "INSERT INTO pages (page_name, element_count, matched_count, version, updated) "
+                f"SELECT page_name, COUNT(*), SUM(dom_matched), ?, ? FROM elements WHERE page_name IN ({placeholders}) "
+                "GROUP BY page_name",
+                [version, now, *chunk],
+            )
+
+    def _previous_pages(self, ids: list[str]) -> set:
+        pages = set()
+        for chunk in _chunks(ids):
+            placeholders = ",".join("?" * len(chunk))
+            pages.update(row[0] for row in self._conn.execute(
+                f"SELECT DISTINCT page_name FROM elements WHERE id IN ({placeholders})", chunk
+            ))
+        return pages
+
+    def record(self, ids: list[str], metadatas: list[dict]) -> int:
+        """Register written elements; returns the new store version."""
+        rows = [
+            (str(element_id), (meta or {}).get("page_name") or "unknown", 1 if (meta or {}).get("dom_matched") is True else 0)
+            for element_id, meta in zip(ids, metadatas)
+        ]
+        with self._lock:
+            if not rows:
+                return self._get_meta("version")
+            touched = self._previous_pages([row[0] for row in rows]) | {row[1] for row in rows}
+            self._conn.executemany("INSERT OR REPLACE INTO elements (id, page_name, dom_matched) VALUES (?, ?, ?)", rows)
+            version = self._bump_version()
+            self._refresh_pages(touched, version)
+            self._conn.commit()
+        return version
+
+    def remove(self, ids: list[str]) -> int:
+        with self._lock:
+            ids = [str(i) for i in ids]
+            touched = self._previous_pages(ids)
+            for chunk in _chunks(ids):
+                self._conn.execute(f"DELETE FROM elements WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+            version = self._bump_version()
+            self._refresh_pages(touched, version)
+            self._conn.commit()
+        return version
+
+    def rebuild(self, ids: list[str], metadatas: list[dict]) -> int:
+        """Replace the catalog with a full snapshot of the store (first-run backfill)."""
+        with self._lock:
+            self._conn.execute("DELETE FROM elements")
+            self._conn.execute("DELETE FROM pages")
+            version = self.record(ids, metadatas)
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('backfilled', 1)")
+            self._conn.commit()
+        return version
+
+    def is_backfilled(self) -> bool:
+        with self._lock:
+            return bool(self._get_meta("backfilled"))
+
+    def version(self) -> int:
+        with self._lock:
+            return self._get_meta("version")
+
+    def page_names(self) -> list[str]:
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT page_name FROM pages ORDER BY page_name")]
+
+    def pages(self) -> list[dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT page_name, element_count, matched_count, version, updated FROM pages ORDER BY page_name"
+            ).fetchall()
+        return [
+            {"page_name": r[0], "element_count": r[1], "matched_count": r[2], "version": r[3], "updated": r[4]}
+            for r in rows
+        ]
+
+    def matched_ids(self) -> list[str]:
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT id FROM elements WHERE dom_matched = 1")]
@@ -0,0 +1,200 @@
+import os
+import queue
+import threading
+from typing import NamedTuple
+from PIL import Image
+from config.settings import REGION_PATH, REGION_FORMAT, REGION_COMPRESS_LEVEL, REGION_QUALITY, REGION_PERSIST, REGION_KNOWN_CACHE_SIZE
+from utils.cache_utils import LRUCache, content_hash
+
+# Region crops are named by a hash of their pixels, so identical crops (repeated
+# buttons, the GPT path's fixed box, re-uploads) are written once. Encoding happens
+# on a background writer thread; until then reads are served from memory.
+
+_EXTENSIONS = {"png": "png", "webp": "webp", "jpeg": "jpg", "jpg": "jpg"}
+_PIL_FORMATS = {"png": "PNG", "webp": "WEBP", "jpeg": "JPEG", "jpg": "JPEG"}
+
+
+class RegionRef(NamedTuple):
+    """Stable reference to a crop: pixel hash + bbox in the parent screenshot (path is "" when not persisted)."""
+    digest: str
+    bbox: tuple[int, int, int, int]
+    parent: str
+    path: str
+
+    def to_string(self) -> str:
+        return f"{self.digest}|{','.join(map(str, self.bbox))}|{self.parent}"
+
+    def location(self) -> str:
+        """What to store as `region_image_path`: the crop file, or the ref string when crops are not written."""
+        return self.path or self.to_string()
+
+
+def region_hash(crop: Image.Image) -> str:
+    return content_hash(f"{crop.mode}:{crop.width}x{crop.height}", crop.tobytes())
+
+
+class RegionStore:
+    def __init__(self, root: str = REGION_PATH, fmt: str = REGION_FORMAT, compress_level: int = REGION_COMPRESS_LEVEL,
+                 quality: int = REGION_QUALITY, persist: bool = REGION_PERSIST, known_cache_size: int = REGION_KNOWN_CACHE_SIZE):
+        if fmt not in _EXTENSIONS:
+            raise ValueError(f"Unsupported region format: {fmt}")
+        self.root = root
+        self.fmt = fmt
+        self.ext = _EXTENSIONS[fmt]
+        self.compress_level = compress_level
+        self.quality = quality
+        self.persist = persist
+        self.writes = 0
+        self.dedup_hits = 0
+        self._known = LRUCache(maxsize=known_cache_size)  # digests written or queued; bounded, misses fall back to a stat
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        os.makedirs(root, exist_ok=True)
+        self._thread = threading.Thread(target=self._writer, name="region-writer", daemon=True)
+        self._thread.start()
+
+    def path_for(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], f"{digest}.{self.ext}")
+
+    def put(self, crop: Image.Image, bbox: tuple[int, int, int, int], parent: str = "") -> RegionRef:
+        digest = region_hash(crop)
+        bbox = tuple(int(v) for v in bbox)
+        if not self.persist:
+            # Nothing is written: the ref re-crops from the parent screenshot on load.
+            return RegionRef(digest, bbox, parent, "")
+        path = self.path_for(digest)
+        with self._lock:
+            if self._known.get(digest) or path in self._pending or os.path.exists(path):
+                self._known.put(digest, True)
+                self.dedup_hits += 1
+            else:
+                self._known.put(digest, True)
+                self._pending[path] = crop
+                self._queue.put((digest, path, crop))
+        return RegionRef(digest, bbox, parent, path)
+
+    def _save_params(self) -> dict:
+        if self.fmt == "png":
+            return {"compress_level": self.compress_level}
+        if self.fmt == "webp":
+            return {"quality": self.quality, "method": 4}
+        return {"quality": self.quality}
+
+    def _writer(self):
+        while True:
+            digest, path, crop = self._queue.get()
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                if _PIL_FORMATS[self.fmt] == "JPEG" and crop.mode not in ("RGB", "L"):
+                    crop = crop.convert("RGB")
+                tmp_path = f"{path}.tmp"
+                crop.save(tmp_path, format=_PIL_FORMATS[self.fmt], **self._save_params())
+                os.replace(tmp_path, path)
+                self.writes += 1
+            except Exception as e:
+                print(f"[REGION STORE] Failed to write {path}: {e}")
+                with self._lock:
+                    self._known.pop(digest)
+            finally:
+                with self._lock:
+                    self._pending.pop(path, None)
+                self._queue.task_done()
+
+    def flush(self):
+        """Block until every queued crop is on disk."""
+        self._queue.join()
+
+    def pending_crop(self, path: str):
+        with self._lock:
+            return self._pending.get(path)
+
+    def load(self, ref) -> Image.Image:
+        """
+        Materialize a crop from a RegionRef or its string form:
+        pending write -> file on disk -> re-crop from the parent screenshot.
+        """
+        if isinstance(ref, str):
+            digest, bbox_str, parent = ref.split("|", 2)
+            ref = RegionRef(digest, tuple(int(v) for v in bbox_str.split(",")), parent,
+                            self.path_for(digest) if self.persist else "")
+
+        crop = self.pending_crop(ref.path) if ref.path else None
+        if crop is not None:
+            return crop.copy()
+        if ref.path and os.path.exists(ref.path):
+            with Image.open(ref.path) as image:
+                image.load()
+                return image
+        if ref.parent and os.path.exists(ref.parent):
+            x, y, w, h = ref.bbox
+            with Image.open(ref.parent) as image:
+                return image.crop((x, y, x + w, y + h))
+        raise FileNotFoundError(f"Region not available: {ref.to_string()}")
+
+    def stats(self) -> dict:
+        return {
+            "root": self.root,
+            "format": self.fmt,
+            "writes": self.writes,
+            "dedup_hits": self.dedup_hits,
+            "pending": self._queue.qsize(),
+        }
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_region_store(root: str = REGION_PATH) -> RegionStore:
+    root = os.path.abspath(root)
+    with _stores_lock:
+        if root not in _stores:
+            _stores[root] = RegionStore(root)
+        return _stores[root]
+
+
+def _pending_crop(path: str):
+    with _stores_lock:
+        stores = list(_stores.values())
+    for store in stores:
+        crop = store.pending_crop(path)
+        if crop is not None:
+            return crop
+    return None
+
+
+def is_region_ref(value) -> bool:
+    return isinstance(value, RegionRef) or (isinstance(value, str) and value.count("|") == 2)
+
+
+def load_region(ref) -> Image.Image:
+    """Open a region by RegionRef, ref string or plain path, including crops not yet written."""
+    if isinstance(ref, RegionRef):
+        store = get_region_store(os.path.dirname(os.path.dirname(ref.path))) if ref.path else get_region_store()
+        return store.load(ref)
+    if is_region_ref(ref):
+        return get_region_store().load(ref)
+    crop = _pending_crop(ref)
+    if crop is not None:
+        return crop.copy()
+    with Image.open(ref) as image:
+        image.load()
+        return image
+
+
+def region_exists(path: str) -> bool:
+    """True when a region path or ref string can be loaded (written, pending, or re-croppable from its parent)."""
+    if is_region_ref(path):
+        if isinstance(path, RegionRef):
+            path = path.to_string()
+        digest, _, parent = path.split("|", 2)
+        return region_exists(get_region_store().path_for(digest)) or bool(parent and os.path.exists(parent))
+    return _pending_crop(path) is not None or os.path.exists(path)
+
+
+def flush_regions():
+    with _stores_lock:
+        stores = list(_stores.values())
+    for store in stores:
+        store.flush()
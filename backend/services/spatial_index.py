@@ -0,0 +1,274 @@
+import math
+import os
+import sqlite3
+import threading
+from collections import defaultdict
+from config.settings import SPATIAL_INDEX_PATH, SPATIAL_GRID_CELL
+
+# Per-page spatial index over element boxes (uniform grid in memory, rows in SQLite
+# next to the Chroma data). Writers call `upsert` alongside their Chroma writes; a
+# page's grid is loaded on first query and then maintained incrementally.
+
+
+def element_box(meta: dict):
+    """(x1, y1, x2, y2) from x/y/width/height, falling back to the "x,y,w,h" bbox string; None if unknown."""
+    try:
+        x, y = float(meta["x"]), float(meta["y"])
+        w, h = float(meta.get("width") or 0), float(meta.get("height") or 0)
+    except (KeyError, TypeError, ValueError):
+        try:
+            x, y, w, h = map(float, str(meta["bbox"]).split(","))
+        except (KeyError, TypeError, ValueError):
+            return None
+    if x == 0 and y == 0 and w <= 0 and h <= 0:
+        return None  # extractors default missing geometry to zeros
+    return x, y, x + max(w, 0.0), y + max(h, 0.0)
+
+
+def _chunks(items: list, size: int = 500):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def box_distance(box, x: float, y: float) -> float:
+    """Euclidean distance from a point to a box (0 when the point is inside)."""
+    dx = max(box[0] - x, 0.0, x - box[2])
+    dy = max(box[1] - y, 0.0, y - box[3])
+    return math.hypot(dx, dy)
+
+
+class PageGrid:
+    """Uniform grid: each box is registered in every cell it overlaps."""
+
+    def __init__(self, cell: float = SPATIAL_GRID_CELL):
+        self.cell = float(max(cell, 1))
+        self.boxes = {}
+        self.cells = defaultdict(set)
+        self._bounds = None  # (min_cx, min_cy, max_cx, max_cy), grows only
+
+    def _cell_range(self, box):
+        c = self.cell
+        return int(box[0] // c), int(box[1] // c), int(box[2] // c), int(box[3] // c)
+
+    def add(self, element_id: str, box) -> None:
+        self.remove(element_id)
+        self.boxes[element_id] = box
+        cx1, cy1, cx2, cy2 = self._cell_range(box)
+        for cx in range(cx1, cx2 + 1):
+            for cy in range(cy1, cy2 + 1):
+                self.cells[(cx, cy)].add(element_id)
+        if self._bounds is None:
+            self._bounds = (cx1, cy1, cx2, cy2)
+        else:
+            b = self._bounds
+            self._bounds = (min(b[0], cx1), min(b[1], cy1), max(b[2], cx2), max(b[3], cy2))
+
+    def remove(self, element_id: str) -> None:
+        box = self.boxes.pop(element_id, None)
+        if box is None:
+            return
+        cx1, cy1, cx2, cy2 = self._cell_range(box)
+        for cx in range(cx1, cx2 + 1):
+            for cy in range(cy1, cy2 + 1):
+                bucket = self.cells.get((cx, cy))
+                if bucket is not None:
+                    bucket.discard(element_id)
+                    if not bucket:
+                        del self.cells[(cx, cy)]
+
+    def _scan_is_cheaper(self, cell_count: int) -> bool:
+        # Walking more cells than there are boxes costs more than checking every box.
+        return cell_count > 4 * len(self.boxes)
+
+    def intersecting(self, box) -> list[str]:
+        if not self.boxes:
+            return []
+        # Cells outside the occupied bounds are empty, so the walk is clamped to them.
+        b = self._bounds
+        cx1, cy1, cx2, cy2 = self._cell_range(box)
+        cx1, cy1, cx2, cy2 = max(cx1, b[0]), max(cy1, b[1]), min(cx2, b[2]), min(cy2, b[3])
+        if cx1 > cx2 or cy1 > cy2:
+            return []
+        if self._scan_is_cheaper((cx2 - cx1 + 1) * (cy2 - cy1 + 1)):
+            found = self.boxes.keys()
+        else:
+            found = set()
+            for cx in range(cx1, cx2 + 1):
+                for cy in range(cy1, cy2 + 1):
+                    found.update(self.cells.get((cx, cy), ()))
+        return [
+            element_id for element_id in found
+            if self.boxes[element_id][0] <= box[2] and box[0] <= self.boxes[element_id][2]
+            and self.boxes[element_id][1] <= box[3] and box[1] <= self.boxes[element_id][3]
+        ]
+
+    def _ring(self, cx0: int, cy0: int, r: int):
+        """Cells at Chebyshev distance r from (cx0, cy0), clipped to the occupied bounds."""
+        b = self._bounds
+        if r == 0:
+            if b[0] <= cx0 <= b[2] and b[1] <= cy0 <= b[3]:
+                yield cx0, cy0
+            return
+        for cy in (cy0 - r, cy0 + r):
+            if b[1] <= cy <= b[3]:
+                for cx in range(max(cx0 - r, b[0]), min(cx0 + r, b[2]) + 1):
+                    yield cx, cy
+        for cx in (cx0 - r, cx0 + r):
+            if b[0] <= cx <= b[2]:
+                for cy in range(max(cy0 - r + 1, b[1]), min(cy0 + r - 1, b[3]) + 1):
+                    yield cx, cy
+
+    def nearest(self, x: float, y: float, k: int = 5, max_distance: float = None) -> list[tuple[str, float]]:
+        """k nearest boxes to (x, y) as [(id, distance)], searching outward ring by ring."""
+        if not self.boxes or k <= 0:
+            return []
+        b = self._bounds
+        if self._scan_is_cheaper((b[2] - b[0] + 1) * (b[3] - b[1] + 1)):
+            ranked = sorted(((element_id, box_distance(box, x, y)) for element_id, box in self.boxes.items()),
+                            key=lambda item: (item[1], item[0]))
+            if max_distance is not None:
+                ranked = [item for item in ranked if item[1] <= max_distance]
+            return ranked[:k]
+
+        cx0, cy0 = int(x // self.cell), int(y // self.cell)
+        # Rings closer than the bounds are empty and rings past them add nothing.
+        min_ring = max(b[0] - cx0, cx0 - b[2], b[1] - cy0, cy0 - b[3], 0)
+        max_ring = max(cx0 - b[0], b[2] - cx0, cy0 - b[1], b[3] - cy0, 0)
+        distances = {}
+        for r in range(min_ring, max_ring + 1):
+            for key in self._ring(cx0, cy0, r):
+                for element_id in self.cells.get(key, ()):
+                    if element_id not in distances:
+                        distances[element_id] = box_distance(self.boxes[element_id], x, y)
+            # Anything not seen yet is at least r cells away.
+            reach = r * self.cell
+            if max_distance is not None and reach > max_distance:
+                break
+            if len(distances) >= k and sorted(distances.values())[k - 1] <= reach:
+                break
+        ranked = sorted(distances.items(), key=lambda item: (item[1], item[0]))
+        if max_distance is not None:
+            ranked = [item for item in ranked if item[1] <= max_distance]
+        return ranked[:k]
+
+
+class SpatialIndex:
+    def __init__(self, root: str = SPATIAL_INDEX_PATH, cell: float = SPATIAL_GRID_CELL):
+        self.root = root
+        self.cell = cell
+        self._grids = {}
+        self._lock = threading.RLock()
+        os.makedirs(root, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(root, "index.sqlite"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS elements ("
+            "page_name TEXT, id TEXT, x1 REAL, y1 REAL, x2 REAL, y2 REAL, text TEXT, tag TEXT, "
+            "PRIMARY KEY (page_name, id))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS elements_id ON elements(id)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS pages (page_name TEXT PRIMARY KEY, complete INTEGER)")
+        self._conn.commit()
+
+    def _grid(self, page_name: str) -> PageGrid:
+        grid = self._grids.get(page_name)
+        if grid is None:
+            grid = PageGrid(self.cell)
+            rows = self._conn.execute(
+                "SELECT id, x1, y1, x2, y2 FROM elements WHERE page_name = ?", (page_name,)
+            ).fetchall()
+            for element_id, x1, y1, x2, y2 in rows:
+                grid.add(element_id, (x1, y1, x2, y2))
+            self._grids[page_name] = grid
+        return grid
+
+    def _drop(self, ids: list[str]) -> None:
+        for chunk in _chunks(ids):
+            placeholders = ",".join("?" * len(chunk))
+            for page_name, element_id in self._conn.execute(
+                f"SELECT page_name, id FROM elements WHERE id IN ({placeholders})", chunk
+            ).fetchall():
+                if page_name in self._grids:
+                    self._grids[page_name].remove(element_id)
+            self._conn.execute(f"DELETE FROM elements WHERE id IN ({placeholders})", chunk)
+
+    def upsert(self, ids: list[str], metadatas: list[dict]) -> int:
+        """Index (or re-index) records as written to Chroma; records without a page or geometry are dropped."""
+        rows = []
+        for element_id, meta in zip(ids, metadatas):
+            meta = meta or {}
+            box = element_box(meta)
+            page_name = meta.get("page_name")
+            rows.append((page_name, str(element_id), box, meta.get("text") or meta.get("label_text") or "",
+                         meta.get("tag_name") or meta.get("tag") or ""))
+        if not rows:
+            return 0
+        with self._lock:
+            self._drop([row[1] for row in rows])
+            indexed = [row for row in rows if row[0] and row[2] is not None]
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO elements (page_name, id, x1, y1, x2, y2, text, tag) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(page, element_id, *box, text, tag) for page, element_id, box, text, tag in indexed],
+            )
+            self._conn.commit()
+            for page, element_id, box, _, _ in indexed:
+                if page in self._grids:
+                    self._grids[page].add(element_id, box)
+        return len(indexed)
+
+    def delete(self, ids: list[str]) -> None:
+        if not ids:
+            return
+        with self._lock:
+            self._drop([str(i) for i in ids])
+            self._conn.commit()
+
+    def is_complete(self, page_name: str) -> bool:
+        row = self._conn.execute("SELECT complete FROM pages WHERE page_name = ?", (page_name,)).fetchone()
+        return bool(row and row[0])
+
+    def rebuild_page(self, page_name: str, ids: list[str], metadatas: list[dict]) -> int:
+        """Replace a page's entries with a full snapshot (backfill from Chroma) and mark it complete."""
+        with self._lock:
+            self._conn.execute("DELETE FROM elements WHERE page_name = ?", (page_name,))
+            self._grids.pop(page_name, None)
+            count = self.upsert(ids, [dict(meta or {}, page_name=page_name) for meta in metadatas])
+            self._conn.execute("INSERT OR REPLACE INTO pages (page_name, complete) VALUES (?, 1)", (page_name,))
+            self._conn.commit()
+        return count
+
+    def _rows(self, page_name: str, ids: list[str]) -> dict:
+        rows = []
+        for chunk in _chunks(ids):
+            placeholders = ",".join("?" * len(chunk))
+            rows += self._conn.execute(
+                f"SELECT id, x1, y1, x2, y2, text, tag FROM elements WHERE page_name = ? AND id IN ({placeholders})",
+                [page_name, *chunk],
+            ).fetchall()
+        return {
+            row[0]: {"id": row[0], "x": row[1], "y": row[2], "width": row[3] - row[1], "height": row[4] - row[2],
+                     "text": row[5], "tag_name": row[6]}
+            for row in rows
+        }
+
+    def nearest(self, page_name: str, x: float, y: float, k: int = 5, max_distance: float = None) -> list[dict]:
+        with self._lock:
+            ranked = self._grid(page_name).nearest(x, y, k, max_distance)
+            rows = self._rows(page_name, [element_id for element_id, _ in ranked])
+        return [dict(rows[element_id], distance=round(distance, 3)) for element_id, distance in ranked if element_id in rows]
+
+    def intersecting(self, page_name: str, box) -> list[dict]:
+        with self._lock:
+            grid = self._grid(page_name)
+            ids = sorted(grid.intersecting(box), key=lambda i: (grid.boxes[i][1], grid.boxes[i][0], i))
+            rows = self._rows(page_name, ids)
+        return [rows[element_id] for element_id in ids if element_id in rows]
+
+    def stats(self) -> dict:
+        with self._lock:
+            pages, elements = self._conn.execute("SELECT COUNT(DISTINCT page_name), COUNT(*) FROM elements").fetchone()
+        return {"pages": pages, "elements": elements, "loaded_pages": len(self._grids), "cell": self.cell}
+
+
+spatial_index = SpatialIndex()
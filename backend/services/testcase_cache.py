@@ -0,0 +1,196 @@
+import re
+import threading
+from typing import Optional
+import numpy as np
+from config.settings import (
+    SEMANTIC_CACHE, SEMANTIC_CACHE_PATH, SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_MAX_ENTRIES, SEMANTIC_CACHE_BUCKET_SIZE,
+)
+from services.embedding_service import embedding_service
+from utils.cache_utils import DiskCache, content_hash
+
+# Near-duplicate cache for manual test case -> generated code. Steps are normalized
+# (numbering and bullets stripped, quoted values replaced by a placeholder) and embedded
+# one vector per step. A previous entry is reused when it was generated under the same
+# prompt/site context, has the same number of steps, every step pair is at least
+# SEMANTIC_CACHE_THRESHOLD similar and every step pair has the same anchors: the
+# unquoted tokens that change what a test does while barely moving its embedding
+# (numbers, capitalised names such as products or buttons, valid/invalid, login/logout).
+# Quoted values ('standard_user') are then swapped into the cached code position by
+# position, so "log in as 'a'" can reuse "log in as 'b'" - but only when each replaced
+# value is long enough and occurs in the code no more often than in the steps, so the
+# rewrite cannot touch unrelated selectors or strings.
+#
+# Entries live in a DiskCache (TTL-less, LRU-capped) in buckets keyed by context and
+# step count; step vectors are not stored, the embedding service's cache serves them.
+
+_NUMBERING = re.compile(r"^\s*(?:(?:step\s*)?(?:\d+|[a-z])\s*[.):\-]|[-*•])\s*", re.IGNORECASE)
+_LITERAL = re.compile(r"(?<!\w)(?:'([^'\n]+)'|\"([^\"\n]+)\")(?!\w)")
+_TOKEN = re.compile(r"[A-Za-z0-9_]+")
+_PLACEHOLDER = "<value>"
+_MIN_ADAPT_LENGTH = 3  # shorter cached values ('1', 'a') are too likely to occur elsewhere in the code
+_POLARITY = {
+    "valid", "invalid", "correct", "incorrect", "wrong", "locked", "empty", "blank", "missing", "without",
+    "not", "no", "never", "error", "fail", "fails", "failed", "disabled", "enabled",
+    "login", "logout", "signin", "signout", "add", "remove", "increase", "decrease", "first", "last",
+}
+
+
+def split_steps(manual_testcase) -> list[str]:
+    lines = manual_testcase if isinstance(manual_testcase, list) else str(manual_testcase).splitlines()
+    return [line.strip() for line in lines if line and line.strip()]
+
+
+def normalize_step(step: str) -> str:
+    step = _NUMBERING.sub("", step, count=1)
+    step = _LITERAL.sub(_PLACEHOLDER, step)
+    return " ".join(step.lower().split())
+
+
+def step_literals(steps: list[str]) -> list[str]:
+    return [single or double for step in steps for single, double in _LITERAL.findall(step)]
+
+
+def step_anchors(step: str) -> list[str]:
+    """Unquoted tokens that must match exactly: numbers, capitalised words after the first, polarity words."""
+    tokens = _TOKEN.findall(_LITERAL.sub(" ", _NUMBERING.sub("", step, count=1)))
+    return [
+        token.lower() for position, token in enumerate(tokens)
+        if any(c.isdigit() for c in token) or token.lower() in _POLARITY or (position > 0 and token[0].isupper())
+    ]
+
+
+def context_key(*parts) -> str:
+    """Entries only match requests generated under the same prompt template / site / model."""
+    return content_hash(*[str(p) for p in parts])
+
+
+def literal_mapping(cached: list[str], current: list[str]) -> Optional[dict]:
+    """cached value -> new value, or None when the counts differ or one cached value would need two replacements."""
+    if len(cached) != len(current):
+        return None
+    mapping = {}
+    for old, new in zip(cached, current):
+        if mapping.setdefault(old, new) != new:
+            return None
+    return {old: new for old, new in mapping.items() if old != new}
+
+
+def _quoted_pattern(values) -> re.Pattern:
+    alternatives = "|".join(re.escape(value) for value in sorted(values, key=len, reverse=True))
+    return re.compile(r"(['\"])(" + alternatives + r")\1")
+
+
+def can_adapt(code: str, mapping: dict, cached_literals: list[str]) -> bool:
+    """
+    True when every value to replace is unambiguous: not too short, never used unquoted
+    (inside selectors, f-strings, longer words) and quoted in the code at most as often as in the steps.
+    """
+    if not mapping:
+        return True
+    if any(len(old) < _MIN_ADAPT_LENGTH for old in mapping):
+        return False
+    in_code = {}
+    for match in _quoted_pattern(mapping).finditer(code):
+        in_code[match.group(2)] = in_code.get(match.group(2), 0) + 1
+    return all(code.count(old) == in_code.get(old, 0) <= cached_literals.count(old) for old in mapping)
+
+
+def adapt_literals(code: str, mapping: dict) -> str:
+    """Replace quoted occurrences of the cached values with the new ones (single pass, no chaining)."""
+    if not mapping:
+        return code
+    return _quoted_pattern(mapping).sub(lambda m: m.group(1) + mapping[m.group(2)] + m.group(1), code)
+
+
+class SemanticTestcaseCache:
+    def __init__(self, path: str = SEMANTIC_CACHE_PATH, threshold: float = SEMANTIC_CACHE_THRESHOLD,
+                 max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES, bucket_size: int = SEMANTIC_CACHE_BUCKET_SIZE,
+                 enabled: bool = SEMANTIC_CACHE):
+        self.threshold = threshold
+        self.bucket_size = max(1, int(bucket_size))
+        self.enabled = enabled
+        self._disk = DiskCache(path, max_entries=max_entries) if enabled else None
+        self._lock = threading.Lock()  # bucket read-modify-write
+        self.hits = 0
+        self.adapted = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    @staticmethod
+    def _bucket_key(context: str, step_count: int) -> str:
+        return content_hash(context, str(step_count))
+
+    def _count(self, field: str) -> None:
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def lookup(self, manual_testcase, context: str, use_cache: bool = True) -> Optional[dict]:
+        """Best cached entry above the threshold -> {"code", "similarity", "adapted"}, else None."""
+        if not (use_cache and self.enabled):
+            self._count("bypassed")
+            return None
+        steps = split_steps(manual_testcase)
+        entries = (self._disk.get(self._bucket_key(context, len(steps))) or []) if steps else []
+        literals = step_literals(steps)
+        anchors = [step_anchors(step) for step in steps]
+        candidates = []
+        for entry in entries:
+            mapping = literal_mapping(entry["literals"], literals)
+            # Values must map back onto the code unambiguously, and no meaning-bearing token may differ.
+            if mapping is not None and entry["anchors"] == anchors and can_adapt(entry["code"], mapping, entry["literals"]):
+                candidates.append((entry, mapping))
+
+        best = None
+        if candidates:
+            normalized = [normalize_step(step) for step in steps]
+            cached_steps = list(dict.fromkeys(s for entry, _ in candidates for s in entry["steps"]))
+            vectors = embedding_service.embed(normalized + cached_steps, normalize=True)
+            query, row_of = vectors[:len(normalized)], {s: len(normalized) + i for i, s in enumerate(cached_steps)}
+            for entry, mapping in candidates:
+                cached = vectors[[row_of[s] for s in entry["steps"]]]
+                similarity = float(np.einsum("ij,ij->i", query, cached).min())
+                if similarity >= self.threshold and (best is None or similarity > best[0]):
+                    best = (similarity, entry, mapping)
+
+        if best is None:
+            self._count("misses")
+            return None
+        similarity, entry, mapping = best
+        self._count("hits")
+        if mapping:
+            self._count("adapted")
+        return {"code": adapt_literals(entry["code"], mapping), "similarity": round(similarity, 4), "adapted": bool(mapping)}
+
+    def store(self, manual_testcase, context: str, code: str) -> None:
+        steps = split_steps(manual_testcase)
+        if not (self.enabled and steps and code):
+            return
+        entry = {
+            "steps": [normalize_step(step) for step in steps],
+            "literals": step_literals(steps),
+            "anchors": [step_anchors(step) for step in steps],
+            "code": code,
+        }
+        embedding_service.embed(entry["steps"])  # warm the vector cache for later lookups
+        key = self._bucket_key(context, len(steps))
+        with self._lock:
+            bucket = [e for e in self._disk.get(key) or []
+                      if (e["steps"], e["literals"]) != (entry["steps"], entry["literals"])]
+            bucket.append(entry)
+            self._disk.set(key, bucket[-self.bucket_size:])
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "adapted": self.adapted,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "disk": self._disk.stats() if self._disk is not None else None,
+        }
+
+
+testcase_cache = SemanticTestcaseCache()
@@ -1,21 +1,27 @@
-from ultralytics import YOLO
 from PIL import Image
+import io
 import os
 import math
+import numpy as np
 from collections import Counter
+from config.settings import CACHE_PATH, YOLO_CACHE_SIZE, YOLO_DISK_CACHE, YOLO_DISK_CACHE_MAX_ENTRIES
+from utils.cache_utils import LRUCache, DiskCache, content_hash
+from services.inference_backend import load_yolo_model, model_cache_tag
+from services.model_registry import register_model, get_model
 
-# Load your trained YOLOv8 model (adjust path if needed)
+# Trained YOLOv8 model (adjust path if needed); loaded lazily through the model registry
 # Set absolute path to trained model
 model_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "ml_models_training", "models", "ui_elements_yolov8", "weights", "best.pt"))
-model = YOLO(model_path)
+register_model("yolo", lambda: load_yolo_model(model_path))
 
+def _model():
+    return get_model("yolo")
 
-
-# Allowed UI types
-ALLOWED_CLASSES = set(model.names.values())  # Accept all class names from the model
-
-# Class names for debug logs
-CLASS_NAMES = model.names
+# Detection cache: YOLO runs once per screenshot, every region lookup reuses the boxes.
+# Keys include the weights' mtime and backend so retraining or switching backend invalidates old entries.
+_detection_cache = LRUCache(maxsize=YOLO_CACHE_SIZE)
+_disk_cache = DiskCache(os.path.join(CACHE_PATH, "yolo_detections.sqlite"), max_entries=YOLO_DISK_CACHE_MAX_ENTRIES) if YOLO_DISK_CACHE else None
+_path_keys = LRUCache(maxsize=YOLO_CACHE_SIZE * 4)
 
 def iou(boxA, boxB):
     xA = max(boxA[0], boxB[0])
@@ -32,57 +38,151 @@ def center_distance(boxA, boxB):
     bx, by = (boxB[0] + boxB[2]) / 2, (boxB[1] + boxB[3]) / 2
     return math.sqrt((ax - bx) ** 2 + (ay - by) ** 2)
 
-def detect_ui_elements_yolo(image_path: str, ocr_bbox: tuple[int, int, int, int], verbose: bool = False) -> tuple[int, int, int, int, str, float]:
+def _image_cache_key(image_path: str) -> tuple[str, bytes | None]:
+    """Content-hash key for a screenshot; reuses the hash while the file is unchanged."""
+    stat = os.stat(image_path)
+    path_key = (os.path.abspath(image_path), stat.st_mtime_ns, stat.st_size)
+    key = _path_keys.get(path_key)
+    if key is not None:
+        return key, None
+    with open(image_path, "rb") as f:
+        data = f.read()
+    key = content_hash(model_cache_tag(model_path), data)
+    _path_keys.put(path_key, key)
+    return key, data
+
+def get_detections(image_path: str) -> list[list]:
     """
-    Detect UI components in full screenshot and return most relevant match for OCR region.
-    Returns (x, y, w, h, detected_type, confidence_score)
+    Run YOLO on a full screenshot once and cache the result.
+    Returns a list of [x1, y1, x2, y2, class_name, confidence].
     """
-    image = Image.open(image_path).convert("RGB")
+    key, data = _image_cache_key(image_path)
+
+    detections = _detection_cache.get(key)
+    if detections is None and _disk_cache is not None:
+        detections = _disk_cache.get(key)
+        if detections is not None:
+            _detection_cache.put(key, detections)
+    if detections is not None:
+        return detections
+
+    if data is None:
+        with open(image_path, "rb") as f:
+            data = f.read()
+    image = Image.open(io.BytesIO(data)).convert("RGB")
+    model = _model()
     results = model.predict(source=image, conf=0.10, save=False, verbose=False)[0]
 
-    ocr_x, ocr_y, ocr_w, ocr_h = ocr_bbox
-    ocr_box = [ocr_x, ocr_y, ocr_x + ocr_w, ocr_y + ocr_h]
-    best_iou = 0
-    best_box = ocr_box
-    best_class = "unknown"
-    min_distance = float("inf")
-    
-    class_counts = Counter()
-    ignored_classes = []
-
+    detections = []
     for box in results.boxes:
         cls_id = int(box.cls)
-        cls_name = CLASS_NAMES.get(cls_id, "unknown").strip().lower()
-
-        if cls_name not in ALLOWED_CLASSES:
-            ignored_classes.append(cls_name)
-            continue
-
-        class_counts[cls_name] += 1
-
+        cls_name = model.names.get(cls_id, "unknown").strip().lower()
         x1, y1, x2, y2 = map(int, box.xyxy[0].tolist())
-        detection_box = [x1, y1, x2, y2]
-        iou_val = iou(ocr_box, detection_box)
-
-        if iou_val > best_iou:
-            best_iou = iou_val
-            best_box = detection_box
-            best_class = cls_name
-        elif best_iou < 0.05:
-            dist = center_distance(ocr_box, detection_box)
-            if dist < min_distance:
-                min_distance = dist
-                best_box = detection_box
-                best_class = cls_name
-
-    final_x, final_y = best_box[0], best_box[1]
-    final_w, final_h = best_box[2] - best_box[0], best_box[3] - best_box[1]
-    confidence = round(float(best_iou if best_iou > 0 else 0.0), 2)
+        detections.append([x1, y1, x2, y2, cls_name, round(float(box.conf), 4)])
+
+    _detection_cache.put(key, detections)
+    if _disk_cache is not None:
+        _disk_cache.set(key, detections)
+    return detections
+
+def detection_cache_stats() -> dict:
+    return {
+        "memory": _detection_cache.stats(),
+        "disk": _disk_cache.stats() if _disk_cache is not None else None,
+    }
+
+def iou_matrix(boxes_a, boxes_b) -> np.ndarray:
+    """Pairwise IoU between (N, 4) and (M, 4) xyxy boxes -> (N, M)."""
+    a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+    ix1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    iy1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    ix2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    iy2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(ix2 - ix1, 0, None) * np.clip(iy2 - iy1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-6)
+
+def center_distance_matrix(boxes_a, boxes_b) -> np.ndarray:
+    """Pairwise Euclidean distance between box centers -> (N, M)."""
+    a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+    ca = np.stack([(a[:, 0] + a[:, 2]) / 2, (a[:, 1] + a[:, 3]) / 2], axis=1)
+    cb = np.stack([(b[:, 0] + b[:, 2]) / 2, (b[:, 1] + b[:, 3]) / 2], axis=1)
+    return np.linalg.norm(ca[:, None, :] - cb[None, :, :], axis=2)
+
+def assign_ocr_to_detections(ocr_boxes, detection_boxes, method: str = "greedy", min_iou: float = 0.05) -> list[tuple[int, float]]:
+    """
+    Globally assign OCR boxes to detections, one-to-one (xyxy boxes).
+    Pairs with IoU >= min_iou always beat center-distance fallbacks, same as the
+    single-box matcher. `method` is "greedy" (best pair first) or "hungarian".
+    Returns one (detection_index, iou) per OCR box; index is -1 when unassigned.
+    """
+    n, m = len(ocr_boxes), len(detection_boxes)
+    if n == 0:
+        return []
+    if m == 0:
+        return [(-1, 0.0)] * n
+
+    ious = iou_matrix(ocr_boxes, detection_boxes)
+    dists = center_distance_matrix(ocr_boxes, detection_boxes)
+    # IoU matches cost [0, 1), distance fallbacks cost [1, 2).
+    cost = np.where(ious >= min_iou, 1.0 - ious, 1.0 + dists / (dists.max() + 1.0))
+
+    assignment = [(-1, 0.0)] * n
+    if method == "hungarian":
+        from scipy.optimize import linear_sum_assignment
+        rows, cols = linear_sum_assignment(cost)
+        for r, c in zip(rows, cols):
+            assignment[r] = (int(c), float(ious[r, c]))
+        return assignment
+    if method != "greedy":
+        raise ValueError(f"Unknown assignment method: {method}")
+
+    row_used = np.zeros(n, dtype=bool)
+    col_used = np.zeros(m, dtype=bool)
+    remaining = min(n, m)
+    for flat in np.argsort(cost, axis=None, kind="stable"):
+        r, c = divmod(int(flat), m)
+        if row_used[r] or col_used[c]:
+            continue
+        row_used[r] = col_used[c] = True
+        assignment[r] = (c, float(ious[r, c]))
+        remaining -= 1
+        if remaining == 0:
+            break
+    return assignment
+
+def detect_ui_elements_yolo_batch(image_path: str, ocr_bboxes: list[tuple[int, int, int, int]], method: str = "greedy", verbose: bool = False) -> list[tuple[int, int, int, int, str, float]]:
+    """
+    Match every OCR box of a screenshot against its (cached) YOLO detections in one pass.
+    Each detection is claimed by at most one OCR box; unmatched boxes keep their own bbox.
+    Returns one (x, y, w, h, detected_type, confidence_score) per OCR box.
+    """
+    # Every detection carries one of the model's own class names (cache keys include the
+    # weights), so all are accepted and a cache hit never has to load the model.
+    allowed = get_detections(image_path)
+    ocr_boxes = [[x, y, x + w, y + h] for x, y, w, h in ocr_bboxes]
+    assignment = assign_ocr_to_detections(ocr_boxes, [d[:4] for d in allowed], method=method)
+
+    results = []
+    for (x, y, w, h), (det_idx, iou_val) in zip(ocr_bboxes, assignment):
+        if det_idx < 0:
+            results.append((x, y, w, h, "unknown", 0.0))
+            continue
+        x1, y1, x2, y2, cls_name, _ = allowed[det_idx]
+        results.append((x1, y1, x2 - x1, y2 - y1, cls_name, round(iou_val, 2)))
 
     if verbose:
-        print(f"[YOLO DETECT] Classes detected: {dict(class_counts)}")
-        if ignored_classes:
-            print(f"[YOLO DETECT] Ignored classes: {ignored_classes}")
-        print(f"[YOLO DETECT] Selected type: {best_class} with IOU={best_iou:.2f} for OCR text bbox={ocr_bbox}")
+        print(f"[YOLO DETECT] Classes detected: {dict(Counter(d[4] for d in allowed))}")
+        print(f"[YOLO DETECT] Assigned {sum(1 for a in assignment if a[0] >= 0)}/{len(ocr_bboxes)} OCR boxes ({method})")
+
+    return results
 
-    return final_x, final_y, final_w, final_h, best_class, confidence
+def detect_ui_elements_yolo(image_path: str, ocr_bbox: tuple[int, int, int, int], verbose: bool = False) -> tuple[int, int, int, int, str, float]:
+    """
+    Detect UI components in full screenshot and return most relevant match for OCR region.
+    Returns (x, y, w, h, detected_type, confidence_score)
+    """
+    return detect_ui_elements_yolo_batch(image_path, [ocr_bbox], verbose=verbose)[0]
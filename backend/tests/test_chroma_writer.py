@@ -0,0 +1,95 @@
+import contextvars
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+pytest.importorskip("chromadb")  # services.embedding_service builds a Chroma embedding function
+
+from services.chroma_writer import ChromaWriter  # noqa: E402
+
+
+class FakeCollection:
+    """Upserts whole batches; any batch containing a `bad` id fails, as does that id on its own."""
+
+    def __init__(self, name: str, bad=()):
+        self.name = name
+        self.bad = set(bad)
+        self.rows = {}
+
+    def upsert(self, ids, documents, metadatas, embeddings):
+        if self.bad.intersection(ids):
+            raise ValueError("rejected")
+        for record_id, metadata in zip(ids, metadatas):
+            self.rows[record_id] = metadata
+
+    add = upsert
+
+
+def _writer() -> ChromaWriter:
+    # A long delay keeps the background worker idle; flush() does the writing.
+    return ChromaWriter(batch_size=100, max_delay_ms=60_000, embedding_function=lambda docs: [[0.0]] * len(docs))
+
+
+def _in_request(writer: ChromaWriter, work):
+    """Run `work()` then flush() inside its own tracking scope, like one HTTP request."""
+    def run():
+        with writer.track():
+            work()
+            return writer.flush()
+    return contextvars.copy_context().run(run)
+
+
+def test_flush_reports_only_the_current_requests_failures():
+    writer = _writer()
+    collection = FakeCollection("elements", bad={"bad"})
+
+    def request_a():
+        with writer.track():
+            writer.upsert(collection, ["bad"], ["x"], [{"page_name": "p"}])
+            # Request B runs while A's write is still queued; its flush writes both.
+            clean = _in_request(writer, lambda: writer.upsert(collection, ["ok"], ["y"], [{"page_name": "p"}]))
+            return clean, writer.flush(), writer.flush()
+
+    clean, errors, again = contextvars.copy_context().run(request_a)
+    assert clean == []
+    assert collection.rows == {"ok": {"page_name": "p"}}
+    assert [(e.collection, e.id) for e in errors] == [("elements", "bad")]
+    assert again == []  # consumed by the first flush
+
+
+def test_superseded_record_reports_its_failure_once():
+    writer = _writer()
+    collection = FakeCollection("elements", bad={"x"})
+
+    def work():
+        writer.upsert(collection, ["x"], ["first"], [{}])
+        writer.upsert(collection, ["x"], ["second"], [{}])
+
+    errors = _in_request(writer, work)
+    assert [e.id for e in errors] == ["x"]
+
+
+def test_flush_with_empty_tickets_does_not_consume():
+    writer = _writer()
+    collection = FakeCollection("elements", bad={"bad"})
+
+    def work():
+        writer.upsert(collection, ["bad", "ok"], ["a", "b"], [{}, {}])
+        assert writer.flush(tickets=()) == []
+        assert collection.rows == {"ok": {}}
+
+    assert [e.id for e in _in_request(writer, work)] == ["bad"]
+
+
+def test_commit_hooks_see_only_written_records():
+    writer = _writer()
+    collection = FakeCollection("elements", bad={"bad"})
+    committed = []
+    writer.on_commit("elements", lambda ids, metadatas: committed.extend(zip(ids, metadatas)))
+    writer.on_commit("other", lambda ids, metadatas: committed.append("wrong collection"))
+
+    _in_request(writer, lambda: writer.upsert(collection, ["a", "bad", "b"], ["1", "2", "3"], [{"n": 1}, {"n": 2}, {"n": 3}]))
+    assert committed == [("a", {"n": 1}), ("b", {"n": 3})]
@@ -0,0 +1,54 @@
+import asyncio
+import os
+import sys
+import threading
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from services.embedding_batcher import EmbeddingBatcher  # noqa: E402
+
+
+def _blocking_encoder(release: threading.Event):
+    def encode(texts):
+        release.wait(5)
+        return np.ones((len(texts), 2), dtype=np.float32)
+    return encode
+
+
+def test_cancelled_callers_do_not_kill_the_worker():
+    release = threading.Event()
+    batcher = EmbeddingBatcher(_blocking_encoder(release), max_delay_ms=1, max_items=1)
+
+    async def scenario():
+        running = asyncio.create_task(batcher.encode_async(["a"]))
+        await asyncio.sleep(0.05)  # worker is now inside encode for "a"
+        queued = asyncio.create_task(batcher.encode_async(["b"]))
+        await asyncio.sleep(0.01)
+        running.cancel()
+        queued.cancel()
+        await asyncio.sleep(0.01)  # let the cancellation reach the concurrent futures
+        release.set()
+        await asyncio.gather(running, queued, return_exceptions=True)
+        return await asyncio.wait_for(batcher.encode_async(["c", "d"]), timeout=2)
+
+    vectors = asyncio.run(scenario())
+    assert vectors.shape == (2, 2)
+    assert batcher._thread.is_alive()
+
+
+def test_encode_errors_reach_the_caller_and_worker_survives():
+    calls = []
+
+    def encode(texts):
+        calls.append(texts)
+        if len(calls) == 1:
+            raise RuntimeError("model failed")
+        return np.zeros((len(texts), 3), dtype=np.float32)
+
+    batcher = EmbeddingBatcher(encode, max_delay_ms=1)
+    with pytest.raises(RuntimeError, match="model failed"):
+        batcher.encode(["x"])
+    assert batcher.encode(["y"]).shape == (1, 3)
@@ -0,0 +1,60 @@
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from services.spatial_index import PageGrid, box_distance  # noqa: E402
+
+
+def _random_grid(count: int, seed: int, extent: float = 2000.0, cell: float = 50.0):
+    rng = random.Random(seed)
+    grid = PageGrid(cell)
+    boxes = {}
+    for i in range(count):
+        x, y = rng.uniform(0, extent), rng.uniform(0, extent)
+        box = (x, y, x + rng.uniform(1, 120), y + rng.uniform(1, 60))
+        boxes[f"e{i}"] = box
+        grid.add(f"e{i}", box)
+    return grid, boxes, rng
+
+
+def _overlaps(a, b) -> bool:
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+@pytest.mark.parametrize("count", [3, 1000])  # sparse pages take the linear scan, dense ones walk cells
+def test_intersecting_matches_brute_force(count):
+    grid, boxes, rng = _random_grid(count, seed=count)
+    queries = [(-10_000, -10_000, -9_000, -9_000), (-1e9, -1e9, 1e9, 1e9)]
+    for _ in range(50):
+        x, y = rng.uniform(-200, 2200), rng.uniform(-200, 2200)
+        queries.append((x, y, x + rng.uniform(0, 400), y + rng.uniform(0, 400)))
+
+    for query in queries:
+        expected = {element_id for element_id, box in boxes.items() if _overlaps(box, query)}
+        assert set(grid.intersecting(query)) == expected
+
+
+@pytest.mark.parametrize("count", [3, 1000])
+def test_nearest_matches_brute_force(count):
+    grid, boxes, rng = _random_grid(count, seed=count + 1)
+    points = [(-50_000.0, 25_000.0), (1000.0, 1000.0)] + [(rng.uniform(-500, 2500), rng.uniform(-500, 2500)) for _ in range(50)]
+
+    for x, y in points:
+        for k, max_distance in ((1, None), (7, None), (5, 150.0)):
+            ranked = sorted(((element_id, box_distance(box, x, y)) for element_id, box in boxes.items()),
+                            key=lambda item: (item[1], item[0]))
+            if max_distance is not None:
+                ranked = [item for item in ranked if item[1] <= max_distance]
+            assert grid.nearest(x, y, k=k, max_distance=max_distance) == ranked[:k]
+
+
+def test_removed_boxes_are_not_returned():
+    grid, boxes, _ = _random_grid(50, seed=7)
+    grid.remove("e0")
+    grid.add("e1", (5000, 5000, 5010, 5010))  # re-adding moves the box
+    assert "e0" not in grid.intersecting((-1e9, -1e9, 1e9, 1e9))
+    assert grid.nearest(5005, 5005, k=1) == [("e1", 0.0)]
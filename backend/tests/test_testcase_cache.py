@@ -0,0 +1,63 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+pytest.importorskip("chromadb")  # services.embedding_service builds a Chroma embedding function
+
+from services.testcase_cache import (  # noqa: E402
+    adapt_literals, can_adapt, literal_mapping, normalize_step, split_steps, step_anchors, step_literals,
+)
+
+
+def test_normalize_step_ignores_numbering_case_and_quoted_values():
+    assert normalize_step("1. Enter username 'standard_user'") == "enter username <value>"
+    assert normalize_step("Step 2)  enter   USERNAME \"bob\"") == "enter username <value>"
+    assert normalize_step("- Click Login") == "click login"
+
+
+def test_split_steps_and_literals():
+    steps = split_steps("1. Enter 'a'\n\n  2. Enter \"b\" and 'c'  \n")
+    assert steps == ["1. Enter 'a'", "2. Enter \"b\" and 'c'"]
+    assert step_literals(steps) == ["a", "b", "c"]
+
+
+@pytest.mark.parametrize("first,second", [
+    ("Click Login button", "Click Logout button"),
+    ("Add Sauce Labs Backpack to cart", "Add Sauce Labs Bike Light to cart"),
+    ("Set quantity to 2", "Set quantity to 3"),
+    ("Log in with valid credentials", "Log in with invalid credentials"),
+    ("Add the item to the cart", "Remove the item from the cart"),
+])
+def test_anchors_separate_steps_that_embed_alike(first, second):
+    assert step_anchors(first) != step_anchors(second)
+
+
+def test_anchors_ignore_numbering_quoted_values_and_the_leading_verb():
+    assert step_anchors("1. Enter 'Alice' in Username") == step_anchors("Enter 'Bob' in Username")
+    assert step_anchors("Navigate to the page") == []
+
+
+def test_literal_mapping():
+    assert literal_mapping(["user", "pass"], ["bob", "pass"]) == {"user": "bob"}
+    assert literal_mapping(["user", "user"], ["bob", "bob"]) == {"user": "bob"}
+    assert literal_mapping(["user", "user"], ["bob", "eve"]) is None  # one value, two replacements
+    assert literal_mapping(["user"], ["bob", "eve"]) is None
+
+
+def test_adapt_literals_is_single_pass():
+    code = "fill('alpha'); fill(\"beta\"); print('alphabet')"
+    assert adapt_literals(code, {"alpha": "beta", "beta": "alpha"}) == "fill('beta'); fill(\"alpha\"); print('alphabet')"
+
+
+@pytest.mark.parametrize("code,mapping,literals,expected", [
+    ("fill('#user', 'standard_user')", {"standard_user": "bob_user"}, ["standard_user"], True),
+    ("fill('#qty', '1')", {"1": "2"}, ["1"], False),  # too short to rewrite safely
+    ("fill('standard_user'); print('standard_user')", {"standard_user": "bob_user"}, ["standard_user"], False),
+    ("locator('[v=standard_user]').fill('standard_user')", {"standard_user": "bob_user"}, ["standard_user"], False),
+    ("click('Login')", {}, [], True),
+])
+def test_can_adapt(code, mapping, literals, expected):
+    assert can_adapt(code, mapping, literals) is expected
@@ -0,0 +1,79 @@
+import itertools
+import os
+import random
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from services.yolo_detector import (  # noqa: E402
+    assign_ocr_to_detections, center_distance, center_distance_matrix, iou, iou_matrix,
+)
+
+
+def _random_boxes(rng: random.Random, count: int):
+    boxes = []
+    for _ in range(count):
+        x, y = rng.uniform(0, 300), rng.uniform(0, 300)
+        boxes.append([x, y, x + rng.uniform(5, 80), y + rng.uniform(5, 40)])
+    return boxes
+
+
+def _cost(ocr_boxes, detection_boxes, min_iou: float = 0.05) -> np.ndarray:
+    ious = iou_matrix(ocr_boxes, detection_boxes)
+    dists = center_distance_matrix(ocr_boxes, detection_boxes)
+    return np.where(ious >= min_iou, 1.0 - ious, 1.0 + dists / (dists.max() + 1.0))
+
+
+def _best_total_cost(cost: np.ndarray) -> float:
+    n, m = cost.shape
+    if n <= m:
+        return min(sum(cost[r, c] for r, c in enumerate(cols)) for cols in itertools.permutations(range(m), n))
+    return min(sum(cost[r, c] for c, r in enumerate(rows)) for rows in itertools.permutations(range(n), m))
+
+
+def test_matrices_match_the_scalar_helpers():
+    rng = random.Random(0)
+    a, b = _random_boxes(rng, 6), _random_boxes(rng, 5)
+    ious, dists = iou_matrix(a, b), center_distance_matrix(a, b)
+    for i, j in itertools.product(range(len(a)), range(len(b))):
+        assert ious[i, j] == pytest.approx(iou(a[i], b[j]), abs=1e-4)
+        assert dists[i, j] == pytest.approx(center_distance(a[i], b[j]), abs=1e-3)
+
+
+@pytest.mark.parametrize("method", ["greedy", "hungarian"])
+@pytest.mark.parametrize("n,m", [(3, 5), (5, 3), (4, 4)])
+def test_assignment_is_one_to_one(method, n, m):
+    rng = random.Random(n * 10 + m)
+    assignment = assign_ocr_to_detections(_random_boxes(rng, n), _random_boxes(rng, m), method=method)
+    used = [det for det, _ in assignment if det >= 0]
+    assert len(assignment) == n
+    assert len(used) == len(set(used)) == min(n, m)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_hungarian_is_optimal(seed):
+    pytest.importorskip("scipy")
+    rng = random.Random(seed)
+    ocr_boxes, detection_boxes = _random_boxes(rng, rng.randint(1, 5)), _random_boxes(rng, rng.randint(1, 5))
+    cost = _cost(ocr_boxes, detection_boxes)
+    assignment = assign_ocr_to_detections(ocr_boxes, detection_boxes, method="hungarian")
+    total = sum(cost[r, det] for r, (det, _) in enumerate(assignment) if det >= 0)
+    assert total == pytest.approx(_best_total_cost(cost))
+
+
+def test_overlap_beats_a_closer_center():
+    # The OCR box overlaps the wide detection but its center is nearer the small one.
+    ocr = [[0, 0, 20, 10]]
+    wide, small = [0, 0, 200, 10], [22, 0, 30, 10]
+    (det, overlap), = assign_ocr_to_detections(ocr, [small, wide])
+    assert det == 1 and overlap > 0
+
+
+def test_edge_cases():
+    assert assign_ocr_to_detections([], [[0, 0, 1, 1]]) == []
+    assert assign_ocr_to_detections([[0, 0, 1, 1]], []) == [(-1, 0.0)]
+    with pytest.raises(ValueError):
+        assign_ocr_to_detections([[0, 0, 1, 1]], [[0, 0, 1, 1]], method="nope")
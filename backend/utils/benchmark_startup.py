@@ -0,0 +1,73 @@
+# utils/benchmark_startup.py
+"""
+Startup-time benchmark: measures how long `import main` takes in a fresh
+interpreter (what a worker pays before serving /available-pages), then how
+long each registered model takes to load on first use.
+
+Usage (from backend/):
+    python utils/benchmark_startup.py --runs 5 --max-import-seconds 5
+Exits non-zero when the median import time exceeds --max-import-seconds.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+IMPORT_SNIPPET = """
+import json, time
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+from services.model_registry import model_status
+print(json.dumps({"import_seconds": elapsed, "models": model_status()}))
+"""
+
+LOAD_SNIPPET = """
+import json, time
+import main
+from services.model_registry import get_model, model_status, registered_models
+for name in registered_models():
+    try:
+        get_model(name)
+    except Exception:
+        pass
+print(json.dumps(model_status()))
+"""
+
+
+def run_snippet(snippet: str) -> dict:
+    env = {**os.environ, "MODEL_WARMUP": "none"}
+    result = subprocess.run([sys.executable, "-c", snippet], cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip())
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark backend cold start.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-seconds", type=float, default=None)
+    parser.add_argument("--skip-model-loads", action="store_true")
+    args = parser.parse_args()
+
+    timings = []
+    for i in range(args.runs):
+        report = run_snippet(IMPORT_SNIPPET)
+        timings.append(report["import_seconds"])
+        loaded = [name for name, state in report["models"].items() if state["status"] == "ready"]
+        print(f"[STARTUP] run {i + 1}: import main = {report['import_seconds']:.2f}s, models loaded at import: {loaded or 'none'}")
+
+    median = statistics.median(timings)
+    print(f"[STARTUP] median import main = {median:.2f}s over {args.runs} runs")
+
+    if not args.skip_model_loads:
+        for name, state in run_snippet(LOAD_SNIPPET).items():
+            print(f"[STARTUP] first load {name:<40} {state['status']:<8} {state['load_seconds']}s {state['error'] or ''}")
+
+    if args.max_import_seconds is not None and median > args.max_import_seconds:
+        print(f"[❌] Import time {median:.2f}s exceeds budget {args.max_import_seconds:.2f}s")
+        sys.exit(1)
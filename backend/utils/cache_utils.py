@@ -0,0 +1,235 @@
+# utils/cache_utils.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def content_hash(*parts) -> str:
+    """
+    Stable hex digest over a sequence of str/bytes parts.
+    Parts are length-prefixed so ("ab", "c") and ("a", "bc") never collide.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        digest.update(len(part).to_bytes(8, "little"))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+class LRUCache:
+    """Thread-safe in-process LRU map with hit/miss counters."""
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = max(1, int(maxsize))
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key) -> bool:
+        with self._lock:
+            return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class DiskCache:
+    """
+    SQLite-backed key/value store with an entry cap and optional TTL.
+    When the cap is exceeded the least recently accessed entries are evicted.
+    `serializer` is "json" for JSON-compatible values or "raw" for bytes.
+    """
+
+    _EVICT_CHECK_EVERY = 64
+
+    def __init__(self, path: str, max_entries: int = 10000, ttl_seconds: float = None, serializer: str = "json"):
+        self.path = path
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = ttl_seconds
+        self.serializer = serializer
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value BLOB, created REAL, accessed REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache(accessed)")
+        self._conn.commit()
+
+    def _dumps(self, value):
+        return value if self.serializer == "raw" else json.dumps(value)
+
+    def _loads(self, value):
+        return value if self.serializer == "raw" else json.loads(value)
+
+    def get(self, key: str, default=None):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return default
+            value, created = row
+            if self.ttl_seconds is not None and now - created > self.ttl_seconds:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self._conn.commit()
+                self.misses += 1
+                return default
+            self._conn.execute("UPDATE cache SET accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return self._loads(value)
+
+    def get_many(self, keys: list[str]) -> dict:
+        """Fetch several keys with one SELECT and one access-time UPDATE; missing/expired keys are absent."""
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+        now = time.time()
+        found = {}
+        expired = []
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                for key, value, created in self._conn.execute(
+                    f"SELECT key, value, created FROM cache WHERE key IN ({placeholders})", chunk
+                ):
+                    if self.ttl_seconds is not None and now - created > self.ttl_seconds:
+                        expired.append(key)
+                    else:
+                        found[key] = value
+            for start in range(0, len(expired), 500):
+                chunk = expired[start:start + 500]
+                self._conn.execute(f"DELETE FROM cache WHERE key IN ({','.join('?' * len(chunk))})", chunk)
+            hit_keys = list(found)
+            for start in range(0, len(hit_keys), 500):
+                chunk = hit_keys[start:start + 500]
+                self._conn.execute(
+                    f"UPDATE cache SET accessed = ? WHERE key IN ({','.join('?' * len(chunk))})", [now, *chunk]
+                )
+            if expired or hit_keys:
+                self._conn.commit()
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return {key: self._loads(value) for key, value in found.items()}
+
+    def set(self, key: str, value) -> None:
+        now = time.time()
+        payload = self._dumps(value)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, payload, now, now),
+            )
+            self._writes += 1
+            if self._writes % self._EVICT_CHECK_EVERY == 0:
+                self._evict()
+            self._conn.commit()
+
+    def set_many(self, items: dict) -> None:
+        """Write several entries in one transaction."""
+        if not items:
+            return
+        now = time.time()
+        rows = [(key, self._dumps(value), now, now) for key, value in items.items()]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO cache (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            before = self._writes
+            self._writes += len(rows)
+            if self._writes // self._EVICT_CHECK_EVERY != before // self._EVICT_CHECK_EVERY:
+                self._evict()
+            self._conn.commit()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        if self.ttl_seconds is not None:
+            cur = self._conn.execute("DELETE FROM cache WHERE created < ?", (time.time() - self.ttl_seconds,))
+            self.evictions += cur.rowcount
+        count = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            # Trim a little below the cap so we don't evict on every write.
+            overflow += self.max_entries // 10
+            cur = self._conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed ASC LIMIT ?)",
+                (overflow,),
+            )
+            self.evictions += cur.rowcount
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "path": self.path,
+            "size": len(self),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
@@ -1,30 +1,225 @@
+# utils/export_chromadb.py
+"""
+Columnar snapshot export/import for the element store.
+
+A snapshot is a directory:
+    elements.parquet   ids, documents and one typed column per metadata key
+                       (elements.arrow, Arrow IPC, when pyarrow has no parquet support)
+    embeddings.npy     float32 (N, dim), row-aligned with elements; np.load(..., mmap_mode="r")
+    manifest.json      collection, count, dim, format, embedding model, created
+
+Usage (from backend/):
+    python utils/export_chromadb.py export snapshots/2024-06-01
+    python utils/export_chromadb.py import snapshots/2024-06-01 --batch-size 5000
+
+Importing a snapshot made with another embedding model is refused (the stored
+vectors would mix embedding spaces) unless --reembed is given, which encodes the
+documents with the current SENTENCE_MODEL_NAME instead of loading embeddings.npy.
+"""
+import argparse
 import json
-from pathlib import Path
-from chromadb import PersistentClient
-
-# Path to your existing ChromaDB directory
-chroma_path = Path(__file__).resolve().parents[0] / "data" / "chroma_db"
-
-# Connect to ChromaDB
-client = PersistentClient(path=str(chroma_path))
-collection = client.get_or_create_collection("element_metadata")
-
-# Fetch all records
-records = collection.get()
-
-# Extract relevant data
-output = []
-for i in range(len(records["ids"])):
-    entry = {
-        "id": records["ids"][i],
-        "document": records["documents"][i],
-        "metadata": records["metadatas"][i]
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, BACKEND_DIR)
+
+from config.settings import SENTENCE_MODEL_NAME  # noqa: E402
+from services.element_store import element_store  # noqa: E402
+from services.embedding_service import embedding_service  # noqa: E402
+from services.spatial_index import spatial_index  # noqa: E402
+
+MANIFEST = "manifest.json"
+EMBEDDINGS = "embeddings.npy"
+TABLE_FILES = {"parquet": "elements.parquet", "arrow": "elements.arrow"}
+_RESERVED = ("id", "document")
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise SystemExit("pyarrow is required for snapshots: pip install pyarrow")
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        pq = None
+    return pa, pq
+
+
+def _column_kind(values: list) -> str:
+    """Arrow type for a metadata column; keys holding mixed types are stored as JSON text."""
+    kinds = {type(v) for v in values if v is not None}
+    if not kinds:
+        return "string"
+    if kinds == {bool}:
+        return "bool"
+    if kinds == {int}:
+        return "int64"
+    if kinds <= {int, float}:
+        return "float64"
+    if kinds == {str}:
+        return "string"
+    return "json"
+
+
+def _build_table(ids: list, documents: list, metadatas: list):
+    pa, _ = _pyarrow()
+    keys = sorted({key for meta in metadatas for key in (meta or {})} - set(_RESERVED))
+    columns = {"id": pa.array(ids, type=pa.string()), "document": pa.array(documents, type=pa.string())}
+    json_columns = []
+    for key in keys:
+        values = [(meta or {}).get(key) for meta in metadatas]
+        kind = _column_kind(values)
+        if kind == "json":
+            json_columns.append(key)
+            values = [None if v is None else json.dumps(v) for v in values]
+            kind = "string"
+        columns[key] = pa.array(values, type=getattr(pa, kind)())
+    table = pa.table(columns)
+    return table.replace_schema_metadata({"json_columns": json.dumps(json_columns)})
+
+
+def _read_table(snapshot_dir: str, fmt: str):
+    pa, pq = _pyarrow()
+    path = os.path.join(snapshot_dir, TABLE_FILES[fmt])
+    if fmt == "parquet":
+        if pq is None:
+            raise SystemExit("This snapshot is Parquet but pyarrow was built without parquet support")
+        return pq.read_table(path, memory_map=True)
+    with pa.memory_map(path, "r") as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def export_snapshot(out_dir: str, batch_size: int = 5000) -> dict:
+    pa, pq = _pyarrow()
+    os.makedirs(out_dir, exist_ok=True)
+    element_store.flush()
+    collection = element_store.elements
+    total = collection.count()
+    start = time.perf_counter()
+
+    ids, documents, metadatas = [], [], []
+    vectors = None
+    offset = 0
+    while offset < total:
+        chunk = collection.get(include=["documents", "metadatas", "embeddings"], limit=batch_size, offset=offset)
+        if not chunk["ids"]:
+            break
+        chunk_vectors = np.asarray(chunk["embeddings"], dtype=np.float32)
+        if vectors is None:
+            # Written straight into the .npy so embeddings never accumulate in memory.
+            vectors = np.lib.format.open_memmap(os.path.join(out_dir, EMBEDDINGS), mode="w+",
+                                                dtype=np.float32, shape=(total, chunk_vectors.shape[1]))
+        vectors[offset:offset + len(chunk["ids"])] = chunk_vectors
+        ids += chunk["ids"]
+        documents += chunk["documents"]
+        metadatas += chunk["metadatas"]
+        offset += len(chunk["ids"])
+        print(f"[EXPORT] {offset}/{total}")
+
+    count = len(ids)
+    dim = int(vectors.shape[1]) if vectors is not None else 0
+    if vectors is not None:
+        vectors.flush()
+        del vectors
+        if count < total:  # collection shrank while exporting
+            trimmed = np.load(os.path.join(out_dir, EMBEDDINGS), mmap_mode="r")[:count].copy()
+            np.save(os.path.join(out_dir, EMBEDDINGS), trimmed)
+    else:
+        np.save(os.path.join(out_dir, EMBEDDINGS), np.zeros((0, 0), dtype=np.float32))
+
+    table = _build_table(ids, documents, metadatas)
+    fmt = "parquet" if pq is not None else "arrow"
+    if fmt == "parquet":
+        pq.write_table(table, os.path.join(out_dir, TABLE_FILES[fmt]), compression="zstd")
+    else:
+        with pa.OSFile(os.path.join(out_dir, TABLE_FILES[fmt]), "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+    manifest = {
+        "collection": collection.name,
+        "count": count,
+        "dim": dim,
+        "format": fmt,
+        "embedding_model": SENTENCE_MODEL_NAME,
+        "created": datetime.utcnow().isoformat(),
     }
-    output.append(entry)
+    with open(os.path.join(out_dir, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    print(f"✅ Exported {count} elements ({fmt}, dim={dim}) to {out_dir} in {time.perf_counter() - start:.1f}s")
+    return manifest
+
+
+def import_snapshot(snapshot_dir: str, batch_size: int = 5000, reembed: bool = False) -> int:
+    with open(os.path.join(snapshot_dir, MANIFEST), encoding="utf-8") as f:
+        manifest = json.load(f)
+    snapshot_model = manifest.get("embedding_model")
+    if snapshot_model != SENTENCE_MODEL_NAME and not reembed:
+        raise SystemExit(
+            f"Snapshot was embedded with '{snapshot_model}' but SENTENCE_MODEL_NAME is '{SENTENCE_MODEL_NAME}'; "
+            "re-run with --reembed to encode the documents with the current model"
+        )
+    start = time.perf_counter()
+    table = _read_table(snapshot_dir, manifest["format"])
+    json_columns = set(json.loads((table.schema.metadata or {}).get(b"json_columns", b"[]")))
+    vectors = np.load(os.path.join(snapshot_dir, EMBEDDINGS), mmap_mode="r")
+    if len(vectors) != table.num_rows:
+        raise SystemExit(f"Snapshot is inconsistent: {table.num_rows} rows but {len(vectors)} embeddings")
+
+    collection = element_store.elements
+    max_batch_size = getattr(element_store.client, "get_max_batch_size", None)
+    if max_batch_size is not None:
+        batch_size = min(batch_size, max_batch_size())
+    keys = [name for name in table.column_names if name not in _RESERVED]
+    imported = 0
+    for start_row in range(0, table.num_rows, batch_size):
+        batch = table.slice(start_row, batch_size)
+        ids = batch.column("id").to_pylist()
+        documents = batch.column("document").to_pylist()
+        columns = {key: batch.column(key).to_pylist() for key in keys}
+        metadatas = []
+        for row in range(len(ids)):
+            meta = {}
+            for key in keys:
+                value = columns[key][row]
+                if value is not None:
+                    meta[key] = json.loads(value) if key in json_columns else value
+            metadatas.append(meta)
+        if reembed:
+            embeddings = embedding_service.embed([document or "" for document in documents])
+        else:
+            embeddings = np.ascontiguousarray(vectors[start_row:start_row + len(ids)])
+        collection.upsert(ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings)
+        # Keep the sidecar indexes in step with the bulk load.
+        element_store.catalog.record(ids, metadatas)
+        spatial_index.upsert(ids, metadatas)
+        imported += len(ids)
+        print(f"[IMPORT] {imported}/{table.num_rows}")
+
+    print(f"✅ Imported {imported} elements from {snapshot_dir} in {time.perf_counter() - start:.1f}s")
+    return imported
+
 
-# Write to JSON
-output_path = Path("chromadb_export.json")
-with open(output_path, "w", encoding="utf-8") as f:
-    json.dump(output, f, indent=2, ensure_ascii=False)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export/import element store snapshots (Parquet + .npy).")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export_parser = sub.add_parser("export", help="Write a snapshot directory")
+    export_parser.add_argument("out_dir")
+    export_parser.add_argument("--batch-size", type=int, default=5000)
+    import_parser = sub.add_parser("import", help="Bulk-load a snapshot directory into the element store")
+    import_parser.add_argument("snapshot_dir")
+    import_parser.add_argument("--batch-size", type=int, default=5000)
+    import_parser.add_argument("--reembed", action="store_true",
+                               help="Encode documents with the current model (required when the snapshot's model differs)")
+    args = parser.parse_args()
 
-print(f"✅ ChromaDB exported to {output_path}")
+    if args.command == "export":
+        export_snapshot(args.out_dir, args.batch_size)
+    else:
+        import_snapshot(args.snapshot_dir, args.batch_size, args.reembed)
@@ -1,35 +1,58 @@
 import os
 from PIL import Image
-from datetime import datetime
-from utils.match_utils import assign_intent_semantic
-from services.ocr_type_classifier import classify_ocr_type 
-from services.yolo_detector import detect_ui_elements_yolo
+from utils.match_utils import assign_intent_semantic, assign_intents_semantic
+from services.ocr_type_classifier import classify_ocr_types
+from services.yolo_detector import detect_ui_elements_yolo, detect_ui_elements_yolo_batch
+from services.region_store import get_region_store, region_exists
 
-def save_region(image: Image.Image, x: int, y: int, w: int, h: int, output_dir: str, page_name: str = "page", image_path: str = "") -> str:
+def _write_region(image: Image.Image, x: int, y: int, w: int, h: int, output_dir: str, image_path: str = ""):
+    x = max(0, min(x, image.width - 1))
+    y = max(0, min(y, image.height - 1))
+    w = max(1, min(w, image.width - x))
+    h = max(1, min(h, image.height - y))
+
+    # Content-addressed: identical crops share one file, encoded off the request path.
+    cropped = image.crop((x, y, x + w, y + h))
+    ref = get_region_store(output_dir).put(cropped, (x, y, w, h), parent=image_path)
+    return ref, cropped
+
+def save_region(image: Image.Image, x: int, y: int, w: int, h: int, output_dir: str, image_path: str = "", return_ref: bool = False):
+    """
+    Crop a region (snapped to the YOLO detection when `image_path` is given) into the region store.
+    Returns the region location (file path, or ref string when REGION_PERSIST is off),
+    or (RegionRef, crop) when `return_ref` is set.
+    """
     if image_path and os.path.exists(image_path):
         try:
-            x, y, w, h = detect_ui_elements_yolo(image_path, (x, y, w, h))
+            x, y, w, h, _, _ = detect_ui_elements_yolo(image_path, (x, y, w, h))
         except Exception as e:
             print(f"[YOLO FALLBACK] Using default bbox due to: {e}")
 
-    x = max(0, min(x, image.width - 1))
-    y = max(0, min(y, image.height - 1))
-    w = max(1, min(w, image.width - x))
-    h = max(1, min(h, image.height - y))
+    ref, cropped = _write_region(image, x, y, w, h, output_dir, image_path)
+    return (ref, cropped) if return_ref else ref.location()
 
-    timestamp = datetime.utcnow().strftime("%Y%m%d%H%M%S%f")
-    filename = f"{page_name}_{x}_{y}_{w}_{h}_{timestamp}.png"
-    region_path = os.path.join(output_dir, filename)
+def save_regions(image: Image.Image, bboxes: list[tuple[int, int, int, int]], output_dir: str, image_path: str = "", return_refs: bool = False, snap: bool = True) -> list:
+    """
+    Batch variant of save_region: all OCR boxes of one screenshot are snapped to
+    YOLO detections in a single one-to-one assignment before cropping.
+    With `snap=False` the boxes are cropped as given; `image_path` then only
+    records the parent screenshot on the region refs.
+    """
+    resolved = list(bboxes)
+    if snap and image_path and os.path.exists(image_path) and bboxes:
+        try:
+            resolved = [r[:4] for r in detect_ui_elements_yolo_batch(image_path, bboxes)]
+        except Exception as e:
+            print(f"[YOLO FALLBACK] Using default bboxes due to: {e}")
 
-    cropped = image.crop((x, y, x + w, y + h))
-    cropped.save(region_path)
-    return region_path
+    saved = [_write_region(image, x, y, w, h, output_dir, image_path) for x, y, w, h in resolved]
+    return saved if return_refs else [ref.location() for ref, _ in saved]
     
-def build_standard_metadata(element: dict, page_name: str, image_path: str = "", source_url: str = "") -> dict:
+def build_standard_metadata(element: dict, page_name: str, image_path: str = "", source_url: str = "", region_image: Image.Image = None, assign_intent: bool = True) -> dict:
     label_text = element.get("label_text") or element.get("text", "")
     
     intent = element.get("intent", "")
-    if not intent and label_text:
+    if not intent and label_text and assign_intent:
         try:
             intent = assign_intent_semantic(label_text)
         except Exception as e:
@@ -37,9 +60,9 @@ def build_standard_metadata(element: dict, page_name: str, image_path: str = "",
             intent = ""
 
     ocr_type = element.get("ocr_type", "")
-    if not ocr_type and image_path and os.path.exists(image_path):
+    if not ocr_type and (region_image is not None or (image_path and region_exists(image_path))):
         try:
-            ocr_type = classify_ocr_type(image_path)
+            ocr_type = classify_ocr_types([region_image if region_image is not None else image_path])[0]
         except Exception as e:
             print(f"[WARN] classify_ocr_type failed for '{image_path}': {e}")
     ocr_type = ocr_type if ocr_type else "label"
@@ -63,6 +86,7 @@ def build_standard_metadata(element: dict, page_name: str, image_path: str = "",
         "snapshot_id": element.get("snapshot_id", ""),
         "match_timestamp": element.get("match_timestamp", ""),
         "region_image_path": image_path,
+        "region_ref": element.get("region_ref", ""),
         "source_url": source_url,
         "bbox": element.get("bbox", f"{element.get('x', 0)},{element.get('y', 0)},{element.get('width', 0)},{element.get('height', 0)}"),
         "position_relation": element.get("position_relation", {}),
@@ -76,6 +100,18 @@ def build_standard_metadata(element: dict, page_name: str, image_path: str = "",
         "ocr_type": ocr_type  # ✅ Final enrichment
     })
 
+def build_standard_metadata_many(elements: list[dict], page_name: str, image_path: str = "", source_url: str = "") -> list[dict]:
+    """build_standard_metadata for many elements, with missing intents assigned in one batch."""
+    elements = [dict(element) for element in elements]
+    needs_intent = [e for e in elements if not e.get("intent") and (e.get("label_text") or e.get("text"))]
+    try:
+        intents = assign_intents_semantic([e.get("label_text") or e.get("text") for e in needs_intent])
+        for element, (intent, _) in zip(needs_intent, intents):
+            element["intent"] = intent or ""
+    except Exception as e:
+        print(f"[WARN] Failed to assign intents for {len(needs_intent)} elements: {e}")
+    return [build_standard_metadata(e, page_name, image_path=image_path, source_url=source_url, assign_intent=False) for e in elements]
+
 def sanitize_metadata(metadata: dict) -> dict:
     def safe_convert(value):
         if isinstance(value, (str, int, float, bool)):
@@ -48,9 +48,11 @@ def generalize_label(label: str) -> str:
         return "password"
     return label
 
-from sentence_transformers import SentenceTransformer, util
-
-intent_model = SentenceTransformer("all-MiniLM-L6-v2")
+import json
+import numpy as np
+from config.settings import INTENT_TEMPLATES_PATH, INTENT_MIN_SCORE
+from services.model_registry import register_model, get_model
+from services.embedding_service import embedding_service
 
 # Define common test intents and their typical label meanings
 INTENT_TEMPLATES = {
@@ -64,21 +66,48 @@ INTENT_TEMPLATES = {
     "click_logout": ["logout", "sign out"],
 }
 
-intent_embeddings = {
-    intent: intent_model.encode(labels, convert_to_tensor=True)
-    for intent, labels in INTENT_TEMPLATES.items()
-}
+def load_intent_templates() -> dict:
+    """Built-in templates, extended/overridden by the JSON file at INTENT_TEMPLATES_PATH if present."""
+    templates = {intent: list(labels) for intent, labels in INTENT_TEMPLATES.items()}
+    if INTENT_TEMPLATES_PATH and os.path.exists(INTENT_TEMPLATES_PATH):
+        try:
+            with open(INTENT_TEMPLATES_PATH, "r", encoding="utf-8") as f:
+                extra = json.load(f)
+            for intent, labels in extra.items():
+                templates[intent] = list(labels)
+        except Exception as e:
+            print(f"[WARN] Failed to load intent templates from '{INTENT_TEMPLATES_PATH}': {e}")
+    return templates
 
-def assign_intent_semantic(label_text: str) -> str:
-    label_embedding = intent_model.encode(label_text, convert_to_tensor=True)
+def _load_intent_matrix():
+    """
+    Stack every template phrase into one L2-normalized (T, D) matrix, grouped by
+    intent so per-intent maxima are a single np.maximum.reduceat.
+    """
+    templates = {intent: labels for intent, labels in load_intent_templates().items() if labels}
+    intents = list(templates)
+    phrases = [phrase for intent in intents for phrase in templates[intent]]
+    starts = np.cumsum([0] + [len(templates[intent]) for intent in intents[:-1]])
+    return intents, starts, embedding_service.embed(phrases, normalize=True)
 
-    best_intent = None
-    best_score = -1
+register_model("intent_templates", _load_intent_matrix)
 
-    for intent, embeddings in intent_embeddings.items():
-        score = util.pytorch_cos_sim(label_embedding, embeddings).max().item()
-        if score > best_score:
-            best_score = score
-            best_intent = intent
+def assign_intents_semantic(labels: list[str], min_score: float = INTENT_MIN_SCORE) -> list[tuple[str, float]]:
+    """
+    Batch intent assignment: one encode for all labels and one matmul against the
+    template matrix. Returns (intent or None, score) per label.
+    """
+    if not labels:
+        return []
+    intents, starts, matrix = get_model("intent_templates")
+    scores = embedding_service.embed(labels, normalize=True) @ matrix.T      # (N, T)
+    per_intent = np.maximum.reduceat(scores, starts, axis=1)                  # (N, intents)
+    best = per_intent.argmax(axis=1)
+    results = []
+    for row, idx in enumerate(best):
+        score = float(per_intent[row, idx])
+        results.append((intents[idx] if score > min_score else None, score))
+    return results
 
-    return best_intent if best_score > 0.6 else None
+def assign_intent_semantic(label_text: str) -> str:
+    return assign_intents_semantic([label_text])[0][0]
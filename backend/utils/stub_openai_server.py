@@ -0,0 +1,84 @@
+# utils/stub_openai_server.py
+"""
+Offline stand-in for the OpenAI chat completions API, for exercising /upload-image
+(and the other GPT endpoints) without network access or an API key.
+
+Every POST /v1/chat/completions sleeps --delay seconds and answers with --response
+(or the contents of --response-file). GET /stats reports the request count and the
+highest number of requests that were in flight at once, which shows whether the
+OPENAI_MAX_CONCURRENCY cap is being honoured.
+
+Usage (from backend/):
+    python utils/stub_openai_server.py --port 8090 --delay 2
+    OPENAI_BASE_URL=http://127.0.0.1:8090/v1 OPENAI_API_KEY=stub python main.py
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+
+DEFAULT_RESPONSE = "\n".join([
+    "Username - textbox - username",
+    "Password - textbox - password",
+    "Login - button - login",
+    "secret_sauce - label - password_info",
+])
+
+app = FastAPI(title="OpenAI stub")
+app.state.delay = 0.0
+app.state.response = DEFAULT_RESPONSE
+app.state.stats = {"requests": 0, "in_flight": 0, "max_in_flight": 0}
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    stats = app.state.stats
+    stats["requests"] += 1
+    stats["in_flight"] += 1
+    stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+    try:
+        await asyncio.sleep(app.state.delay)
+    finally:
+        stats["in_flight"] -= 1
+
+    content = app.state.response
+    return {
+        "id": f"chatcmpl-stub-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "stub"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {"prompt_tokens": 0, "completion_tokens": len(content.split()), "total_tokens": len(content.split())},
+    }
+
+
+@app.get("/stats")
+async def stats():
+    return app.state.stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stub of the OpenAI chat completions API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--delay", type=float, default=0.0, help="Seconds to wait before answering each request")
+    parser.add_argument("--response", default=None, help="Completion text returned for every request")
+    parser.add_argument("--response-file", default=None, help="Read the completion text from a file")
+    args = parser.parse_args()
+
+    app.state.delay = args.delay
+    if args.response_file:
+        with open(args.response_file, encoding="utf-8") as f:
+            app.state.response = f.read()
+    elif args.response is not None:
+        app.state.response = args.response
+
+    uvicorn.run(app, host=args.host, port=args.port)